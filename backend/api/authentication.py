@@ -0,0 +1,122 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from backend.cache import LocalLRUCache, TwoTierCache
+from users.models import User
+
+token_cache = TwoTierCache(
+    'auth_token',
+    ttl=settings.TOKEN_CACHE_TTL,
+    local_ttl=settings.TOKEN_CACHE_LOCAL_TTL,
+    local_size=settings.TOKEN_CACHE_LOCAL_SIZE,
+)
+user_versions = LocalLRUCache(
+    settings.TOKEN_CACHE_LOCAL_SIZE, settings.TOKEN_CACHE_LOCAL_TTL
+)
+
+# Поля пользователя, нужные аутентификации и проверке прав, в порядке
+# полей модели (его ожидает User.from_db). Только они попадают в кэш,
+# остальные (в том числе хэш пароля) загружаются из базы при обращении.
+AUTH_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in {
+        'id', 'email', 'username', 'first_name', 'last_name',
+        'is_active', 'is_staff', 'is_superuser', 'role',
+    }
+)
+USER_VERSION_KEY = 'auth_user_version:{}'
+
+
+def token_cache_key(key):
+    """В кэше хранится только хэш токена, а не сам токен."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def user_version(user_id):
+    """
+    Версия пользователя в общем кэше. Записи токенов с другой версией
+    не используются; пропавший ключ даёт версию 0.
+    """
+    key = USER_VERSION_KEY.format(user_id)
+    version = user_versions.get(key)
+    if version is None:
+        version = cache.get(key, 0)
+        user_versions.set(key, version)
+    return version
+
+
+def revoke_user(user_id):
+    """
+    Делает устаревшими записи всех токенов пользователя. Новая версия
+    при потерянном ключе берётся по времени, чтобы не совпасть со старой.
+    """
+    key = USER_VERSION_KEY.format(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+    user_versions.delete(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кэшированием пары токен -> пользователь.
+    Пара хранится в двухуровневом кэше (LRU процесса и общий кэш
+    Django), запрос к базе выполняется только при промахе.
+    В кэше лежат значения AUTH_FIELDS, поэтому каждый запрос получает
+    собственный экземпляр User.
+
+    Запись содержит версию пользователя, прочитанную до чтения базы,
+    и при несовпадении с текущей вычисляется заново: выход (удаление
+    токена), смена пароля, деактивация и массовый update пользователей
+    увеличивают версию после коммита (см. api.signals), и запись,
+    вычисленная одновременно с изменением, не переживает его.
+    Версия в других процессах перечитывается не реже раз
+    в TOKEN_CACHE_LOCAL_TTL.
+    """
+
+    def user_values(self, key):
+        user_id = Token.objects.filter(key=key).values_list(
+            'user_id', flat=True
+        ).first()
+        if user_id is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        version = user_version(user_id)
+        values = User.objects.filter(pk=user_id).values_list(
+            *AUTH_FIELDS
+        ).first()
+        if values is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return version, values
+
+    def cached_values(self, key):
+        cache_key = token_cache_key(key)
+        version, values = token_cache.get_or_set(
+            cache_key, lambda: self.user_values(key)
+        )
+        if version == user_version(values[0]):
+            return values
+        token_cache.delete(cache_key)
+        return token_cache.get_or_set(
+            cache_key, lambda: self.user_values(key)
+        )[1]
+
+    def authenticate_credentials(self, key):
+        user = User.from_db(
+            DEFAULT_DB_ALIAS, AUTH_FIELDS, self.cached_values(key)
+        )
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        token = Token(key=key, user_id=user.pk)
+        token.user = user
+        return (user, token)
@@ -0,0 +1,114 @@
+from django.db.models import Exists, OuterRef
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import FavoriteRecipe, Follow, ShoppingList
+
+# Простые поля ShowRecipeSerializer и столбцы рецепта, которые они читают.
+RECIPE_FIELDS = {
+    'id': (),
+    'name': ('name',),
+    'image': ('image',),
+    'text': ('text',),
+    'cooking_time': ('cooking_time',),
+    'is_favorited': (),
+    'is_in_shopping_cart': (),
+}
+# Связи и запросы, которые нужны для их вывода.
+RECIPE_RELATIONS = {
+    'tags': 'tags',
+    'author': 'author',
+    'ingredients': 'ingredient_amount__ingredient',
+}
+
+
+def list_param(request, name):
+    """Значения параметра запроса через запятую или None."""
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def recipe_fieldset(request):
+    """
+    Поля ответа по ?fields= и ?expand=. Без обоих параметров - None
+    (все поля). fields - простые поля (по умолчанию все), expand -
+    связи tags, author, ingredients (по умолчанию ни одной);
+    связь, перечисленная в fields, тоже выводится.
+    """
+    fields = list_param(request, 'fields')
+    expand = list_param(request, 'expand')
+    if fields is None and expand is None:
+        return None
+    unknown = set(fields or ()) - set(RECIPE_FIELDS) - set(RECIPE_RELATIONS)
+    if unknown:
+        raise ValidationError(
+            {'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}.'}
+        )
+    unknown = set(expand or ()) - RECIPE_RELATIONS.keys()
+    if unknown:
+        raise ValidationError(
+            {'expand': f'Неизвестные связи: {", ".join(sorted(unknown))}.'}
+        )
+    fieldset = set(RECIPE_FIELDS) if fields is None else set(fields)
+    return fieldset | set(expand or ())
+
+
+def annotate_flags(queryset, fieldset, user):
+    """
+    Флаги избранного, списка покупок и подписки на автора
+    подзапросами EXISTS - только для выводимых полей.
+    """
+    if user.is_anonymous:
+        return queryset
+    if fieldset is None:
+        fieldset = RECIPE_FIELDS.keys() | RECIPE_RELATIONS.keys()
+    flags = {
+        'is_favorited': FavoriteRecipe.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        ),
+        'is_in_shopping_cart': ShoppingList.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        ),
+        'author_is_subscribed': Follow.objects.filter(
+            user=user, author=OuterRef('author')
+        ),
+    }
+    fieldset = set(fieldset)
+    if 'author' in fieldset:
+        fieldset.add('author_is_subscribed')
+    return queryset.annotate(**{
+        name: Exists(subquery) for name, subquery in flags.items()
+        if name in fieldset
+    })
+
+
+def optimize_recipes(queryset, fieldset, user):
+    """
+    Загружает только то, что нужно полям ответа: столбцы рецепта
+    через only(), автора - в том же запросе, теги и ингредиенты -
+    по одному запросу на страницу, флаги - annotate_flags.
+    Невыбранные связи не загружаются.
+    """
+    if fieldset is None:
+        fieldset = RECIPE_FIELDS.keys() | RECIPE_RELATIONS.keys()
+    columns = {
+        column for field in fieldset for column in RECIPE_FIELDS.get(field, ())
+    }
+    if 'author' in fieldset:
+        queryset = queryset.select_related('author')
+        columns.add('author')
+    queryset = queryset.only('id', *columns).prefetch_related(*(
+        lookup for field, lookup in RECIPE_RELATIONS.items()
+        if field in fieldset and field != 'author'
+    ))
+    return annotate_flags(queryset, fieldset, user)
+
+
+def document_recipes(queryset, fieldset, user):
+    """
+    Рецепты для RecipeDocumentSerializer: только id и автор,
+    флаги пользователя - annotate_flags. Документы страницы
+    загружаются следующим запросом по id.
+    """
+    return annotate_flags(queryset.only('id', 'author'), fieldset, user)
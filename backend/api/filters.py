@@ -1,7 +1,65 @@
+from django import forms
+from django.db.models import Count, Exists, OuterRef
 from django_filters import rest_framework as f
 from rest_framework.filters import SearchFilter
 
 from recipes.models import Recipe
+from recipes.reference import get_tag_ids, tag_ids_by_slug
+from recipes.search import search_recipes
+
+TAGS_ANY = 'any'
+TAGS_ALL = 'all'
+TAGS_MODES = (
+    (TAGS_ANY, 'Любой из тегов'),
+    (TAGS_ALL, 'Все теги'),
+)
+ORDER_POPULAR = 'popular'
+ORDERINGS = (
+    (ORDER_POPULAR, 'Популярные'),
+)
+
+
+class MultipleValueField(forms.Field):
+    """
+    Поле для повторяющегося параметра запроса (?tags=a&tags=b).
+    В отличие от MultipleChoiceField не требует списка вариантов.
+    """
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        return [item for item in value if item]
+
+
+class MultipleValueFilter(f.Filter):
+    field_class = MultipleValueField
+
+
+class TagSlugsField(MultipleValueField):
+    """
+    Слаги тегов. Неизвестный слаг - ошибка 400, как у прежнего
+    AllValuesMultipleFilter.
+    """
+    default_error_messages = {
+        'invalid_choice': forms.MultipleChoiceField.default_error_messages[
+            'invalid_choice'
+        ],
+    }
+
+    def validate(self, value):
+        super().validate(value)
+        tag_map = tag_ids_by_slug()
+        for slug in value:
+            if slug not in tag_map:
+                raise forms.ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice', params={'value': slug},
+                )
+
+
+class TagSlugsFilter(MultipleValueFilter):
+    field_class = TagSlugsField
 
 
 class IngredientFilter(SearchFilter):
@@ -11,18 +69,51 @@ class IngredientFilter(SearchFilter):
 class RecipeFilter(f.FilterSet):
     """
     Кастомный фильтр для модели рецептов.
+    Теги ищутся по слагам через кэшированный словарь слаг -> id
+    и фильтруются подзапросом к промежуточной таблице, без дублей.
+    tags_mode=all оставляет рецепты со всеми указанными тегами,
+    по умолчанию достаточно любого из них.
+    search - полнотекстовый поиск по названию, описанию и ингредиентам,
+    результаты сортируются по релевантности.
+    ordering=popular - сортировка по популярности с учётом давности
+    добавлений в избранное и список покупок (индекс по popularity).
     """
-    tags = f.AllValuesMultipleFilter(
-        field_name='tags__slug',
-    )
+    tags = TagSlugsFilter(method='filter_tags')
+    tags_mode = f.ChoiceFilter(choices=TAGS_MODES, method='skip_filter')
+    search = f.CharFilter(method='filter_search')
     is_favorited = f.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = f.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = f.ChoiceFilter(choices=ORDERINGS, method='filter_ordering')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'tags_mode', 'author', 'search', 'is_favorited',
+                  'is_in_shopping_cart', 'ordering')
+
+    def skip_filter(self, queryset, name, value):
+        return queryset
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        tag_ids = get_tag_ids(value)
+        recipe_tags = Recipe.tags.through.objects.filter(tag_id__in=tag_ids)
+        if self.form.cleaned_data.get('tags_mode') == TAGS_ALL:
+            return queryset.filter(
+                pk__in=recipe_tags.values('recipe_id').annotate(
+                    tags_count=Count('id')
+                ).filter(tags_count=len(tag_ids)).values('recipe_id')
+            )
+        return queryset.filter(
+            Exists(recipe_tags.filter(recipe_id=OuterRef('pk')))
+        )
+
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -35,3 +126,8 @@ class RecipeFilter(f.FilterSet):
         if value and not user.is_anonymous:
             return queryset.filter(shop_list__user=user)
         return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        if value == ORDER_POPULAR:
+            return queryset.order_by('-popularity', '-pub_date')
+        return queryset
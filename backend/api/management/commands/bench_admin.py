@@ -0,0 +1,62 @@
+import time
+
+from django.contrib import admin
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Время и число запросов страниц админки: списки всех
+    зарегистрированных моделей, вторая страница и форма рецепта.
+    Страницы запрашиваются от имени первого суперпользователя.
+    Команда - python manage.py bench_admin --repeat 3.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError(
+                'Нет суперпользователя: python manage.py createsuperuser'
+            )
+        self.client = Client()
+        self.client.force_login(user)
+        pages = []
+        for model in admin.site._registry:
+            meta = model._meta
+            url = reverse(
+                f'admin:{meta.app_label}_{meta.model_name}_changelist'
+            )
+            pages.append(url)
+            if model is Recipe:
+                pages.append(url + '?p=2')
+        recipe_id = Recipe.objects.values_list('pk', flat=True).first()
+        if recipe_id is not None:
+            pages.append(
+                reverse('admin:recipes_recipe_change', args=[recipe_id])
+            )
+        for url in pages:
+            self.measure(url, options['repeat'])
+
+    def measure(self, url, repeat):
+        durations = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self.client.get(url)
+                durations.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: {response.status_code}')
+        self.stdout.write(
+            f'{url}: {min(durations) * 1000:.0f} мс, '
+            f'запросов: {len(queries)}'
+        )
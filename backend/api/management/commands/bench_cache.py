@@ -0,0 +1,74 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management import BaseCommand, CommandError
+
+from backend.cache import TwoTierCache
+
+
+class Command(BaseCommand):
+    """
+    Проверка TwoTierCache под одновременными промахами: --threads
+    потоков читают холодный ключ, затем устаревший, вычисление
+    занимает --compute-ms. Выводит, сколько раз значение было
+    вычислено, и время чтения из LRU процесса и общего кэша.
+    Команда - python manage.py bench_cache --threads 32.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--compute-ms', type=int, default=200)
+        parser.add_argument('--reads', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        self.computations = 0
+        self.lock = threading.Lock()
+        self.compute_seconds = options['compute_ms'] / 1000
+        cache = TwoTierCache(
+            'bench', ttl=1, stale_ttl=60, local_ttl=0.5, version_ttl=60
+        )
+        cache.invalidate()
+        self.concurrent(cache, options['threads'], 'холодный ключ')
+        time.sleep(1.1)
+        self.concurrent(cache, options['threads'], 'устаревший ключ')
+        for title, local_ttl in (('общий кэш', 0), ('LRU процесса', 60)):
+            cache = TwoTierCache('bench', ttl=3600, local_ttl=local_ttl)
+            cache.get_or_set('key', self.compute)
+            self.stdout.write(
+                f'{title}: {self.read(cache, options["reads"]):.1f} мкс'
+            )
+
+    def compute(self):
+        with self.lock:
+            self.computations += 1
+        time.sleep(self.compute_seconds)
+        return time.time()
+
+    def concurrent(self, cache, threads, title):
+        self.computations = 0
+        cache.local.clear()
+        barrier = threading.Barrier(threads)
+
+        def get():
+            barrier.wait()
+            start = time.perf_counter()
+            cache.get_or_set('key', self.compute)
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(threads) as pool:
+            durations = list(pool.map(lambda _: get(), range(threads)))
+        if self.computations != 1:
+            raise CommandError(
+                f'{title}: значение вычислено {self.computations} раз'
+            )
+        self.stdout.write(
+            f'{title}: {threads} потоков, вычислений: 1, '
+            f'ожидание до {max(durations) * 1000:.0f} мс'
+        )
+
+    def read(self, cache, reads):
+        start = time.perf_counter()
+        for _ in range(reads):
+            cache.get_or_set('key', self.compute)
+        return (time.perf_counter() - start) / reads * 1e6
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count
+
+from recipes.feed import feed_page
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Сравнение ленты подписок: прежний запрос по рецептам авторов
+    из подписок и feed_page (ленты + рецепты популярных авторов).
+    Замер для пользователей с наибольшим числом подписок, первая
+    и пятая страницы.
+    Перед запуском: python manage.py rebuild_timelines.
+    Команда - python manage.py bench_feed --users 20.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--pages', type=int, default=5)
+
+    def handle(self, *args, **options):
+        users = list(User.objects.annotate(
+            follows=Count('follower')
+        ).filter(follows__gt=0).order_by('-follows')[:options['users']])
+        if not users:
+            raise CommandError(
+                'Нет подписок, заполните базу: '
+                'python manage.py fill_bench_data'
+            )
+        self.stdout.write(
+            f'Пользователей: {len(users)}, подписок у первого: '
+            f'{users[0].follows}'
+        )
+        self.report('Запрос по подпискам', users, options, self.naive)
+        self.report('Лента', users, options, self.timeline)
+
+    def naive(self, user, options):
+        queryset = Recipe.objects.filter(
+            author__following__user=user
+        ).order_by('-pub_date')
+        limit = options['limit']
+        for page in range(options['pages']):
+            list(queryset.values_list('id', flat=True)[
+                page * limit:(page + 1) * limit
+            ])
+
+    def timeline(self, user, options):
+        cursor = None
+        for _ in range(options['pages']):
+            _, cursor = feed_page(user, cursor, options['limit'])
+            if cursor is None:
+                break
+
+    def report(self, title, users, options, read):
+        durations = []
+        for user in users:
+            start = time.perf_counter()
+            read(user, options)
+            durations.append(time.perf_counter() - start)
+        durations.sort()
+        self.stdout.write(
+            f'{title}: {options["pages"]} страниц, '
+            f'медиана {durations[len(durations) // 2] * 1000:.1f} мс, '
+            f'максимум {durations[-1] * 1000:.1f} мс'
+        )
@@ -0,0 +1,50 @@
+import time
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Сравнение первой страницы популярных рецептов: подсчёт
+    добавлений в избранное и список покупок за последние дни
+    при запросе и сортировка по сохранённой популярности.
+    Перед запуском: python manage.py update_popularity.
+    Команда - python manage.py bench_popularity --days 7.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--page-size', type=int, default=6)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        counted = Recipe.objects.annotate(
+            events=Count(
+                'favorites', filter=Q(favorites__created__gte=since),
+                distinct=True
+            ) + Count(
+                'shop_list', filter=Q(shop_list__created__gte=since),
+                distinct=True
+            )
+        ).order_by('-events', '-pub_date')
+        stored = Recipe.objects.order_by('-popularity', '-pub_date')
+        self.stdout.write(f'Рецептов в базе: {Recipe.objects.count()}')
+        self.run('COUNT при запросе', counted, options)
+        self.run('Сохранённая популярность', stored, options)
+
+    def run(self, title, queryset, options):
+        durations = []
+        for _ in range(options['iterations']):
+            start = time.perf_counter()
+            list(queryset.values_list('id', flat=True)[:options['page_size']])
+            durations.append(time.perf_counter() - start)
+        durations.sort()
+        self.stdout.write(
+            f'{title}: медиана {durations[len(durations) // 2] * 1000:.2f} мс'
+        )
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import search_recipes
+
+QUERIES = ('суп', 'сливочный соус', 'домашний пирог', 'острое рагу',
+           'куриный суп с грибами', 'блины')
+
+
+class Command(BaseCommand):
+    """
+    Замер задержки полнотекстового поиска рецептов:
+    подсчёт найденного для пагинации и загрузка первой страницы.
+    Для миллиона рецептов: fill_bench_data --recipes 1000000.
+    Команда - python manage.py bench_search --iterations 20.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', default=QUERIES)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=6)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Рецептов в базе: {Recipe.objects.count()}')
+        for query in options['queries']:
+            durations = []
+            for _ in range(options['iterations']):
+                start = time.perf_counter()
+                queryset = search_recipes(Recipe.objects.all(), query)
+                count = queryset.count()
+                page = list(queryset[:options['page_size']])
+                durations.append(time.perf_counter() - start)
+            durations.sort()
+            p50 = durations[len(durations) // 2] * 1000
+            p95 = durations[int(len(durations) * 0.95) - 1] * 1000
+            top = page[0].name if page else '-'
+            self.stdout.write(
+                f'"{query}": найдено {count}, p50 {p50:.1f} мс, '
+                f'p95 {p95:.1f} мс, первый: {top}'
+            )
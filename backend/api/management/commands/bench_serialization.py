@@ -0,0 +1,91 @@
+import json
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.fieldsets import optimize_recipes
+from api.serializers import (CustomUserSerializer, ShowRecipeSerializer,
+                             TagSerializer)
+from recipes.models import Recipe
+from users.models import User
+
+
+class NestedRecipeSerializer(ShowRecipeSerializer):
+    """Прежняя сериализация: автор и теги заново для каждого рецепта."""
+    author = CustomUserSerializer(read_only=True)
+    tags = TagSerializer(many=True, read_only=True)
+
+
+class Command(BaseCommand):
+    """
+    Сериализация страницы рецептов нескольких плодовитых авторов:
+    вложенные сериализаторы автора и тегов для каждого рецепта
+    и ShowRecipeSerializer с памятью на ответ. Рецепты загружаются
+    один раз, замеряется только сериализация; выводит время на
+    страницу и число запросов (подписка на автора без аннотации).
+    Команда - python manage.py bench_serialization --authors 3.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=3)
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        authors = list(User.objects.annotate(
+            recipe_count=Count('recipe')
+        ).order_by('-recipe_count')[:options['authors']])
+        reader = User.objects.exclude(
+            pk__in=[author.pk for author in authors]
+        ).first()
+        if not authors or reader is None:
+            raise CommandError(
+                'Заполните базу: python manage.py fill_bench_data'
+            )
+        self.request = Request(APIRequestFactory().get('/'))
+        self.request.user = reader
+        queryset = Recipe.objects.filter(author__in=authors).order_by(
+            '-pub_date'
+        )[:options['limit']]
+        pages = {
+            'без аннотаций': queryset.select_related(
+                'author'
+            ).prefetch_related('tags', 'ingredient_amount__ingredient'),
+            'с аннотациями': optimize_recipes(queryset, None, reader),
+        }
+        for title, page in pages.items():
+            recipes = list(page)
+            self.stdout.write(
+                f'{title}: рецептов {len(recipes)}, авторов '
+                f'{len({recipe.author_id for recipe in recipes})}'
+            )
+            self.measure('вложенные', NestedRecipeSerializer, recipes,
+                         options['repeat'])
+            self.measure('с памятью', ShowRecipeSerializer, recipes,
+                         options['repeat'])
+            if json.dumps(
+                self.serialize(NestedRecipeSerializer, recipes)
+            ) != json.dumps(self.serialize(ShowRecipeSerializer, recipes)):
+                raise CommandError('Ответы сериализаторов различаются')
+
+    def serialize(self, serializer_class, recipes):
+        return serializer_class(
+            recipes, many=True, context={'request': self.request}
+        ).data
+
+    def measure(self, title, serializer_class, recipes, repeat):
+        with CaptureQueriesContext(connection) as queries:
+            self.serialize(serializer_class, recipes)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            self.serialize(serializer_class, recipes)
+        duration = (time.perf_counter() - start) / repeat
+        self.stdout.write(
+            f'  {title}: {duration * 1000:.1f} мс на страницу, '
+            f'запросов {len(queries)}'
+        )
@@ -0,0 +1,81 @@
+import random
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from recipes.models import SimilarRecipe
+from recipes.similarity import recipe_features
+
+
+class Command(BaseCommand):
+    """
+    Качество похожих рецептов: полнота сохранённого топа относительно
+    точного топа по коэффициенту Жаккара (рецепт из сохранённого топа
+    засчитывается, если его точное сходство не ниже N-го в точном топе)
+    и задержка чтения топа из базы.
+    Перед запуском: python manage.py build_similar_recipes.
+    Команда - python manage.py bench_similar_recipes --sample 200.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sample', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        recipes, features = recipe_features()
+        if not len(recipes):
+            raise CommandError(
+                'Нет рецептов, заполните базу: '
+                'python manage.py fill_bench_data'
+            )
+        recipe_count = int(recipes.max()) + 1
+        sizes = np.bincount(recipes, minlength=recipe_count)
+        order = np.argsort(features, kind='stable')
+        by_feature = recipes[order]
+        bounds = np.searchsorted(
+            features[order], np.arange(int(features.max()) + 2)
+        )
+        members = {}
+        for recipe_id, feature in zip(recipes.tolist(), features.tolist()):
+            members.setdefault(recipe_id, []).append(feature)
+        rng = random.Random(options['seed'])
+        sample = rng.sample(sorted(members), min(options['sample'],
+                                                 len(members)))
+        limit = settings.SIMILAR_RECIPES_COUNT
+        found = expected = 0
+        durations = []
+        for recipe_id in sample:
+            shared = np.bincount(
+                np.concatenate([
+                    by_feature[bounds[feature]:bounds[feature + 1]]
+                    for feature in members[recipe_id]
+                ]),
+                minlength=recipe_count
+            )
+            jaccard = shared / np.maximum(
+                sizes + len(members[recipe_id]) - shared, 1
+            )
+            jaccard[recipe_id] = 0
+            exact = np.sort(jaccard)[::-1][:limit]
+            exact = exact[exact > 0]
+            start = time.perf_counter()
+            stored = list(SimilarRecipe.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('similar_id', flat=True))
+            durations.append(time.perf_counter() - start)
+            if not len(exact):
+                continue
+            expected += len(exact)
+            found += min(
+                sum(jaccard[similar] >= exact[-1] for similar in stored),
+                len(exact)
+            )
+        durations.sort()
+        self.stdout.write(
+            f'Рецептов: {len(members)}, проверено: {len(sample)}, '
+            f'полнота топ-{limit}: {found / max(expected, 1):.3f}, '
+            f'чтение топа p50 '
+            f'{durations[len(durations) // 2] * 1000:.2f} мс'
+        )
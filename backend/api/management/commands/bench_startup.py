@@ -0,0 +1,115 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+# Что замеряется: старт любой команды manage.py и воркера до первого
+# запроса (django.setup) и первый запрос (загрузка urls, представлений
+# и сериализаторов).
+TARGETS = {
+    'setup': 'import django; django.setup()',
+    'urls': 'import django; django.setup(); import backend.urls',
+}
+# Тяжёлые модули, которые импортируются только в месте использования
+# и не должны попадать в старт.
+LAZY_MODULES = ('numpy', 'snowballstemmer', 'PIL', 'reportlab', 'sorl')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_times(stderr):
+    """Собственное время импорта (мкс) по пакетам верхнего уровня."""
+    packages = Counter()
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            packages[match[4].split('.')[0]] += int(match[1])
+    return packages
+
+
+class Command(BaseCommand):
+    """
+    Время старта по -X importtime: для каждой цели из TARGETS
+    --repeat раз запускается новый интерпретатор, берётся лучший
+    прогон. Выводит время процесса, суммарное время импортов
+    и --top самых дорогих пакетов. Завершается ошибкой, если в старт
+    попал модуль из LAZY_MODULES или время импортов выросло больше
+    чем на --max-regression процентов относительно --baseline;
+    --save-baseline сохраняет результат.
+    Команда - python manage.py bench_startup --repeat 5.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--save-baseline')
+        parser.add_argument('--baseline')
+        parser.add_argument('--max-regression', type=float, default=20)
+
+    def handle(self, *args, **options):
+        report = {}
+        problems = []
+        for name, code in TARGETS.items():
+            wall, packages = min(
+                (self.run(code) for _ in range(options['repeat'])),
+                key=lambda run: sum(run[1].values()),
+            )
+            imports = sum(packages.values()) / 1000
+            report[name] = {
+                'wall_ms': round(wall * 1000, 1),
+                'imports_ms': round(imports, 1),
+            }
+            self.stdout.write(
+                f'{name}: процесс {wall * 1000:.0f} мс, '
+                f'импорты {imports:.0f} мс'
+            )
+            for package, micros in packages.most_common(options['top']):
+                self.stdout.write(f'  {package:<30} {micros / 1000:>7.1f} мс')
+            problems.extend(
+                f'{name}: при старте импортируется {module}'
+                for module in LAZY_MODULES if module in packages
+            )
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline:
+                json.dump(report, baseline, indent=2)
+        if options['baseline']:
+            problems.extend(self.compare(
+                report, options['baseline'], options['max_regression']
+            ))
+        if problems:
+            raise CommandError('\n'.join(problems))
+
+    def run(self, code):
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'backend.settings'
+            ),
+        )
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, universal_newlines=True,
+        )
+        wall = time.perf_counter() - start
+        if process.returncode:
+            raise CommandError(process.stderr[-2000:])
+        return wall, import_times(process.stderr)
+
+    def compare(self, report, path, max_regression):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        for name, row in report.items():
+            base = baseline.get(name)
+            if not base or not base['imports_ms']:
+                continue
+            growth = (row['imports_ms'] / base['imports_ms'] - 1) * 100
+            self.stdout.write(f'{name}: импорты {growth:+.0f}% к базовому')
+            if growth > max_regression:
+                yield f'{name}: импорты медленнее на {growth:.0f}%'
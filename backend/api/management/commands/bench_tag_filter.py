@@ -0,0 +1,70 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.http import QueryDict
+from django_filters import rest_framework as f
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+
+
+class LegacyRecipeFilter(f.FilterSet):
+    """Прежний фильтр по тегам - для сравнения."""
+    tags = f.AllValuesMultipleFilter(field_name='tags__slug')
+
+    class Meta:
+        model = Recipe
+        fields = ('tags',)
+
+
+class Command(BaseCommand):
+    """
+    Сравнение фильтрации рецептов по тегам: прежний
+    AllValuesMultipleFilter и RecipeFilter.
+    На каждой итерации строится фильтр, считается количество рецептов
+    для пагинации и загружается первая страница.
+    Команда - python manage.py bench_tag_filter --tags 10.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=6)
+
+    def handle(self, *args, **options):
+        slugs = list(
+            Tag.objects.values_list('slug', flat=True)[:options['tags']]
+        )
+        if not slugs:
+            raise CommandError(
+                'Нет тегов, заполните базу: python manage.py fill_bench_data'
+            )
+        data = QueryDict(mutable=True)
+        data.setlist('tags', slugs)
+        self.stdout.write(
+            f'Тегов в фильтре: {len(slugs)}, '
+            f'рецептов в базе: {Recipe.objects.count()}'
+        )
+        for mode in ('any', 'all'):
+            mode_data = data.copy()
+            mode_data['tags_mode'] = mode
+            self.run('RecipeFilter tags_mode=' + mode, RecipeFilter,
+                     mode_data, options)
+        self.run('AllValuesMultipleFilter', LegacyRecipeFilter, data, options)
+
+    def run(self, title, filterset_class, data, options):
+        durations = []
+        for _ in range(options['iterations']):
+            start = time.perf_counter()
+            queryset = filterset_class(
+                data=data, queryset=Recipe.objects.all()
+            ).qs
+            count = queryset.count()
+            list(queryset[:options['page_size']])
+            durations.append(time.perf_counter() - start)
+        durations.sort()
+        self.stdout.write(
+            f'{title}: найдено {count}, '
+            f'медиана {durations[len(durations) // 2] * 1000:.2f} мс, '
+            f'максимум {durations[-1] * 1000:.2f} мс'
+        )
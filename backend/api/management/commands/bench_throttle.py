@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+
+from api.throttling import SlidingWindowThrottle
+
+
+class Command(BaseCommand):
+    """
+    Стоимость проверки ограничения частоты в микросекундах:
+    разрешённые запросы (разные клиенты) и отклонённые (один
+    клиент сверх лимита) в нескольких потоках.
+    Команда - python manage.py bench_throttle --checks 100000 --threads 4.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=100000)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--scope', default='favorite')
+
+    def handle(self, *args, **options):
+        self.view = SimpleNamespace(
+            action=None, throttle_scope=options['scope']
+        )
+        rate = api_settings.DEFAULT_THROTTLE_RATES[options['scope']]
+        self.stdout.write(f'{options["scope"]}: {rate}')
+        factory = APIRequestFactory()
+        clients = [
+            factory.get('/', REMOTE_ADDR=f'10.{i // 65536}.{i // 256 % 256}.'
+                        f'{i % 256}')
+            for i in range(options['checks'])
+        ]
+        for request in clients:
+            request.user = AnonymousUser()
+        self.measure('разрешённые', clients, options['threads'])
+        self.measure(
+            'отклонённые', [clients[0]] * options['checks'],
+            options['threads']
+        )
+
+    def check(self, requests):
+        return sum(
+            SlidingWindowThrottle().allow_request(request, self.view)
+            for request in requests
+        )
+
+    def measure(self, title, requests, threads):
+        parts = [requests[i::threads] for i in range(threads)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            allowed = sum(pool.map(self.check, parts))
+        duration = time.perf_counter() - start
+        self.stdout.write(
+            f'{title}: {duration / len(requests) * 1e6:.1f} мкс на проверку, '
+            f'разрешено {allowed} из {len(requests)}'
+        )
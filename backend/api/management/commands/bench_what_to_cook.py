@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count, Q
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    """
+    Замер подбора рецептов по ингредиентам: построение индекса
+    ингредиент -> рецепты и задержка запросов к нему в сравнении
+    с агрегацией по RecipeIngredient в базе.
+    Для миллиона рецептов: fill_bench_data --recipes 1000000.
+    Команда - python manage.py bench_what_to_cook --ingredients 8.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients', type=int, default=8)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--orm-iterations', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredient_ids) < options['ingredients']:
+            raise CommandError(
+                'Мало ингредиентов, заполните базу: '
+                'python manage.py fill_bench_data'
+            )
+        start = time.perf_counter()
+        snapshot = ingredient_index.build()
+        build = time.perf_counter() - start
+        size = (snapshot.indptr.nbytes + snapshot.recipe_ids.nbytes
+                + snapshot.sizes.nbytes)
+        self.stdout.write(
+            f'Рецептов в базе: {Recipe.objects.count()}, '
+            f'индекс построен за {build:.1f} с, '
+            f'занимает {size / 2 ** 20:.1f} МБ'
+        )
+        rng = random.Random(options['seed'])
+        queries = [
+            rng.sample(ingredient_ids, options['ingredients'])
+            for _ in range(options['iterations'])
+        ]
+        self.report('Индекс', queries, options, self.search_index)
+        self.report('ORM', queries[:options['orm_iterations']], options,
+                    self.search_orm)
+
+    def search_index(self, query, limit):
+        return [
+            recipe_id
+            for recipe_id, _, _ in ingredient_index.search(query, limit)
+        ]
+
+    def search_orm(self, query, limit):
+        return list(Recipe.objects.annotate(
+            matched=Count('ingredients', filter=Q(ingredients__in=query)),
+            total=Count('ingredients'),
+        ).filter(matched__gt=0).order_by(
+            '-matched', 'total'
+        ).values_list('id', flat=True)[:limit])
+
+    def report(self, title, queries, options, search):
+        durations = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query, options['limit'])
+            durations.append(time.perf_counter() - start)
+        durations.sort()
+        p50 = durations[len(durations) // 2] * 1000
+        p95 = durations[max(int(len(durations) * 0.95) - 1, 0)] * 1000
+        self.stdout.write(f'{title}: p50 {p50:.1f} мс, p95 {p95:.1f} мс')
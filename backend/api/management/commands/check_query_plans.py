@@ -0,0 +1,222 @@
+import json
+import os
+import re
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.views import FollowListView, IngredientsViewSet, RecipeViewSet
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingList,
+                            Tag)
+from users.models import User
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'query_plans.json')
+# Параметры списка рецептов: сочетания фильтров RecipeFilter.
+# {tags} и {author} заменяются значениями из базы.
+RECIPE_FILTERS = {
+    'recipes': {},
+    'recipes_tags': {'tags': '{tags}'},
+    'recipes_tags_all': {'tags': '{tags}', 'tags_mode': 'all'},
+    'recipes_author': {'author': '{author}'},
+    'recipes_favorited': {'is_favorited': '1'},
+    'recipes_in_shopping_cart': {'is_in_shopping_cart': '1'},
+    'recipes_popular': {'ordering': 'popular'},
+}
+# Полное чтение таблицы. SCAN ... USING [COVERING] INDEX - обход индекса
+# по порядку (ORDER BY по индексу), а не полное чтение.
+SQLITE_SCAN = re.compile(
+    r'^SCAN (?!CONSTANT)(?:TABLE )?(\w+)(?!.* USING (?:COVERING )?INDEX )'
+)
+
+
+def walk_postgres(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk_postgres(child)
+
+
+def postgres_plan(cursor, sql, params):
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]['Plan']
+    nodes = list(walk_postgres(root))
+    return {
+        'nodes': [
+            f'{node["Node Type"]} {node.get("Relation Name", "")}'.strip()
+            for node in nodes
+        ],
+        'seq_scans': sorted({
+            node['Relation Name'] for node in nodes
+            if node['Node Type'] == 'Seq Scan'
+        }),
+        'sorts': sum(
+            node['Node Type'] in ('Sort', 'Incremental Sort')
+            for node in nodes
+        ),
+        'cost': root['Total Cost'],
+    }
+
+
+def sqlite_plan(cursor, sql, params):
+    """
+    EXPLAIN QUERY PLAN SQLite: полное чтение таблицы - SCAN без индекса,
+    сортировка - USE TEMP B-TREE. Стоимости SQLite не сообщает.
+    """
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    details = [re.sub(r'\d+', 'N', row[3]) for row in cursor.fetchall()]
+    return {
+        'nodes': details,
+        'seq_scans': sorted({
+            match[1] for match in map(SQLITE_SCAN.match, details) if match
+        }),
+        'sorts': sum(
+            detail.startswith('USE TEMP B-TREE') for detail in details
+        ),
+        'cost': None,
+    }
+
+
+def explain(queryset):
+    """Нормализованный план запроса: узлы, полные чтения, сортировки."""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            return postgres_plan(cursor, sql, params)
+        if connection.vendor == 'sqlite':
+            return sqlite_plan(cursor, sql, params)
+    raise CommandError(f'EXPLAIN для {connection.vendor} не поддерживается')
+
+
+def regressions(plan, baseline, max_cost_growth):
+    new_scans = set(plan['seq_scans']) - set(baseline['seq_scans'])
+    problems = [f'новое полное чтение {table}' for table in sorted(new_scans)]
+    if plan['sorts'] > baseline['sorts']:
+        problems.append(
+            f'сортировок {plan["sorts"]} вместо {baseline["sorts"]}'
+        )
+    if plan['cost'] and baseline['cost']:
+        growth = (plan['cost'] / baseline['cost'] - 1) * 100
+        if growth > max_cost_growth:
+            problems.append(f'стоимость выросла на {growth:.0f}%')
+    return problems
+
+
+class Command(BaseCommand):
+    """
+    Проверка планов горячих запросов: список рецептов с сочетаниями
+    фильтров, подписки, ингредиенты списка покупок, поиск ингредиентов
+    по префиксу, избранное и список покупок. Планы EXPLAIN сравниваются
+    с базовыми (query_plans.json, отдельно для каждой СУБД): новые
+    полные чтения таблиц, новые сортировки и рост стоимости больше
+    --max-cost-growth процентов завершают команду ошибкой.
+    Запрос без базового плана тоже ошибка. В репозитории сохранены
+    только планы SQLite, и проверка в CI идёт на SQLite: на другой СУБД
+    команда без базовых планов, снятых с --update, завершается ошибкой.
+    --update сохраняет текущие планы как базовые. Запускать на базе
+    с данными масштаба продакшена (fill_bench_data).
+    Команда - python manage.py check_query_plans.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument('--update', action='store_true')
+        parser.add_argument('--max-cost-growth', type=float, default=50)
+
+    def handle(self, *args, **options):
+        self.factory = APIRequestFactory()
+        self.verbosity = options['verbosity']
+        plans = {
+            name: explain(queryset)
+            for name, queryset in self.querysets().items()
+        }
+        vendor = connections['default'].vendor
+        baselines = {}
+        if os.path.exists(options['baseline']):
+            with open(options['baseline']) as baseline_file:
+                baselines = json.load(baseline_file)
+        if options['update']:
+            baselines[vendor] = plans
+            with open(options['baseline'], 'w') as baseline_file:
+                json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+            self.stdout.write(f'Сохранено планов: {len(plans)} ({vendor})')
+            return
+        if vendor not in baselines:
+            raise CommandError(
+                f'Нет базовых планов для {vendor} в {options["baseline"]}. '
+                f'Сохранённые планы проверяются на SQLite; для {vendor} '
+                f'снимите их с --update на базе с данными fill_bench_data.'
+            )
+        self.check_plans(plans, baselines[vendor], options['max_cost_growth'])
+
+    def check_plans(self, plans, baselines, max_cost_growth):
+        failed = []
+        for name, plan in plans.items():
+            if self.verbosity > 1:
+                self.stdout.write('\n'.join([name] + plan['nodes']))
+            if name in baselines:
+                problems = regressions(
+                    plan, baselines[name], max_cost_growth
+                )
+            else:
+                problems = ['нет базового плана']
+            if problems:
+                failed.append(name)
+            self.stdout.write(f'{name}: {"; ".join(problems) or "ok"}')
+        if failed:
+            raise CommandError(
+                f'Планы не прошли проверку: {", ".join(failed)}'
+            )
+
+    def view_queryset(self, view_class, action, params):
+        """Queryset представления для запроса с параметрами params."""
+        request = Request(self.factory.get('/', params))
+        request.user = self.user
+        view = view_class(
+            request=request, action=action, args=(), kwargs={},
+            format_kwarg=None,
+        )
+        return view.filter_queryset(view.get_queryset())
+
+    def querysets(self):
+        self.user = (
+            User.objects.filter(shop_list__isnull=False).first()
+            or User.objects.first()
+        )
+        recipe = Recipe.objects.first()
+        ingredient = Ingredient.objects.first()
+        if self.user is None or recipe is None or ingredient is None:
+            raise CommandError(
+                'Заполните базу: python manage.py fill_bench_data'
+            )
+        values = {
+            '{tags}': list(Tag.objects.values_list('slug', flat=True)[:2]),
+            '{author}': recipe.author_id,
+        }
+        querysets = {
+            name: self.view_queryset(RecipeViewSet, 'list', {
+                key: values.get(value, value) for key, value in params.items()
+            })[:settings.REST_FRAMEWORK['PAGE_SIZE']]
+            for name, params in RECIPE_FILTERS.items()
+        }
+        querysets['subscriptions'] = self.view_queryset(
+            FollowListView, None, {}
+        )[:settings.REST_FRAMEWORK['PAGE_SIZE']]
+        querysets['shopping_cart_ingredients'] = (
+            RecipeViewSet.shopping_cart_ingredients(self.user)
+        )
+        querysets['ingredient_search'] = self.view_queryset(
+            IngredientsViewSet, 'list', {'name': ingredient.name[:3]}
+        )
+        querysets['favorite_lookup'] = FavoriteRecipe.objects.filter(
+            user=self.user, recipe=recipe
+        )
+        querysets['shopping_cart_lookup'] = ShoppingList.objects.filter(
+            user=self.user, recipe=recipe
+        )
+        return querysets
@@ -0,0 +1,274 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from django.core.management import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+# Смесь запросов по умолчанию. Шаг - запросы, которые один поток
+# выполняет подряд с одинаковыми подстановками (добавить и убрать
+# рецепт из избранного); weight - относительная частота шага.
+DEFAULT_SCENARIO = [
+    {'weight': 30, 'steps': [['GET', '/api/recipes/?page={page}']]},
+    {'weight': 20, 'steps': [['GET', '/api/recipes/?tags={tag}']]},
+    {'weight': 20, 'steps': [['GET', '/api/recipes/{recipe}/']]},
+    {'weight': 10, 'steps': [['GET', '/api/ingredients/?name={prefix}']]},
+    {'weight': 5, 'auth': True, 'steps': [
+        ['POST', '/api/recipes/{recipe}/favorite/'],
+        ['DELETE', '/api/recipes/{recipe}/favorite/'],
+    ]},
+    {'weight': 5, 'auth': True, 'steps': [
+        ['POST', '/api/recipes/{recipe}/shopping_cart/'],
+        ['DELETE', '/api/recipes/{recipe}/shopping_cart/'],
+    ]},
+    {'weight': 5, 'auth': True, 'steps': [
+        ['GET', '/api/users/subscriptions/'],
+    ]},
+    {'weight': 3, 'auth': True, 'steps': [
+        ['POST', '/api/users/{author}/subscribe/'],
+        ['DELETE', '/api/users/{author}/subscribe/'],
+    ]},
+    {'weight': 2, 'auth': True, 'steps': [
+        ['GET', '/api/recipes/download_shopping_cart/'],
+    ]},
+]
+
+# Строка access-лога nginx в формате combined (infra/nginx.conf):
+# $remote_addr - $remote_user [$time_local] "$request" ...
+LOG_LINE = re.compile(
+    r'^\S+ \S+ (?P<user>\S+) \[[^]]*\] '
+    r'"(?P<method>[A-Z]+) (?P<path>/api/\S*) HTTP/[\d.]+"'
+)
+# Чтения, доступные только пользователю: анонимно они дают 401
+# или пустой ответ, поэтому повторяются с токеном.
+LOG_AUTH_READS = re.compile(
+    r'^/api/(users/me/|users/subscriptions/|recipes/download_shopping_cart/)'
+    r'|[?&](is_favorited|is_in_shopping_cart)=1(&|$)'
+)
+# Из лога повторяются чтения и переключатели без тела запроса.
+LOG_WRITES = re.compile(r'/(favorite|shopping_cart|subscribe)/$')
+# Пользователи fill_bench_data: bench<время>-user-<номер>.
+BENCH_USERNAME = r'^bench\d+-user-\d+$'
+
+
+def endpoint(method, path):
+    """Группа для отчёта: метод и путь без параметров, id -> {id}."""
+    path = re.sub(r'/\d+(?=/)', '/{id}', path.split('?')[0])
+    return f'{method} {path}'
+
+
+def read_log(path):
+    steps = []
+    with open(path) as log:
+        for line in log:
+            match = LOG_LINE.search(line)
+            if match is None:
+                continue
+            method = match['method']
+            if method != 'GET' and not LOG_WRITES.search(match['path']):
+                continue
+            steps.append({
+                'auth': (
+                    method != 'GET' or match['user'] != '-'
+                    or LOG_AUTH_READS.search(match['path']) is not None
+                ),
+                'steps': [[method, match['path']]],
+            })
+    if not steps:
+        raise CommandError(f'В {path} нет запросов к /api/')
+    return steps
+
+
+def summary(durations, statuses, elapsed):
+    durations = np.array(durations) * 1000
+    p50, p95, p99 = (
+        np.percentile(durations, [50, 95, 99]) if len(durations)
+        else (0, 0, 0)
+    )
+    return {
+        'requests': len(durations),
+        'rps': round(len(durations) / elapsed, 1),
+        'p50': round(float(p50), 1),
+        'p95': round(float(p95), 1),
+        'p99': round(float(p99), 1),
+        'throttled': sum(status == 429 for status in statuses),
+        'errors': sum(
+            status == 0 or (status >= 400 and status != 429)
+            for status in statuses
+        ),
+    }
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный прогон API запущенного бэкенда: --concurrency потоков
+    выполняют смесь запросов (DEFAULT_SCENARIO, JSON-сценарий
+    --scenario в том же формате или access-лог nginx --log) в течение
+    --duration секунд. Подстановки {recipe}, {tag}, {prefix}, {author},
+    {page} берутся из базы, запросы с auth - с токенами --users
+    пользователей fill_bench_data (не персонала, токены другим
+    пользователям не выдаются). Выводит RPS, p50/p95/p99, ошибки
+    и отдельно ответы 429 ограничения частоты по эндпоинтам;
+    --save-baseline сохраняет результат, --baseline сравнивает с ним
+    и завершается ошибкой, если p95 или RPS хуже больше чем на
+    --max-regression процентов.
+    Команда - python manage.py load_replay --url http://localhost:8000.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--scenario')
+        parser.add_argument('--log')
+        parser.add_argument('--save-baseline')
+        parser.add_argument('--baseline')
+        parser.add_argument('--max-regression', type=float, default=20)
+
+    def handle(self, *args, **options):
+        self.url = options['url'].rstrip('/')
+        self.load_scenario(options)
+        self.load_samples(options['users'])
+        self.results = defaultdict(lambda: ([], []))
+        self.lock = threading.Lock()
+        self.deadline = time.monotonic() + options['duration']
+        start = time.monotonic()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            workers = [
+                pool.submit(self.worker)
+                for _ in range(options['concurrency'])
+            ]
+        for worker in workers:
+            worker.result()
+        elapsed = time.monotonic() - start
+        report = {
+            name: summary(durations, statuses, elapsed)
+            for name, (durations, statuses) in sorted(self.results.items())
+        }
+        report['total'] = summary(
+            [d for durations, _ in self.results.values() for d in durations],
+            [s for _, statuses in self.results.values() for s in statuses],
+            elapsed,
+        )
+        self.print_report(report)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline:
+                json.dump(report, baseline, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            self.compare(report, options['baseline'],
+                         options['max_regression'])
+
+    def load_scenario(self, options):
+        if options['log']:
+            steps = read_log(options['log'])
+            replay = itertools.cycle(steps)
+            self.next_step = lambda: next(replay)
+            return
+        scenario = DEFAULT_SCENARIO
+        if options['scenario']:
+            with open(options['scenario']) as scenario_file:
+                scenario = json.load(scenario_file)
+        weights = [step.get('weight', 1) for step in scenario]
+        self.next_step = lambda: random.choices(scenario, weights)[0]
+
+    def load_samples(self, users):
+        bench_users = User.objects.filter(
+            username__regex=BENCH_USERNAME, is_active=True, is_staff=False,
+            is_superuser=False,
+        )
+        tokens = [
+            Token.objects.get_or_create(user=user)[0].key
+            for user in bench_users[:users]
+        ]
+        recipe_count = Recipe.objects.count()
+        self.samples = {
+            'recipe': list(Recipe.objects.values_list('id', flat=True)),
+            'tag': list(Tag.objects.values_list('slug', flat=True)),
+            'prefix': list({
+                name[:3] for name in
+                Ingredient.objects.values_list('name', flat=True)
+            }),
+            'author': list(User.objects.exclude(
+                auth_token__key__in=tokens
+            ).values_list('id', flat=True)[:1000]),
+            'page': list(range(1, max(recipe_count // 6, 1) + 1)),
+        }
+        if not tokens or not all(self.samples.values()):
+            raise CommandError(
+                'Заполните базу: python manage.py fill_bench_data'
+            )
+        self.tokens = tokens
+
+    def worker(self):
+        session = requests.Session()
+        token = random.choice(self.tokens)
+        while time.monotonic() < self.deadline:
+            step = self.next_step()
+            headers = (
+                {'Authorization': f'Token {token}'}
+                if step.get('auth') else {}
+            )
+            values = {
+                name: random.choice(sample)
+                for name, sample in self.samples.items()
+            }
+            for method, path in step['steps']:
+                self.send(session, method, path.format(**values), headers)
+
+    def send(self, session, method, path, headers):
+        start = time.perf_counter()
+        try:
+            status = session.request(
+                method, self.url + path, headers=headers, timeout=30
+            ).status_code
+        except requests.RequestException:
+            status = 0
+        duration = time.perf_counter() - start
+        with self.lock:
+            durations, statuses = self.results[endpoint(method, path)]
+            durations.append(duration)
+            statuses.append(status)
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{"эндпоинт":<50} {"запросов":>8} {"RPS":>8} {"p50":>7} '
+            f'{"p95":>7} {"p99":>7} {"ошибок":>7} {"429":>7}'
+        )
+        for name, row in report.items():
+            self.stdout.write(
+                f'{name:<50} {row["requests"]:>8} {row["rps"]:>8} '
+                f'{row["p50"]:>7} {row["p95"]:>7} {row["p99"]:>7} '
+                f'{row["errors"]:>7} {row["throttled"]:>7}'
+            )
+
+    def compare(self, report, path, max_regression):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = []
+        for name, row in report.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            p95 = (row['p95'] / base['p95'] - 1) * 100 if base['p95'] else 0
+            rps = (1 - row['rps'] / base['rps']) * 100 if base['rps'] else 0
+            self.stdout.write(
+                f'{name}: p95 {p95:+.0f}%, RPS {-rps:+.0f}% '
+                'к базовому прогону'
+            )
+            if max(p95, rps) > max_regression:
+                regressions.append(name)
+        if regressions:
+            raise CommandError(
+                f'Хуже базового прогона: {", ".join(regressions)}'
+            )
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.http import HttpResponseRedirect
+from rest_framework.permissions import SAFE_METHODS
+
+from backend.routers import get_replicas, read_from_replica, wrote_recently
+from recipes.snapshots import snapshot_url
+
+
+class ReplicaReadMixin:
+    """
+    Миксин для представлений, чтения которых можно отдавать репликам.
+    Пользователь, недавно изменявший данные, продолжает читать с primary,
+    чтобы не увидеть устаревшие флаги избранного и списка покупок.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and get_replicas()
+            and not wrote_recently(request.user)
+        ):
+            read_from_replica()
+
+
+class SnapshotListMixin:
+    """
+    Миксин для справочников: полный список (запрос без параметров)
+    отдаётся редиректом на версию снапшота, которую клиент кэширует
+    навсегда. Обычно такие запросы отдаёт nginx, сюда они доходят
+    только после изменения справочника.
+    """
+    snapshot = None
+
+    def list(self, request, *args, **kwargs):
+        if settings.REFERENCE_SNAPSHOTS and not request.query_params:
+            response = HttpResponseRedirect(snapshot_url(self.snapshot))
+            response['Cache-Control'] = 'no-cache'
+            return response
+        return super().list(request, *args, **kwargs)
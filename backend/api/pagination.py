@@ -1,5 +1,32 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    max_page_size = settings.PAGINATION_MAX_LIMIT
+
+
+def encode_cursor(pub_date, recipe_id):
+    """Курсор ленты: дата публикации и id последнего рецепта страницы."""
+    value = f'{pub_date.isoformat()}|{recipe_id}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        pub_date, recipe_id = base64.urlsafe_b64decode(
+            cursor.encode()
+        ).decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        recipe_id = int(recipe_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise NotFound('Неверный курсор')
+    if pub_date is None:
+        raise NotFound('Неверный курсор')
+    return pub_date, recipe_id
@@ -1,10 +1,19 @@
+import json
+
+from django.conf import settings
+from django.urls import reverse
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
 from rest_framework.fields import SerializerMethodField
 
 from recipes.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingList, Tag)
+                            RecipeIngredient, ShoppingList, SimilarRecipe, Tag)
+from recipes.documents import attach_documents
+from recipes.reference import tag_dicts
+from recipes.signals import recipes_changed
+from recipes.validators import recipe_errors
 from users.models import User
 
 
@@ -62,6 +71,8 @@ class CustomUserSerializer(UserSerializer):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return Follow.objects.filter(user=user, author=obj).exists()
 
 
@@ -88,7 +99,9 @@ class FollowSerializer(CustomUserSerializer):
         recipes = obj.recipe.all()
         recipes_limit = request.query_params.get('recipes_limit')
         if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+            recipes = recipes[
+                :min(int(recipes_limit), settings.PAGINATION_MAX_LIMIT)
+            ]
         return ShortRecipeSerializer(recipes, many=True).data
 
 
@@ -101,6 +114,37 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time',)
 
 
+class CookableRecipeSerializer(ShortRecipeSerializer):
+    """
+    Рецепт, подобранный по имеющимся ингредиентам.
+    matched_ingredients - сколько ингредиентов рецепта есть у пользователя,
+    missing_ingredients - сколько не хватает,
+    coverage - доля имеющихся ингредиентов.
+    """
+    matched_ingredients = serializers.IntegerField(read_only=True)
+    missing_ingredients = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(ShortRecipeSerializer.Meta):
+        fields = ShortRecipeSerializer.Meta.fields + (
+            'matched_ingredients', 'missing_ingredients', 'coverage',
+        )
+
+
+class SimilarRecipeSerializer(serializers.ModelSerializer):
+    """
+    Похожий рецепт: краткие сведения о рецепте и оценка сходства.
+    """
+    id = serializers.ReadOnlyField(source='similar.id')
+    name = serializers.ReadOnlyField(source='similar.name')
+    image = serializers.ImageField(source='similar.image', read_only=True)
+    cooking_time = serializers.ReadOnlyField(source='similar.cooking_time')
+
+    class Meta:
+        model = SimilarRecipe
+        fields = ('id', 'name', 'image', 'cooking_time', 'score',)
+
+
 class TagSerializer(serializers.ModelSerializer):
     '''
     Сериализатор для сведений о тэгах.
@@ -152,6 +196,10 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
     is_favorited - показывает есть ли рецепты, находящиеся в списке избранного.
     is_in_shopping_cart - показывает есть ли рецепты,
     находящиеся в списке покупок.
+    В context['fieldset'] можно передать множество выводимых полей,
+    флаги берутся из аннотаций queryset, если они есть.
+    Автор сериализуется один раз на ответ (память в context),
+    теги берутся из общих словарей tag_dicts.
     '''
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
@@ -160,8 +208,8 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
         read_only=True,
         source='ingredient_amount'
     )
-    author = CustomUserSerializer(read_only=True)
-    tags = TagSerializer(many=True, read_only=True)
+    author = serializers.SerializerMethodField(read_only=True)
+    tags = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -178,19 +226,102 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
             'cooking_time',
         )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = self.context.get('fieldset')
+        if fieldset is not None:
+            for name in set(self.fields) - fieldset:
+                self.fields.pop(name)
+
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
+    def memo(self):
+        """
+        Сериализованные авторы и теги, общие для всего ответа,
+        а в пакетном запросе - для всех его подзапросов.
+        """
+        if 'recipe_memo' not in self.context:
+            self.context['recipe_memo'] = getattr(
+                self.context.get('request'), 'recipe_memo', None
+            ) or {'authors': {}, 'tags': None}
+        return self.context['recipe_memo']
+
+    def get_author(self, obj):
+        authors = self.memo()['authors']
+        if obj.author_id not in authors:
+            authors[obj.author_id] = CustomUserSerializer(
+                obj.author, context=self.context
+            ).data
+        return authors[obj.author_id]
+
+    def get_tags(self, obj):
+        memo = self.memo()
+        if memo['tags'] is None:
+            memo['tags'] = tag_dicts()
+        return [
+            memo['tags'].get(tag.pk) or TagSerializer(tag).data
+            for tag in obj.tags.all()
+        ]
+
     def get_is_favorited(self, obj):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return user.favorites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return user.shop_list.filter(recipe=obj).exists()
 
 
+class RecipeDocumentListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        return super().to_representation(attach_documents(list(data)))
+
+
+class RecipeDocumentSerializer(serializers.BaseSerializer):
+    '''
+    Рецепт из готового документа (RecipeDocument) вместо обхода связей,
+    документы списка загружаются одним запросом:
+    ответ совпадает с ShowRecipeSerializer. Поверх документа
+    подставляются флаги пользователя из аннотаций queryset
+    (api.fieldsets.document_recipes) и абсолютный URL изображения.
+    context['fieldset'] ограничивает поля, как у ShowRecipeSerializer.
+    '''
+
+    class Meta:
+        list_serializer_class = RecipeDocumentListSerializer
+
+    def to_representation(self, instance):
+        if not attach_documents([instance]):
+            raise NotFound
+        data = json.loads(instance.document.body)
+        request = self.context.get('request')
+        if data['image'] and request is not None:
+            data['image'] = request.build_absolute_uri(data['image'])
+        data['is_favorited'] = getattr(instance, 'is_favorited', False)
+        data['is_in_shopping_cart'] = getattr(
+            instance, 'is_in_shopping_cart', False
+        )
+        data['author']['is_subscribed'] = getattr(
+            instance, 'author_is_subscribed', False
+        )
+        fieldset = self.context.get('fieldset')
+        if fieldset is None:
+            return data
+        return {name: value for name, value in data.items()
+                if name in fieldset}
+
+
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
     '''
     Сериализатор для избранных рецептов.
@@ -275,44 +406,12 @@ class RecipeSerializer(serializers.ModelSerializer):
         exclude = ('pub_date',)
 
     def validate(self, data):
-        ingredients = data['ingredients']
-        ingredients_list = []
-        for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            if ingredient_id in ingredients_list:
-                raise serializers.ValidationError(
-                    {
-                        'ingredients': 'Данный ингредиент уже есть в рецепте.'
-                    }
-                )
-
-            ingredients_list.append(ingredient_id)
-            amount = ingredient['amount']
-            if int(amount) < 1:
-                raise serializers.ValidationError(
-                    {
-                        'amount': 'В рецепте должен быть хотя бы 1 ингредиент.'
-                    }
-                )
-
-        tags = data['tags']
-        tag_list = []
-        if not tags:
-            raise serializers.ValidationError(
-                {
-                    'tags': 'Для Вашего рецепта нужно указать тэг.'
-                }
-            )
-
-        for tag in tags:
-            if tag in tag_list:
-                raise serializers.ValidationError(
-                    {
-                        'tags': 'Данный тэг неуникален. Укажите другой.'
-                    }
-                )
-            tag_list.append(tag)
-
+        errors = recipe_errors(
+            [(item['id'], item['amount']) for item in data['ingredients']],
+            data['tags']
+        )
+        if errors:
+            raise serializers.ValidationError(errors)
         return data
 
     @staticmethod
@@ -338,6 +437,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         self.create_tags(tags, recipe)
         self.create_ingredients(ingredients, recipe)
+        recipes_changed.send(sender=Recipe, recipe_ids=[recipe.pk])
         return recipe
 
     def to_representation(self, instance):
@@ -350,4 +450,28 @@ class RecipeSerializer(serializers.ModelSerializer):
         RecipeIngredient.objects.filter(recipe=instance).delete()
         self.create_tags(validated_data.pop('tags'), instance)
         self.create_ingredients(validated_data.pop('ingredients'), instance)
-        return super().update(instance, validated_data)
+        recipe = super().update(instance, validated_data)
+        recipes_changed.send(sender=Recipe, recipe_ids=[recipe.pk])
+        return recipe
+
+
+class BatchSerializer(serializers.Serializer):
+    """
+    Пакетный запрос: до BATCH_MAX_REQUESTS относительных URL API
+    (/api/...), каждый выполняется как GET.
+    """
+    urls = serializers.ListField(
+        child=serializers.CharField(max_length=2000),
+        allow_empty=False,
+        max_length=settings.BATCH_MAX_REQUESTS,
+    )
+
+    def validate_urls(self, urls):
+        batch_path = reverse('api:batch')
+        for url in urls:
+            path = url.split('?')[0]
+            if not path.startswith('/api/') or path == batch_path:
+                raise serializers.ValidationError(
+                    f'{url}: нужен URL API вида /api/...'
+                )
+        return urls
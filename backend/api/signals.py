@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+from users.signals import users_updated
+from .authentication import revoke_user
+
+
+def revoke_on_commit(user_ids):
+    """
+    Версия увеличивается после коммита: запись кэша, вычисленная
+    до него по старым данным, получит прежнюю версию.
+    """
+    def revoke():
+        for user_id in user_ids:
+            revoke_user(user_id)
+
+    transaction.on_commit(revoke)
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    """Выход из системы (удаление токена) сбрасывает кэш аутентификации."""
+    revoke_on_commit([instance.user_id])
+
+
+@receiver(post_save, sender=User)
+def revoke_saved_user(sender, instance, update_fields=None, **kwargs):
+    """
+    Смена пароля, деактивация и любые другие изменения пользователя
+    сбрасывают кэш всех его токенов.
+    Обновление только last_login при входе кэш не затрагивает.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    revoke_on_commit([instance.pk])
+
+
+@receiver(users_updated)
+def revoke_updated_users(sender, user_ids, **kwargs):
+    revoke_on_commit(user_ids)
@@ -0,0 +1,79 @@
+from django.core.cache import cache, caches
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.authentication import (CachedTokenAuthentication, revoke_user,
+                                token_cache, token_cache_key, user_versions)
+from users.models import User
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    """Кэш токенов не переживает выход, смену пароля и деактивацию."""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.local.clear()
+        token_cache.versions.clear()
+        user_versions.clear()
+        self.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def me(self):
+        return self.client.get('/api/users/me/').status_code
+
+    def test_cached_request(self):
+        self.assertEqual(self.me(), 200)
+        with self.assertNumQueries(0):
+            CachedTokenAuthentication().authenticate_credentials(
+                self.token.key
+            )
+
+    def test_logout_revokes(self):
+        self.assertEqual(self.me(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/token/logout/')
+        self.assertEqual(self.me(), 401)
+
+    def test_password_change_revokes(self):
+        self.assertEqual(self.me(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/users/set_password/', {
+                'current_password': 'Secret-123',
+                'new_password': 'Other-secret-456',
+            })
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.me(), 401)
+
+    def test_deactivation_revokes(self):
+        self.assertEqual(self.me(), 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.me(), 401)
+
+    def test_queryset_update_revokes(self):
+        self.assertEqual(self.me(), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.me(), 401)
+
+    def test_entry_computed_before_revoke_is_not_used(self):
+        """Запись по данным до деактивации, записанная после неё."""
+        stale = CachedTokenAuthentication().user_values(self.token.key)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        revoke_user(self.user.pk)
+        token_cache.get_or_set(token_cache_key(self.token.key), lambda: stale)
+        self.assertEqual(self.me(), 401)
+
+    def test_password_hash_not_cached(self):
+        self.assertEqual(self.me(), 200)
+        password = self.user.password.encode()
+        shared = caches['default']._cache
+        self.assertTrue(shared)
+        for value in shared.values():
+            self.assertNotIn(password, value)
+        for value, _ in token_cache.local._data.values():
+            self.assertNotIn(self.user.password, value[1])
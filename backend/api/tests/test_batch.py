@@ -0,0 +1,67 @@
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.views import TagsViewSet
+from recipes.models import Tag
+from users.models import User
+
+
+@override_settings(REFERENCE_SNAPSHOTS=False)
+class BatchTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    def batch(self, urls):
+        return self.client.post('/api/batch/', {'urls': urls}, format='json')
+
+    def test_results_match_direct_requests(self):
+        urls = ['/api/users/me/', '/api/tags/', '/api/recipes/?page=1']
+        response = self.batch(urls)
+        self.assertEqual(response.status_code, 200)
+        for url, item in zip(urls, response.json()):
+            direct = self.client.get(url)
+            self.assertEqual(item['status'], direct.status_code)
+            self.assertEqual(item['data'], direct.json())
+
+    def test_user_reused(self):
+        item = self.batch(['/api/users/me/'])
+        self.assertEqual(item.json()[0]['data']['id'], self.user.pk)
+        self.client.credentials()
+        item = self.batch(['/api/users/subscriptions/'])
+        self.assertEqual(item.json()[0]['status'], 401)
+
+    def test_size_limit(self):
+        response = self.batch(['/api/tags/'] * 11)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.batch(['/api/tags/'] * 10).status_code, 200)
+
+    def test_recursion_and_foreign_urls_rejected(self):
+        for url in ('/api/batch/', 'http://example.com/api/tags/'):
+            self.assertEqual(self.batch([url]).status_code, 400)
+
+    def test_failing_subrequest_isolated(self):
+        with mock.patch.object(
+            TagsViewSet, 'list', side_effect=RuntimeError
+        ), self.assertLogs('api.views', 'ERROR'):
+            response = self.batch(['/api/tags/', '/api/users/me/'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['status'] for item in response.json()], [500, 200]
+        )
+
+    def test_non_json_response_rejected(self):
+        response = self.batch(['/api/recipes/download_shopping_cart/'])
+        self.assertEqual(response.json()[0]['status'], 400)
+
+    def test_missing_url(self):
+        response = self.batch(['/api/nope/'])
+        self.assertEqual(response.json()[0]['status'], 404)
@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from backend.cache import TwoTierCache
+
+
+class TwoTierCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.cache = TwoTierCache('test', ttl=60, lock_timeout=1)
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def counted(self, value, delay=0, event=None):
+        def compute():
+            with self.calls_lock:
+                self.calls += 1
+            if event is not None:
+                event.wait(5)
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_cold_key_computed_once(self):
+        compute = self.counted('value', delay=0.2)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(
+                lambda _: self.cache.get_or_set('key', compute), range(8)
+            ))
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_during_refresh(self):
+        full_key = self.cache.make_key('key')
+        cache.set(full_key, ('old', time.time() - 1, 0.01), 60)
+        refreshing = threading.Event()
+        with ThreadPoolExecutor(1) as pool:
+            refresh = pool.submit(
+                self.cache.get_or_set, 'key',
+                self.counted('new', event=refreshing)
+            )
+            while not self.calls:
+                time.sleep(0.01)
+            self.assertEqual(
+                [self.cache.get_or_set('key', self.counted('other'))
+                 for _ in range(5)],
+                ['old'] * 5,
+            )
+            refreshing.set()
+            self.assertEqual(refresh.result(), 'new')
+        self.assertEqual(self.calls, 1)
+        self.cache.local.clear()
+        self.assertEqual(
+            self.cache.get_or_set('key', self.counted('other')), 'new'
+        )
+
+    def test_invalidate_bumps_version(self):
+        self.cache.get_or_set('key', self.counted('old'))
+        version = self.cache.version()
+        self.cache.invalidate()
+        self.assertNotEqual(self.cache.version(), version)
+        self.assertEqual(
+            self.cache.get_or_set('key', self.counted('new')), 'new'
+        )
+        self.assertEqual(self.calls, 2)
+
+    def test_lock_timeout_falls_back_to_compute(self):
+        self.cache.lock_timeout = 0.1
+        cache.add(self.cache.make_key('key') + ':lock', 1, 60)
+        self.assertEqual(
+            self.cache.get_or_set('key', self.counted('value')), 'value'
+        )
+        self.assertEqual(self.calls, 1)
+
+    def test_delete_during_compute_not_lost(self):
+        def compute():
+            self.cache.delete('key')
+            return 'old'
+        self.assertEqual(self.cache.get_or_set('key', compute), 'old')
+        self.assertEqual(
+            self.cache.get_or_set('key', self.counted('new')), 'new'
+        )
+
+    def test_invalidate_during_compute_not_lost(self):
+        """
+        Другой процесс ещё помнит прежнюю версию и не должен
+        прочитать значение, посчитанное до invalidate().
+        """
+        other = TwoTierCache('test', ttl=60, version_ttl=60)
+        other.version()
+
+        def compute():
+            cache.incr(self.cache.version_key)
+            return 'old'
+        self.assertEqual(self.cache.get_or_set('key', compute), 'old')
+        self.assertEqual(other.get_or_set('key', self.counted('new')), 'new')
@@ -0,0 +1,40 @@
+import json
+
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Tag
+from users.models import User
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='Secret-123'
+        )
+        self.client.force_authenticate(admin)
+
+    def export(self, table):
+        response = self.client.get(f'/api/export/{table}/')
+        self.assertEqual(response.status_code, 200)
+        return [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+
+    def test_reference_tables(self):
+        tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                 slug='breakfast')
+        ingredient = Ingredient.objects.create(name='соль',
+                                               measurement_unit='г')
+        self.assertEqual(self.export('tags'), [
+            {'id': tag.pk, 'name': 'Завтрак', 'color': '#E26C2D',
+             'slug': 'breakfast'},
+        ])
+        self.assertEqual(self.export('ingredients'), [
+            {'id': ingredient.pk, 'name': 'соль', 'measurement_unit': 'г'},
+        ])
+
+    def test_unknown_table(self):
+        response = self.client.get('/api/export/unknown/')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.reference import tag_cache
+from users.models import User
+
+
+class RecipeFieldsetTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        tag_cache.local.clear()
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            password='Secret-123'
+        )
+        self.client.force_authenticate(reader)
+        tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+            )
+        ]
+        ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        self.ids = []
+        for i in range(6):
+            recipe = Recipe.objects.create(
+                author=author, name=f'recipe {i}', text='text',
+                cooking_time=5, image='recipes/image.png',
+            )
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=i + 1
+            )
+            self.ids.append(recipe.pk)
+
+    def get(self, query):
+        return self.client.get(f'/api/recipes/?{query}')
+
+    def test_fields_trim_output(self):
+        response = self.get('fields=id,name')
+        self.assertEqual(response.status_code, 200)
+        for recipe in response.json()['results']:
+            self.assertEqual(recipe.keys(), {'id', 'name'})
+        response = self.client.get(
+            f'/api/recipes/{self.ids[0]}/?fields=id&expand=tags'
+        )
+        self.assertEqual(response.json().keys(), {'id', 'tags'})
+        self.assertEqual(len(response.json()['tags']), 2)
+
+    def test_unknown_fields_rejected(self):
+        for query, param in (('fields=id,secret', 'fields'),
+                             ('expand=comments', 'expand')):
+            with self.subTest(query):
+                response = self.get(query)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(param, response.json())
+
+    def test_ids_keep_order(self):
+        ids = [self.ids[3], self.ids[0], self.ids[5]]
+        response = self.get(f'ids={",".join(map(str, ids))}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([recipe['id'] for recipe in response.json()], ids)
+
+    def test_missing_id_not_found(self):
+        missing = max(self.ids) + 1
+        response = self.get(f'ids={self.ids[0]},{missing}')
+        self.assertEqual(response.status_code, 404)
+        self.assertIn(str(missing), response.json()['detail'])
+
+    @override_settings(RECIPE_BATCH_MAX_SIZE=5)
+    def test_ids_limit(self):
+        self.assertEqual(
+            self.get(f'ids={",".join(map(str, self.ids[:5]))}').status_code,
+            200
+        )
+        response = self.get(f'ids={",".join(map(str, self.ids))}')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ids', response.json())
+
+    def test_ids_constant_queries(self):
+        for documents in (True, False):
+            with self.subTest(documents=documents), override_settings(
+                RECIPE_DOCUMENTS=documents
+            ):
+                # Первый запрос строит недостающие документы.
+                ids = ','.join(map(str, self.ids))
+                self.get(f'ids={ids}')
+                with CaptureQueriesContext(connection) as single:
+                    self.get(f'ids={self.ids[0]}')
+                with self.assertNumQueries(len(single)):
+                    response = self.get(f'ids={ids}')
+                self.assertEqual(len(response.json()), len(self.ids))
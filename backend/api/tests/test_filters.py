@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe, Tag
+from recipes.reference import tag_cache
+from users.models import User
+
+
+class RecipeTagFilterTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        tag_cache.local.clear()
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        breakfast = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                       slug='breakfast')
+        lunch = Tag.objects.create(name='Обед', color='#49B64E',
+                                   slug='lunch')
+        self.recipes = {}
+        for name, tags in (('both', (breakfast, lunch)),
+                           ('breakfast', (breakfast,))):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text='text', cooking_time=5,
+                image='recipes/image.png',
+            )
+            recipe.tags.set(tags)
+            self.recipes[name] = recipe.pk
+
+    def recipe_ids(self, query):
+        response = self.client.get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id'] for recipe in response.json()['results']}
+
+    def test_any_and_all(self):
+        self.assertEqual(
+            self.recipe_ids('tags=breakfast&tags=lunch'),
+            set(self.recipes.values()),
+        )
+        self.assertEqual(
+            self.recipe_ids('tags=breakfast&tags=lunch&tags_mode=all'),
+            {self.recipes['both']},
+        )
+
+    def test_unknown_slug(self):
+        response = self.client.get('/api/recipes/?tags=breakfast&tags=nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.json())
@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+from django.core.management import CommandError
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.load_replay import Command, read_log, summary
+from users.models import User
+
+
+class LoadReplayTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='Secret-1'
+        )
+        User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-1'
+        )
+
+    def test_no_bench_users(self):
+        with self.assertRaises(CommandError):
+            Command().load_samples(50)
+        self.assertFalse(Token.objects.exists())
+
+    def test_staff_excluded(self):
+        User.objects.create_user(
+            username='bench1-user-0', email='bench1-user-0@example.com',
+            password='Secret-1', is_staff=True,
+        )
+        with self.assertRaises(CommandError):
+            Command().load_samples(50)
+        self.assertFalse(Token.objects.exists())
+
+    def test_throttled_counted_separately(self):
+        row = summary([0.01] * 4, [200, 429, 429, 500], elapsed=1)
+        self.assertEqual((row['throttled'], row['errors']), (2, 1))
+
+    def test_empty_run(self):
+        row = summary([], [], elapsed=1)
+        self.assertEqual(
+            (row['requests'], row['rps'], row['p95'], row['errors']),
+            (0, 0, 0, 0)
+        )
+
+    def test_log_auth(self):
+        lines = {
+            '/api/recipes/?page=2': ('-', False),
+            '/api/recipes/?page=2&is_favorited=1': ('-', True),
+            '/api/users/subscriptions/': ('-', True),
+            '/api/recipes/download_shopping_cart/': ('-', True),
+            '/api/users/me/': ('-', True),
+            '/api/tags/': ('cook', True),
+        }
+        path = os.path.join(tempfile.mkdtemp(), 'access.log')
+        with open(path, 'w') as log:
+            for url, (user, _) in lines.items():
+                log.write(
+                    f'10.0.0.1 - {user} [19/Oct/2026:10:00:00 +0000] '
+                    f'"GET {url} HTTP/1.1" 200 512 "-" "Mozilla/5.0"\n'
+                )
+            log.write(
+                '10.0.0.1 - - [19/Oct/2026:10:00:01 +0000] '
+                '"POST /api/recipes/1/favorite/ HTTP/1.1" 201 64 "-" "-"\n'
+            )
+        steps = read_log(path)
+        self.assertEqual(
+            [step['auth'] for step in steps],
+            [auth for _, auth in lines.values()] + [True]
+        )
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.pagination import CustomPagination
+from recipes.models import Recipe
+from users.models import User
+
+
+class PageSizeLimitTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        for i in range(3):
+            Recipe.objects.create(
+                author=author, name=f'recipe {i}', text='text',
+                cooking_time=5, image='recipes/image.png',
+            )
+
+    def test_limit_clamped(self):
+        request = Request(APIRequestFactory().get('/', {'limit': 10 ** 6}))
+        self.assertEqual(
+            CustomPagination().get_page_size(request),
+            settings.PAGINATION_MAX_LIMIT
+        )
+
+    def test_oversized_page(self):
+        with mock.patch.object(CustomPagination, 'max_page_size', 2):
+            response = self.client.get('/api/recipes/?limit=1000')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+@override_settings(MEMORY_TRACKING_SAMPLE_RATE=0)
+class MemoryTrackingTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com',
+            password='Secret-123', is_staff=True,
+        )
+        token = Token.objects.create(user=self.admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def get(self, **headers):
+        response = self.client.get('/api/recipes/', **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    @override_settings(MEMORY_TRACKING_ENABLED=False)
+    def test_disabled(self):
+        with mock.patch('backend.middleware.logger') as logger:
+            response = self.get(HTTP_X_MEMORY='1')
+        self.assertNotIn('X-Memory-Peak', response)
+        logger.log.assert_not_called()
+
+    @override_settings(MEMORY_TRACKING_ENABLED=True)
+    def test_flagged_by_staff(self):
+        with self.assertLogs('backend.middleware', 'INFO') as logs:
+            response = self.get(HTTP_X_MEMORY='1')
+        self.assertGreater(int(response['X-Memory-Peak']), 0)
+        self.assertIn('GET /api/recipes/: пик памяти', logs.output[0])
+
+    @override_settings(MEMORY_TRACKING_ENABLED=True)
+    def test_not_flagged(self):
+        with mock.patch('backend.middleware.logger') as logger:
+            response = self.get()
+        self.assertNotIn('X-Memory-Peak', response)
+        logger.log.assert_not_called()
+
+    @override_settings(MEMORY_TRACKING_ENABLED=True)
+    def test_flag_ignored_for_users(self):
+        self.client.credentials()
+        self.assertNotIn('X-Memory-Peak', self.get(HTTP_X_MEMORY='1'))
+
+    @override_settings(
+        MEMORY_TRACKING_ENABLED=True, MEMORY_TRACKING_SAMPLE_RATE=1,
+        MEMORY_TRACKING_THRESHOLD_MB=0,
+    )
+    def test_sampled_over_threshold_logged(self):
+        self.client.credentials()
+        with self.assertLogs('backend.middleware', 'WARNING'):
+            response = self.get()
+        self.assertIn('X-Memory-Peak', response)
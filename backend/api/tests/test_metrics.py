@@ -0,0 +1,121 @@
+import tempfile
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from backend import metrics
+from backend.metrics import Registry
+from users.models import User
+
+
+def sample(metric, *labels):
+    """Текущее значение метрики с метками или None."""
+    for sample_labels, value in metric.samples():
+        if tuple(sample_labels) == labels:
+            return value
+    return None
+
+
+class ExpositionFormatTests(SimpleTestCase):
+
+    def test_render(self):
+        registry = Registry()
+        requests = registry.counter('requests_total', 'Запросы.', ('route',))
+        duration = registry.histogram(
+            'duration_seconds', 'Время.', ('route',), buckets=(0.1, 1.0)
+        )
+        requests.inc('recipes')
+        requests.inc('recipes', amount=2)
+        requests.inc('tags "new"')
+        for value in (0.05, 0.5, 0.5, 3):
+            duration.observe(value, 'recipes')
+        self.assertEqual(registry.render(), '\n'.join([
+            '# HELP duration_seconds Время.',
+            '# TYPE duration_seconds histogram',
+            'duration_seconds_bucket{route="recipes",le="0.1"} 1',
+            'duration_seconds_bucket{route="recipes",le="1.0"} 3',
+            'duration_seconds_bucket{route="recipes",le="+Inf"} 4',
+            'duration_seconds_sum{route="recipes"} 4.05',
+            'duration_seconds_count{route="recipes"} 4',
+            '# HELP requests_total Запросы.',
+            '# TYPE requests_total counter',
+            'requests_total{route="recipes"} 3',
+            'requests_total{route="tags \\"new\\""} 1',
+        ]) + '\n')
+
+    def test_worker_snapshots_summed(self):
+        with override_settings(METRICS_MULTIPROCESS_DIR=tempfile.mkdtemp()):
+            workers = [Registry(), Registry()]
+            for number, registry in enumerate(workers):
+                registry._snapshot_name = f'{number}.json'
+                counter = registry.counter('requests_total', 'Запросы.')
+                counter.inc(amount=number + 1)
+            workers[1].flush()
+            self.assertIn('requests_total 3\n', workers[0].render())
+
+
+@override_settings(REFERENCE_SNAPSHOTS=False)
+class MetricsMiddlewareTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def authenticate(self, **fields):
+        user = User.objects.create_user(
+            username='user', email='user@example.com', password='Secret-123',
+            **fields
+        )
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_request_counted_per_route(self):
+        labels = ('api:recipes-list', 'GET', '200')
+        requests = sample(metrics.http_requests, *labels) or 0
+        durations = sample(
+            metrics.http_request_duration, 'api:recipes-list', 'GET'
+        )
+        durations = durations[2] if durations else 0
+        queries = sample(metrics.db_queries, 'api:recipes-list') or 0
+        self.assertEqual(self.client.get('/api/recipes/').status_code, 200)
+        self.assertEqual(
+            sample(metrics.http_requests, *labels), requests + 1
+        )
+        self.assertEqual(sample(
+            metrics.http_request_duration, 'api:recipes-list', 'GET'
+        )[2], durations + 1)
+        self.assertGreater(
+            sample(metrics.db_queries, 'api:recipes-list'), queries
+        )
+
+    def test_unknown_url_unmatched(self):
+        labels = ('unmatched', 'GET', '404')
+        before = sample(metrics.http_requests, *labels) or 0
+        self.client.get('/api/no-such-page/')
+        self.assertEqual(sample(metrics.http_requests, *labels), before + 1)
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        self.authenticate()
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    def test_exposition(self):
+        self.authenticate(is_staff=True)
+        self.client.get('/api/recipes/')
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Type'],
+            'text/plain; version=0.0.4; charset=utf-8'
+        )
+        body = response.content.decode()
+        self.assertIn('# TYPE http_requests_total counter\n', body)
+        self.assertIn(
+            'http_requests_total{route="api:recipes-list",method="GET",'
+            'status="200"} ', body
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{route="api:recipes-list",'
+            'method="GET",le="+Inf"} ', body
+        )
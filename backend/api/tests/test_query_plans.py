@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from api.management.commands.check_query_plans import SQLITE_SCAN
+from recipes.models import Ingredient, Recipe, ShoppingList
+from users.models import User
+
+
+class CheckQueryPlansTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        recipe = Recipe.objects.create(
+            author=user, name='recipe', text='text', cooking_time=5,
+            image='recipes/image.png',
+        )
+        ShoppingList.objects.create(user=user, recipe=recipe)
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        self.baseline = os.path.join(tempfile.mkdtemp(), 'plans.json')
+
+    def check(self, *args):
+        call_command(
+            'check_query_plans', '--baseline', self.baseline, *args,
+            stdout=StringIO()
+        )
+
+    def test_same_plans_pass(self):
+        self.check('--update')
+        self.check()
+
+    def test_missing_vendor_fails(self):
+        with open(self.baseline, 'w') as baseline:
+            json.dump({'postgresql': {}}, baseline)
+        with self.assertRaisesMessage(CommandError, connection.vendor):
+            self.check()
+
+    def test_missing_query_fails(self):
+        self.check('--update')
+        with open(self.baseline) as baseline:
+            plans = json.load(baseline)
+        del plans[connection.vendor]['favorite_lookup']
+        with open(self.baseline, 'w') as baseline:
+            json.dump(plans, baseline)
+        with self.assertRaisesMessage(CommandError, 'favorite_lookup'):
+            self.check()
+
+
+class SqliteScanTests(SimpleTestCase):
+
+    def test_index_walks_not_scans(self):
+        details = {
+            'SCAN recipes_recipe': 'recipes_recipe',
+            'SCAN TABLE recipes_tag': 'recipes_tag',
+            'SCAN recipes_recipe USING INDEX recipe_popularity_idx': None,
+            'SCAN recipes_recipe USING COVERING INDEX '
+            'recipe_author_pub_date_idx': None,
+            'SCAN CONSTANT ROW': None,
+        }
+        for detail, table in details.items():
+            with self.subTest(detail):
+                match = SQLITE_SCAN.match(detail)
+                self.assertEqual(match and match[1], table)
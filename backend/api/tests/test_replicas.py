@@ -0,0 +1,116 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router, transaction
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from backend.routers import (read_from_replica, reset_replica_reads,
+                             wrote_recently)
+from recipes.models import Recipe
+from users.models import User
+
+REPLICA = 'replica_1'
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Реплика - отдельный файл SQLite, снятый копией основной базы
+    до создания последнего рецепта: чтение с реплики его не видит.
+    """
+
+    def setUp(self):
+        if connections['default'].vendor != 'sqlite':
+            self.skipTest('Реплика собирается копией базы SQLite')
+        self.directory = tempfile.mkdtemp()
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com',
+                password='Secret-123'
+            )
+            for i in range(2)
+        ]
+        self.recipe = self.create_recipe('on replica')
+        path = os.path.join(self.directory, 'replica.sqlite3')
+        connections['default'].ensure_connection()
+        replica = sqlite3.connect(path)
+        connections['default'].connection.backup(replica)
+        replica.close()
+        connections.settings[REPLICA] = {
+            **connections.settings['default'], 'NAME': path,
+        }
+        self.create_recipe('primary only')
+        settings = override_settings(
+            DATABASE_REPLICAS=[REPLICA],
+            CACHES={'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': os.path.join(self.directory, 'cache'),
+            }},
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def tearDown(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(self.directory)
+
+    def create_recipe(self, name):
+        return Recipe.objects.create(
+            author=self.users[0], name=name, text='text', cooking_time=5,
+            image='recipes/image.png',
+        )
+
+    def recipe_count(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['count']
+
+    def test_reads_from_replica(self):
+        self.assertEqual(self.recipe_count(), 1)
+        self.assertEqual(self.recipe_count(self.users[0]), 1)
+
+    def test_sticky_after_write(self):
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        response = client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.recipe_count(self.users[1]), 2)
+        self.assertEqual(self.recipe_count(self.users[0]), 1)
+
+    def test_batch_not_sticky(self):
+        client = APIClient()
+        client.force_authenticate(self.users[1])
+        response = client.post(
+            '/api/batch/', {'urls': ['/api/recipes/', '/api/tags/']},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['data']['count'], 1)
+        self.assertFalse(wrote_recently(self.users[1]))
+        self.assertEqual(self.recipe_count(self.users[1]), 1)
+
+    def test_atomic_block_reads_primary(self):
+        token = read_from_replica()
+        try:
+            self.assertEqual(router.db_for_read(Recipe), REPLICA)
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Recipe), 'default')
+                self.assertEqual(Recipe.objects.count(), 2)
+        finally:
+            reset_replica_reads(token)
+
+    def test_process_local_cache_refused(self):
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}):
+            with self.assertRaises(ImproperlyConfigured):
+                APIClient().get('/api/recipes/')
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from api.serializers import ShowRecipeSerializer
+from recipes.models import Follow, Recipe, Tag
+from recipes.reference import tag_cache
+from users.models import User
+
+
+@override_settings(RECIPE_DOCUMENTS=False)
+class RecipeMemoTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        tag_cache.local.clear()
+        tag_cache.versions.clear()
+        *self.authors, self.reader = [
+            User.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com',
+                password='Secret-123'
+            )
+            for i in range(3)
+        ]
+        tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+            )
+        ]
+        for i in range(6):
+            recipe = Recipe.objects.create(
+                author=self.authors[i % 2], name=f'recipe {i}', text='text',
+                cooking_time=5, image='recipes/image.png',
+            )
+            recipe.tags.set(tags)
+
+    def serialize(self, user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        recipes = Recipe.objects.select_related('author').prefetch_related(
+            'tags'
+        ).order_by('pk')
+        return ShowRecipeSerializer(recipes, many=True, context={
+            'request': request, 'fieldset': {'id', 'author', 'tags'},
+        }).data
+
+    def test_authors_and_tags_serialized_once(self):
+        # Рецепты с тегами, словари тегов и по одной проверке
+        # подписки на каждого из двух авторов, а не на каждый рецепт.
+        with self.assertNumQueries(5):
+            data = self.serialize(self.reader)
+        self.assertIs(data[0]['author'], data[2]['author'])
+        self.assertIsNot(data[0]['author'], data[1]['author'])
+        self.assertIs(data[0]['tags'][0], data[1]['tags'][0])
+
+    def test_memo_not_shared_between_serializers(self):
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        self.assertTrue(self.serialize(self.reader)[0]['author'][
+            'is_subscribed'
+        ])
+        self.assertFalse(self.serialize(self.authors[1])[0]['author'][
+            'is_subscribed'
+        ])
+
+    def test_memo_not_shared_between_requests(self):
+        self.client.force_authenticate(self.reader)
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        recipe = self.client.get('/api/recipes/?author={}'.format(
+            self.authors[0].pk
+        )).json()['results'][0]
+        self.assertTrue(recipe['author']['is_subscribed'])
+        Follow.objects.all().delete()
+        recipe = self.client.get('/api/recipes/?author={}'.format(
+            self.authors[0].pk
+        )).json()['results'][0]
+        self.assertFalse(recipe['author']['is_subscribed'])
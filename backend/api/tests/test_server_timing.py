@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from users.models import User
+
+
+@override_settings(SERVER_TIMING=True)
+class ServerTimingTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, user=None):
+        if user is not None:
+            token = Token.objects.create(user=user)
+            self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_hidden_from_users(self):
+        self.assertNotIn('Server-Timing', self.get())
+        user = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        self.assertNotIn('Server-Timing', self.get(user))
+
+    def test_shown_to_staff(self):
+        admin = User.objects.create_user(
+            username='admin', email='admin@example.com',
+            password='Secret-123', is_staff=True,
+        )
+        self.assertIn('db;dur=', self.get(admin)['Server-Timing'])
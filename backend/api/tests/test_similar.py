@@ -0,0 +1,47 @@
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, SimilarRecipe
+from recipes.similarity import update_similar_recipes
+from users.models import User
+
+
+class SimilarRecipesTests(APITestCase):
+
+    def setUp(self):
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        ingredients = [
+            Ingredient.objects.create(name=f'ingredient {i}',
+                                      measurement_unit='g')
+            for i in range(5)
+        ]
+        self.recipes = []
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                author=author, name=f'recipe {i}', text='text',
+                cooking_time=5, image='recipes/image.png',
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=1)
+                for ingredient in ingredients
+            )
+            self.recipes.append(recipe.pk)
+
+    def test_non_numeric_id_not_found(self):
+        response = self.client.get('/api/recipes/abc/similar/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_identical_recipes_similar(self):
+        update_similar_recipes(self.recipes)
+        response = self.client.get(f'/api/recipes/{self.recipes[0]}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    @override_settings(SIMILAR_BUCKET_LIMIT=2)
+    def test_oversized_buckets_skipped(self):
+        """Все три рецепта в общих корзинах больше лимита."""
+        update_similar_recipes(self.recipes)
+        self.assertFalse(SimilarRecipe.objects.exists())
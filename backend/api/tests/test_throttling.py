@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from api.throttling import local_blocks, local_windows
+
+
+class LoginThrottleTests(APITestCase):
+    """Ограничение частоты входа по адресу клиента (login: 10/min)."""
+
+    def setUp(self):
+        cache.clear()
+        local_blocks.clear()
+        local_windows.clear()
+
+    def login(self, forwarded_for):
+        return self.client.post(
+            '/api/auth/token/login/',
+            {'email': 'nobody@example.com', 'password': 'wrong'},
+            HTTP_X_FORWARDED_FOR=forwarded_for,
+        ).status_code
+
+    def test_same_client_throttled(self):
+        statuses = [self.login('203.0.113.5') for _ in range(12)]
+        self.assertEqual(statuses, [400] * 10 + [429] * 2)
+
+    def test_rotated_forwarded_for_throttled(self):
+        """
+        nginx дописывает адрес клиента в конец X-Forwarded-For,
+        подставленные клиентом адреса не обходят ограничение.
+        """
+        statuses = [
+            self.login(f'10.0.0.{i}, 203.0.113.5') for i in range(12)
+        ]
+        self.assertEqual(statuses, [400] * 10 + [429] * 2)
+
+    def test_clients_throttled_separately(self):
+        for _ in range(10):
+            self.login('203.0.113.5')
+        self.assertEqual(self.login('203.0.113.6'), 400)
@@ -0,0 +1,116 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from backend import metrics
+from backend.cache import LocalLRUCache
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Счётчики закончившихся окон больше не меняются - их можно держать
+# в процессе; заблокированные клиенты отклоняются без обращения к кэшу.
+local_windows = LocalLRUCache(maxsize=settings.THROTTLE_LOCAL_SIZE)
+local_blocks = LocalLRUCache(maxsize=settings.THROTTLE_LOCAL_SIZE)
+
+parsed_rates = {}
+
+
+def parse_rate(rate):
+    """'100/min' -> (100, 60); разбирается один раз."""
+    if rate not in parsed_rates:
+        num, period = rate.split('/')
+        parsed_rates[rate] = (int(num), PERIODS[period[0]])
+    return parsed_rates[rate]
+
+
+def incr(key, timeout):
+    """Атомарное увеличение счётчика в общем кэше."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Ограничение частоты по приближённому скользящему окну: в общем
+    кэше хранятся только счётчики текущего и предыдущего окна,
+    а число запросов за последние duration секунд оценивается как
+    current + previous * (доля предыдущего окна, ещё попадающая
+    в скользящее). Проверка - одно атомарное incr в общем кэше
+    вместо чтения и перезаписи списка времён запросов.
+
+    Область ограничения берётся из view.throttle_scopes по действию
+    или из view.throttle_scope, частота - из DEFAULT_THROTTLE_RATES.
+    Пользователь ограничивается по id, аноним - по IP-адресу.
+    Представления без области не ограничиваются.
+    """
+
+    def get_scope(self, view):
+        scopes = getattr(view, 'throttle_scopes', None)
+        if scopes and getattr(view, 'action', None) in scopes:
+            return scopes[view.action]
+        return getattr(view, 'throttle_scope', None)
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        num_requests, duration = parse_rate(rate)
+        user = request.user
+        ident = (
+            user.pk if user and user.is_authenticated
+            else self.get_ident(request)
+        )
+        key = f'throttle:{scope}:{ident}'
+        now = time.time()
+        blocked_until = local_blocks.get(key)
+        if blocked_until is not None:
+            return self.reject(scope, blocked_until - now)
+        window, elapsed = divmod(now, duration)
+        window = int(window)
+        previous = local_windows.get(f'{key}:{window - 1}')
+        if previous is None:
+            previous = cache.get(f'{key}:{window - 1}', 0)
+            local_windows.set(
+                f'{key}:{window - 1}', previous, duration - elapsed
+            )
+        weight = 1 - elapsed / duration
+        current = incr(f'{key}:{window}', duration * 2)
+        if current + previous * weight <= num_requests:
+            return True
+        # Отклонённый запрос не должен занимать место в окне.
+        cache.decr(f'{key}:{window}')
+        wait = self.wait_time(
+            num_requests, duration, elapsed, current - 1, previous
+        )
+        local_blocks.set(key, now + wait, wait)
+        return self.reject(scope, wait)
+
+    @staticmethod
+    def wait_time(num_requests, duration, elapsed, current, previous):
+        """
+        Через сколько секунд оценка опустится ниже лимита: в текущем
+        окне - по мере того, как уходит вклад предыдущего, иначе -
+        в начале следующего окна.
+        """
+        if current < num_requests and previous:
+            # current + previous * (1 - t / duration) <= num_requests - 1
+            moment = duration * (1 - (num_requests - 1 - current) / previous)
+            if moment < duration:
+                return max(moment - elapsed, 0.001)
+        return duration - elapsed
+
+    def reject(self, scope, wait):
+        self.retry_after = wait
+        metrics.throttled_requests.inc(scope)
+        return False
+
+    def wait(self):
+        return self.retry_after
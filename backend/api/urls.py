@@ -1,8 +1,10 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (CustomUserViewSet, FollowListView, FollowViewSet,
-                       IngredientsViewSet, RecipeViewSet, TagsViewSet)
+from api.views import (BatchView, CustomUserViewSet, ExportView,
+                       FollowListView, FollowViewSet, IngredientsViewSet,
+                       MetricsView, RecipeViewSet, TagsViewSet,
+                       ThrottledTokenCreateView)
 
 app_name = 'api'
 
@@ -15,6 +17,9 @@ router.register('tags', TagsViewSet, basename='tags')
 
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('export/<str:table>/', ExportView.as_view(), name='export'),
     path(
         'users/subscriptions/',
         FollowListView.as_view(),
@@ -27,5 +32,10 @@ urlpatterns = [
     ),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
+    re_path(
+        r'^auth/token/login/?$',
+        ThrottledTokenCreateView.as_view(),
+        name='login'
+    ),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,27 +1,46 @@
+import copy
+import logging
+
+from django.conf import settings
+from django.db import router
 from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, QueryDict, StreamingHttpResponse
+from django.urls import Resolver404, resolve
 from django_filters.rest_framework import DjangoFilterBackend
-from djoser.views import UserViewSet
+from djoser.views import TokenCreateView, UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import ListAPIView, get_object_or_404
-from rest_framework.permissions import (SAFE_METHODS, AllowAny,
+from rest_framework.permissions import (SAFE_METHODS, AllowAny, IsAdminUser,
                                         IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from api.pagination import CustomPagination
+from api.fieldsets import (RECIPE_RELATIONS, document_recipes, list_param,
+                           optimize_recipes, recipe_fieldset)
+from api.mixins import ReplicaReadMixin, SnapshotListMixin
+from api.pagination import CustomPagination, decode_cursor, encode_cursor
 from api.serializers import CustomUserSerializer, FollowSerializer
+from recipes.export import EXPORT_TABLES, export_rows, ndjson_chunks
+from recipes.feed import feed_page
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingList, Tag)
+                            RecipeIngredient, ShoppingList, SimilarRecipe, Tag)
+from backend.metrics import registry
 from users.models import User
 from .filters import IngredientFilter, RecipeFilter
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (FavoriteRecipeSerializer, IngredientSerializer,
-                          RecipeSerializer, ShoppingListSerializer,
-                          ShowRecipeSerializer, TagSerializer)
+from .serializers import (BatchSerializer, CookableRecipeSerializer,
+                          FavoriteRecipeSerializer, IngredientSerializer,
+                          RecipeDocumentSerializer, RecipeSerializer,
+                          ShoppingListSerializer, ShowRecipeSerializer,
+                          SimilarRecipeSerializer, TagSerializer)
+
+logger = logging.getLogger(__name__)
 
 
 class CustomUserViewSet(UserViewSet):
@@ -34,6 +53,11 @@ class CustomUserViewSet(UserViewSet):
     pagination_class = CustomPagination
 
 
+class ThrottledTokenCreateView(TokenCreateView):
+    """Получение токена djoser с ограничением частоты попыток входа."""
+    throttle_scope = 'login'
+
+
 class FollowViewSet(APIView):
     """
     APIView для добавления и удаления подписки на автора.
@@ -87,7 +111,7 @@ class FollowViewSet(APIView):
         )
 
 
-class FollowListView(ListAPIView):
+class FollowListView(ReplicaReadMixin, ListAPIView):
     """
     ListAPIView для вывода полей модели - подписок пользователя.
     """
@@ -100,7 +124,7 @@ class FollowListView(ListAPIView):
         return User.objects.all().filter(following__user=author)
 
 
-class TagsViewSet(ReadOnlyModelViewSet):
+class TagsViewSet(SnapshotListMixin, ReplicaReadMixin, ReadOnlyModelViewSet):
     """
     ViewSet для работы с тегами.
     """
@@ -108,9 +132,11 @@ class TagsViewSet(ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
     serializer_class = TagSerializer
     pagination_class = None
+    snapshot = 'tags'
 
 
-class IngredientsViewSet(ReadOnlyModelViewSet):
+class IngredientsViewSet(SnapshotListMixin, ReplicaReadMixin,
+                         ReadOnlyModelViewSet):
     """
     ViewSet для работы с ингредиентами.
     Есть возможность поиска по имени.
@@ -121,9 +147,10 @@ class IngredientsViewSet(ReadOnlyModelViewSet):
     filter_backends = [IngredientFilter]
     pagination_class = None
     search_fields = ('^name',)
+    snapshot = 'ingredients'
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, ModelViewSet):
     """
     ViewSet для работы с рецептами.
     Для неавторизованных пользователей доступен только просмотр рецептов.
@@ -133,14 +160,99 @@ class RecipeViewSet(ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     pagination_class = CustomPagination
+    # Нечисловой id (recipes/abc/similar/) - 404 на уровне маршрута.
+    lookup_value_regex = r'\d+'
+    fieldset = None
+    throttle_scopes = {
+        'create': 'recipe_create',
+        'favorite': 'favorite',
+        'delete_favorite': 'favorite',
+        'shopping_cart': 'shopping_cart',
+        'delete_shopping_cart': 'shopping_cart',
+        'download_shopping_cart': 'download_shopping_cart',
+    }
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in ('list', 'retrieve'):
+            self.fieldset = recipe_fieldset(request)
+
+    def uses_documents(self):
+        """
+        Готовые документы рецептов (RECIPE_DOCUMENTS) выгодны, когда
+        выводится хоть одна связь; простые поля дешевле читать
+        из таблицы рецептов.
+        """
+        return settings.RECIPE_DOCUMENTS and (
+            self.fieldset is None
+            or bool(self.fieldset & RECIPE_RELATIONS.keys())
+        )
+
+    def get_queryset(self):
+        """
+        Список и рецепт читаются из готовых документов рецептов
+        или загружают только поля из ?fields= и связи из ?expand=
+        (без параметров - все).
+        """
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        if self.uses_documents():
+            return document_recipes(
+                queryset, self.fieldset, self.request.user
+            )
+        return optimize_recipes(queryset, self.fieldset, self.request.user)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.fieldset
+        return context
+
+    def list(self, request, *args, **kwargs):
+        """
+        ?ids=1,2,3 - рецепты с этими id одним ответом без пагинации,
+        в порядке перечисления; если какого-то нет - 404.
+        """
+        ids = list_param(request, 'ids')
+        if ids is None:
+            return super().list(request, *args, **kwargs)
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in ids))
+        except ValueError:
+            raise ValidationError(
+                {'ids': 'Укажите id рецептов через запятую.'}
+            )
+        if len(ids) > settings.RECIPE_BATCH_MAX_SIZE:
+            raise ValidationError({
+                'ids': f'Не больше {settings.RECIPE_BATCH_MAX_SIZE} рецептов.'
+            })
+        recipes = self.filter_queryset(self.get_queryset()).in_bulk(ids)
+        missing = [str(pk) for pk in ids if pk not in recipes]
+        if missing:
+            raise NotFound(f'Рецепты не найдены: {", ".join(missing)}.')
+        return Response(self.get_serializer(
+            [recipes[pk] for pk in ids], many=True
+        ).data)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
     def get_serializer_class(self):
-        if self.request.method in SAFE_METHODS:
-            return ShowRecipeSerializer
-        return RecipeSerializer
+        if self.request.method not in SAFE_METHODS:
+            return RecipeSerializer
+        if self.uses_documents():
+            return RecipeDocumentSerializer
+        return ShowRecipeSerializer
+
+    @staticmethod
+    def shopping_cart_ingredients(user):
+        """Ингредиенты рецептов из списка покупок с суммой количеств."""
+        return RecipeIngredient.objects.filter(
+            recipe__shop_list__user=user
+        ).values(
+            'ingredient__name',
+            'ingredient__measurement_unit'
+        ).annotate(ingredient_amount=Sum('amount')).order_by()
 
     @staticmethod
     def post_method_for_actions(request, pk, serializers):
@@ -192,12 +304,7 @@ class RecipeViewSet(ModelViewSet):
     )
     def download_shopping_cart(self, request):
         user = request.user
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shop_list__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount')).order_by()
+        ingredients = self.shopping_cart_ingredients(user)
 
         shopping_list = (
             f'Список покупок для: {user.get_full_name()}\n\n'
@@ -214,3 +321,236 @@ class RecipeViewSet(ModelViewSet):
         response['Content-Disposition'] = f'attachment; filename={filename}'
 
         return response
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(AllowAny,)
+    )
+    def what_to_cook(self, request):
+        """
+        Рецепты, которые можно приготовить из имеющихся ингредиентов:
+        ?ingredients=1,2,3&limit=20. Подбираются по индексу
+        ингредиент -> рецепты в памяти процесса, сортируются по доле
+        имеющихся ингредиентов и числу недостающих.
+        """
+        values = ','.join(request.query_params.getlist('ingredients'))
+        try:
+            ingredient_ids = [
+                int(value) for value in values.split(',') if value.strip()
+            ]
+            limit = int(request.query_params.get(
+                'limit', settings.WHAT_TO_COOK_LIMIT
+            ))
+        except ValueError:
+            raise ValidationError(
+                {'error': 'id ингредиентов и limit должны быть числами'}
+            )
+        if not ingredient_ids:
+            raise ValidationError({'error': 'Укажите ингредиенты'})
+        limit = max(1, min(limit, settings.WHAT_TO_COOK_MAX_LIMIT))
+        matches = ingredient_index.search(ingredient_ids, limit)
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for recipe_id, _, _ in matches]
+        )
+        result = []
+        for recipe_id, matched, total in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.matched_ingredients = matched
+            recipe.missing_ingredients = total - matched
+            recipe.coverage = round(matched / total, 4)
+            result.append(recipe)
+        return Response(CookableRecipeSerializer(
+            result, many=True, context={'request': request}
+        ).data)
+
+    @action(
+        detail=True,
+        methods=['GET'],
+        permission_classes=(AllowAny,)
+    )
+    def similar(self, request, pk):
+        """
+        Похожие рецепты из таблицы, пересчитываемой при сохранении
+        рецептов и командой build_similar_recipes.
+        """
+        similar = SimilarRecipe.objects.filter(
+            recipe_id=pk
+        ).select_related('similar')
+        if not similar and not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        return Response(SimilarRecipeSerializer(
+            similar, many=True, context={'request': request}
+        ).data)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """
+        Лента рецептов авторов из подписок пользователя, новые сверху.
+        Курсорная пагинация: ?limit=10, ссылка на следующую страницу
+        в поле next.
+        """
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.FEED_PAGE_SIZE
+            ))
+        except ValueError:
+            limit = settings.FEED_PAGE_SIZE
+        limit = max(1, min(limit, settings.FEED_MAX_PAGE_SIZE))
+        cursor = request.query_params.get('cursor')
+        recipe_ids, next_cursor = feed_page(
+            request.user, decode_cursor(cursor) if cursor else None, limit
+        )
+        recipes = Recipe.objects.all()
+        if self.uses_documents():
+            recipes = document_recipes(recipes, None, request.user)
+        else:
+            recipes = optimize_recipes(recipes, None, request.user)
+        recipes = recipes.in_bulk(recipe_ids)
+        next_url = None
+        if next_cursor is not None:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'cursor',
+                encode_cursor(*next_cursor)
+            )
+        return Response({
+            'next': next_url,
+            'results': self.get_serializer(
+                [recipes[pk] for pk in recipe_ids if pk in recipes],
+                many=True
+            ).data,
+        })
+
+
+class MetricsView(APIView):
+    """
+    APIView с метриками всех воркеров в текстовом формате Prometheus.
+    Доступно только персоналу.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(
+            registry.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+
+class ExportView(ReplicaReadMixin, APIView):
+    """
+    Потоковая выгрузка таблицы в NDJSON: export/recipes/?gzip=1.
+    Строки читаются из базы пачками и сразу отправляются клиенту.
+    Тело отдаётся уже после выхода из представления, когда чтение
+    с реплик для запроса сброшено, поэтому база (реплика) выбирается
+    здесь и фиксируется для всех запросов выгрузки.
+    Доступно только персоналу.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, table):
+        if table not in EXPORT_TABLES:
+            raise Http404
+        model, _ = EXPORT_TABLES[table]
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        response = StreamingHttpResponse(
+            ndjson_chunks(
+                export_rows(table, using=router.db_for_read(model)),
+                compress
+            ),
+            content_type=(
+                'application/gzip' if compress else 'application/x-ndjson'
+            )
+        )
+        filename = f'{table}.ndjson' + ('.gz' if compress else '')
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
+
+
+class BatchView(APIView):
+    """
+    Несколько GET-запросов к API одним запросом:
+    POST batch/ {"urls": ["/api/users/me/", "/api/tags/"]}.
+    Подзапросы выполняются по порядку через resolver, без middleware
+    и повторной аутентификации: пользователь берётся из пакетного
+    запроса, сериализованные авторы и теги рецептов общие для всех
+    подзапросов. Ответ - список {"url", "status", "data"}, для
+    редиректов (снапшоты справочников) - ещё "location". Необработанная
+    ошибка подзапроса даёт статус 500 только в его элементе, ответы
+    не в JSON (скачивание списка покупок) - 400. Пакет ничего
+    не пишет, поэтому не переключает пользователя на primary.
+    """
+    permission_classes = (AllowAny,)
+    replica_sticky = False
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        memo = {'authors': {}, 'tags': None}
+        return Response([
+            self.get_url(request, url, memo)
+            for url in serializer.validated_data['urls']
+        ])
+
+    @staticmethod
+    def subrequest(request, path, query, memo):
+        """GET-копия HttpRequest пакетного запроса с уже известным user."""
+        subrequest = copy.copy(request._request)
+        subrequest.method = 'GET'
+        subrequest.path = subrequest.path_info = path
+        subrequest.META = dict(
+            request.META, REQUEST_METHOD='GET', PATH_INFO=path,
+            QUERY_STRING=query, CONTENT_LENGTH='0', CONTENT_TYPE='',
+        )
+        subrequest.GET = QueryDict(query)
+        if request.user.is_authenticated:
+            subrequest._force_auth_user = request.user
+            subrequest._force_auth_token = request.auth
+        subrequest.recipe_memo = memo
+        return subrequest
+
+    def get_url(self, request, url, memo):
+        path, _, query = url.partition('?')
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return self.error(
+                url, status.HTTP_404_NOT_FOUND, 'Страница не найдена.'
+            )
+        try:
+            response = match.func(
+                self.subrequest(request, path, query, memo),
+                *match.args, **match.kwargs
+            )
+        except Exception:
+            logger.exception('Ошибка подзапроса пакета %s', url)
+            return self.error(
+                url, status.HTTP_500_INTERNAL_SERVER_ERROR,
+                'Ошибка сервера.'
+            )
+        if hasattr(response, 'data'):
+            return {
+                'url': url,
+                'status': response.status_code,
+                'data': response.data,
+            }
+        if response.has_header('Location'):
+            return {
+                'url': url,
+                'status': response.status_code,
+                'data': None,
+                'location': response['Location'],
+            }
+        return self.error(
+            url, status.HTTP_400_BAD_REQUEST,
+            'Ответ не в JSON, его нельзя получить в пакете.'
+        )
+
+    @staticmethod
+    def error(url, code, detail):
+        return {'url': url, 'status': code, 'data': {'detail': detail}}
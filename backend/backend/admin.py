@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    """
+    Количество строк запроса. Для запроса без условий на PostgreSQL
+    берётся оценка планировщика из pg_class.reltuples, если она больше
+    ADMIN_ESTIMATED_COUNT_THRESHOLD, иначе выполняется точный COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+            return int(row[0])
+    return queryset.count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который не считает все строки большой таблицы."""
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
+
+
+class BaseAdmin(admin.ModelAdmin):
+    """
+    Список без точного подсчёта строк: пагинатор берёт оценку,
+    а «N из M» со вторым COUNT(*) по всей таблице не выводится.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,215 @@
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+from backend import metrics
+
+MISSING = object()
+# Интервал опроса общего кэша в ожидании чужого вычисления, секунды.
+WAIT_INTERVAL = 0.02
+
+
+class LocalLRUCache:
+    """
+    Потокобезопасный LRU-кэш в памяти процесса.
+    Размер ограничен maxsize, записи живут не дольше ttl секунд.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache:
+    """
+    Двухуровневый кэш пространства имён namespace: LRU процесса
+    перед общим кэшем Django.
+
+    Ключи содержат версию пространства, invalidate() увеличивает её
+    одним incr - старые записи больше не читаются и истекают сами.
+    Версию процессы перечитывают не реже раз в version_ttl секунд.
+
+    Значение в общем кэше живёт ttl секунд и ещё stale_ttl хранится
+    устаревшим. Пересчитывает значение только процесс, взявший
+    блокировку ключа (cache.add): остальные при промахе ждут
+    результат, а при устаревшем значении сразу получают его.
+    Чтобы горячий ключ не истекал у всех одновременно, его пересчёт
+    начинается заранее с вероятностью, растущей к концу ttl
+    и пропорциональной времени вычисления (XFetch, параметр beta).
+
+    delete() оставляет метку удаления ключа. Значение, вычисление
+    которого началось до delete() или invalidate(), в кэш
+    не записывается: оно могло быть посчитано по старым данным.
+    """
+
+    def __init__(self, namespace, ttl, stale_ttl=None, local_ttl=5,
+                 local_size=1024, version_ttl=1, beta=1.0, lock_timeout=10,
+                 alias='default'):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self.version_ttl = version_ttl
+        self.beta = beta
+        self.lock_timeout = lock_timeout
+        self.alias = alias
+        self.local = LocalLRUCache(local_size, local_ttl)
+        self.versions = LocalLRUCache(1, version_ttl)
+        self.version_key = f'{namespace}:version'
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def version(self):
+        """
+        Версия пространства имён. Если ключ потерян, новая версия
+        берётся по текущему времени, чтобы не совпасть со старыми.
+        """
+        version = self.versions.get(self.version_key)
+        if version is None:
+            version = self.shared.get(self.version_key)
+            if version is None:
+                self.shared.add(self.version_key, time.time_ns(), None)
+                version = self.shared.get(self.version_key)
+            self.versions.set(self.version_key, version)
+        return version
+
+    def make_key(self, key, version=None):
+        if version is None:
+            version = self.version()
+        return f'{self.namespace}:{version}:{key}'
+
+    def invalidate(self):
+        """Сбрасывает всё пространство имён за O(1)."""
+        try:
+            self.shared.incr(self.version_key)
+        except ValueError:
+            self.shared.set(self.version_key, time.time_ns(), None)
+        self.versions.clear()
+        self.local.clear()
+
+    def delete(self, key):
+        full_key = self.make_key(key)
+        self.shared.set(
+            full_key + ':deleted', time.time_ns(),
+            self.ttl + self.stale_ttl
+        )
+        self.local.delete(full_key)
+        self.shared.delete(full_key)
+
+    def changed(self, full_key, version, started):
+        """
+        Сброшено ли значение после started: версия пространства
+        отличается от version (или потеряна) либо ключ удалён.
+        """
+        marks = self.shared.get_many(
+            [self.version_key, full_key + ':deleted']
+        )
+        if marks.get(self.version_key) != version:
+            self.versions.clear()
+            return True
+        return marks.get(full_key + ':deleted', 0) >= started
+
+    def expired(self, expires, delta):
+        """Истекло ли значение с учётом вероятностного раннего пересчёта."""
+        early = delta * self.beta * -math.log(1 - random.random())
+        return time.time() + early >= expires
+
+    def get_or_set(self, key, compute):
+        """Значение ключа; при необходимости вычисляет его compute()."""
+        version = self.version()
+        full_key = self.make_key(key, version)
+        value = self.local.get(full_key, MISSING)
+        if value is not MISSING:
+            metrics.cache_requests.inc(self.namespace, 'local_hit')
+            return value
+        entry = self.shared.get(full_key)
+        if entry is not None and not self.expired(entry[1], entry[2]):
+            metrics.cache_requests.inc(self.namespace, 'shared_hit')
+            self.local.set(full_key, entry[0])
+            return entry[0]
+        lock_key = full_key + ':lock'
+        locked = self.shared.add(lock_key, 1, self.lock_timeout)
+        if not locked:
+            result = 'stale'
+            if entry is None:
+                result = 'wait'
+                entry = self.wait(full_key)
+            if entry is not None:
+                metrics.cache_requests.inc(self.namespace, result)
+                return entry[0]
+        metrics.cache_requests.inc(self.namespace, 'miss')
+        try:
+            return self.compute(full_key, compute, version)
+        finally:
+            if locked:
+                self.shared.delete(lock_key)
+
+    def compute(self, full_key, compute, version):
+        started = time.time_ns()
+        start = time.perf_counter()
+        value = compute()
+        delta = time.perf_counter() - start
+        metrics.cache_compute_duration.observe(delta, self.namespace)
+        if self.changed(full_key, version, started):
+            metrics.cache_requests.inc(self.namespace, 'discarded')
+            return value
+        self.shared.set(
+            full_key, (value, time.time() + self.ttl, delta),
+            self.ttl + self.stale_ttl
+        )
+        self.local.set(full_key, value)
+        return value
+
+    def wait(self, full_key):
+        """
+        Ждёт, пока значение вычислит процесс, взявший блокировку.
+        Если он не успел за lock_timeout, возвращает None.
+        """
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            entry = self.shared.get(full_key)
+            if entry is not None:
+                return entry
+        return None
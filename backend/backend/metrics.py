@@ -0,0 +1,292 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class Metric:
+    """
+    Базовая метрика с метками.
+    Значения хранятся в словаре по кортежу меток,
+    каждое обновление - короткая операция под блокировкой метрики.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        with self._lock:
+            return [
+                [list(labels), self.copy_value(value)]
+                for labels, value in self._values.items()
+            ]
+
+    @staticmethod
+    def copy_value(value):
+        return value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Histogram(Metric):
+    """
+    Гистограмма: значение для набора меток - [счётчики корзин, сумма, число].
+    Счётчики корзин не накопительные, суммируются при выводе.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0
+                ]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @staticmethod
+    def copy_value(value):
+        return [list(value[0]), value[1], value[2]]
+
+
+class Registry:
+    """
+    Реестр метрик процесса.
+    В многопроцессном режиме (METRICS_MULTIPROCESS_DIR) каждый воркер
+    gunicorn периодически сохраняет снимок своих метрик в отдельный файл,
+    а эндпоинт метрик суммирует снимки всех воркеров.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self._last_flush = 0.0
+        self._snapshot_name = f'{os.getpid()}-{time.time():.0f}.json'
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), **kwargs):
+        return self.register(
+            Histogram(name, documentation, labelnames, **kwargs)
+        )
+
+    def add_collector(self, collector):
+        """
+        Коллектор - функция, возвращающая метрики, вычисляемые
+        в момент выдачи (например, размер очереди): список кортежей
+        (имя, тип, описание, [(словарь меток, значение)]).
+        Значения коллекторов не суммируются между процессами.
+        """
+        self.collectors.append(collector)
+        return collector
+
+    def snapshot(self):
+        return {
+            name: {
+                'type': metric.type,
+                'help': metric.documentation,
+                'labelnames': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', ())),
+                'samples': metric.samples(),
+            }
+            for name, metric in self.metrics.items()
+        }
+
+    @staticmethod
+    def directory():
+        return getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+
+    def maybe_flush(self):
+        now = time.monotonic()
+        if (
+            not self.directory()
+            or now - self._last_flush < settings.METRICS_FLUSH_INTERVAL
+        ):
+            return
+        self._last_flush = now
+        self.flush()
+
+    def flush(self):
+        directory = self.directory()
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self._snapshot_name)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Снимок этого процесса, сложенный со снимками остальных."""
+        merged = self.snapshot()
+        directory = self.directory()
+        if directory and os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                if (
+                    not entry.name.endswith('.json')
+                    or entry.name == self._snapshot_name
+                ):
+                    continue
+                try:
+                    with open(entry.path) as snapshot_file:
+                        merge_snapshots(merged, json.load(snapshot_file))
+                except (OSError, ValueError):
+                    continue
+        return merged
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f'# HELP {name} {metric["help"]}')
+            lines.append(f'# TYPE {name} {metric["type"]}')
+            labelnames = metric['labelnames']
+            for labels, value in sorted(metric['samples']):
+                if metric['type'] == 'histogram':
+                    lines.extend(render_histogram(
+                        name, labelnames, labels, metric['buckets'], value
+                    ))
+                else:
+                    lines.append(
+                        f'{name}{format_labels(labelnames, labels)} {value}'
+                    )
+        for collector in self.collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    labels_text = format_labels(
+                        list(labels), list(labels.values())
+                    )
+                    lines.append(f'{name}{labels_text} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def merge_snapshots(target, source):
+    for name, metric in source.items():
+        if name not in target:
+            target[name] = metric
+            continue
+        samples = {
+            tuple(labels): value for labels, value in target[name]['samples']
+        }
+        for labels, value in metric['samples']:
+            labels = tuple(labels)
+            current = samples.get(labels)
+            if current is None:
+                samples[labels] = value
+            elif metric['type'] == 'histogram':
+                samples[labels] = [
+                    [a + b for a, b in zip(current[0], value[0])],
+                    current[1] + value[1],
+                    current[2] + value[2],
+                ]
+            else:
+                samples[labels] = current + value
+        target[name]['samples'] = [
+            [list(labels), value] for labels, value in samples.items()
+        ]
+
+
+def escape_label(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def format_labels(labelnames, labels):
+    if not labelnames:
+        return ''
+    pairs = ','.join(
+        f'{name}="{escape_label(value)}"'
+        for name, value in zip(labelnames, labels)
+    )
+    return '{' + pairs + '}'
+
+
+def render_histogram(name, labelnames, labels, buckets, value):
+    counts, total, count = value
+    cumulative = 0
+    for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+        cumulative += bucket_count
+        bucket_labels = format_labels(
+            list(labelnames) + ['le'], list(labels) + [bound]
+        )
+        yield f'{name}_bucket{bucket_labels} {cumulative}'
+    yield f'{name}_sum{format_labels(labelnames, labels)} {total}'
+    yield f'{name}_count{format_labels(labelnames, labels)} {count}'
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+http_requests = registry.counter(
+    'http_requests_total', 'Количество HTTP-запросов.',
+    ('route', 'method', 'status'),
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Время обработки HTTP-запросов.',
+    ('route', 'method'),
+)
+db_queries = registry.counter(
+    'db_queries_total', 'Количество SQL-запросов.', ('route',),
+)
+db_query_duration = registry.counter(
+    'db_query_duration_seconds_total', 'Суммарное время SQL-запросов.',
+    ('route',),
+)
+cache_requests = registry.counter(
+    'cache_requests_total', 'Обращения к кэшам приложения.',
+    ('cache', 'result'),
+)
+throttled_requests = registry.counter(
+    'throttled_requests_total', 'Запросы, отклонённые ограничением частоты.',
+    ('scope',),
+)
+cache_compute_duration = registry.histogram(
+    'cache_compute_duration_seconds',
+    'Время вычисления значений при промахах кэша.', ('cache',),
+)
+http_request_memory_peak = registry.histogram(
+    'http_request_memory_peak_bytes',
+    'Пиковое выделение памяти запросом (отслеживаемые запросы).',
+    ('route',),
+    buckets=tuple(2 ** power for power in range(16, 31, 2)),
+)
@@ -0,0 +1,327 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import exceptions
+from rest_framework.permissions import SAFE_METHODS
+
+from api.authentication import CachedTokenAuthentication
+from . import metrics
+from .routers import (check_sticky_cache, get_replicas, mark_recent_write,
+                      read_from_replica, reset_replica_reads)
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Сбрасывает выбор реплики в начале каждого запроса
+    и отмечает пользователей, успешно изменивших данные,
+    чтобы следующие их запросы читали с primary. Представления,
+    которые только читают данные методом POST (пакет GET-запросов),
+    объявляют replica_sticky = False и пользователя не отмечают.
+    """
+
+    def __init__(self, get_response):
+        if not get_replicas():
+            raise MiddlewareNotUsed
+        check_sticky_cache()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = read_from_replica(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_replica_reads(token)
+        user = getattr(request, 'user', None)
+        if (
+            request.method not in SAFE_METHODS
+            and getattr(request, 'replica_sticky', True)
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        ):
+            mark_recent_write(user)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        request.replica_sticky = getattr(view_class, 'replica_sticky', True)
+
+
+class QueryTimer:
+    """
+    Execute wrapper для соединений с БД:
+    считает количество SQL-запросов и их суммарное время.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+    @classmethod
+    def for_request(cls, request, stack):
+        """
+        Один таймер на запрос: если его уже установило внешнее middleware,
+        повторно соединения не оборачиваются.
+        """
+        timer = getattr(request, 'query_timer', None)
+        if timer is None:
+            timer = request.query_timer = cls()
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+        return timer
+
+
+def is_staff_request(request):
+    """
+    Проверяет, что запрос пришёл от сотрудника.
+    Middleware срабатывает до аутентификации DRF, поэтому токен
+    проверяется здесь же (с кэшем из api.authentication).
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    try:
+        credentials = CachedTokenAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+        return False
+    return credentials is not None and credentials[0].is_staff
+
+
+class ServerTimingMiddleware:
+    """
+    Добавляет к ответу заголовок Server-Timing с фазами запроса:
+    db - время SQL-запросов, serialize - работа представления
+    без учёта SQL (включая сериализацию), render - рендеринг ответа DRF.
+    Граница между serialize и render - process_template_response,
+    который Django вызывает сразу после finalize_response DRF
+    и перед render(). Заголовок получают только сотрудники: по фазам
+    остальные могли бы судить о данных, которых им не видно.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            timer = QueryTimer.for_request(request, stack)
+            request.server_timing = {'timer': timer}
+            response = self.get_response(request)
+        end = time.perf_counter()
+        if is_staff_request(request):
+            response['Server-Timing'] = self.format_header(
+                request.server_timing, start, end
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        marks = request.server_timing
+        marks['view'] = (time.perf_counter(), marks['timer'].duration)
+
+    def process_template_response(self, request, response):
+        marks = request.server_timing
+        marks['render'] = (time.perf_counter(), marks['timer'].duration)
+        return response
+
+    @staticmethod
+    def format_header(marks, start, end):
+        timer = marks['timer']
+        phases = [
+            f'db;dur={timer.duration * 1000:.1f};'
+            f'desc="{timer.count} queries"'
+        ]
+        if 'view' in marks:
+            view_start, view_db = marks['view']
+            view_end, render_db = marks.get('render', (end, timer.duration))
+            serialize = (view_end - view_start) - (render_db - view_db)
+            phases.append(f'serialize;dur={serialize * 1000:.1f}')
+            if 'render' in marks:
+                render = (end - view_end) - (timer.duration - render_db)
+                phases.append(f'render;dur={render * 1000:.1f}')
+        phases.append(f'total;dur={(end - start) * 1000:.1f}')
+        return ', '.join(phases)
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запрос через cProfile, если сотрудник прислал
+    заголовок X-Profile или запрос попал в выборку PROFILING_SAMPLE_RATE.
+    Профили пишутся в PROFILING_DIR, хранятся последние PROFILING_KEEP.
+    При PROFILING_ENABLED = False middleware не подключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+
+    def should_profile(self, request):
+        if 'HTTP_X_PROFILE' in request.META:
+            return is_staff_request(request)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - start
+        response['X-Profile'] = self.save(profiler, request, duration)
+        return response
+
+    def save(self, profiler, request, duration):
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        path = re.sub(r'[^\w-]+', '-', request.path).strip('-') or 'root'
+        filename = (
+            f'{time.time() * 1000:.0f}-{os.getpid()}-'
+            f'{request.method}-{path[:80]}-{duration * 1000:.0f}ms.prof'
+        )
+        profiler.dump_stats(os.path.join(settings.PROFILING_DIR, filename))
+        self.rotate()
+        return filename
+
+    @staticmethod
+    def rotate():
+        entries = sorted(
+            os.scandir(settings.PROFILING_DIR),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries[:-settings.PROFILING_KEEP]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class MemoryTrackingMiddleware:
+    """
+    Пиковое выделение памяти запросом через tracemalloc: для запросов
+    сотрудников с заголовком X-Memory и доли MEMORY_TRACKING_SAMPLE_RATE.
+    Пик попадает в заголовок X-Memory-Peak (байты) и метрику
+    http_request_memory_peak_bytes. Если он больше
+    MEMORY_TRACKING_THRESHOLD_MB или запрос помечен заголовком,
+    в лог пишутся MEMORY_TRACKING_TOP мест, где выделена
+    не освобождённая к концу запроса память (вместе с телом ответа).
+    tracemalloc общий на процесс, поэтому одновременно отслеживается
+    один запрос; потоковые ответы отдаются уже после замера.
+    При MEMORY_TRACKING_ENABLED = False middleware не подключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.MEMORY_TRACKING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.MEMORY_TRACKING_SAMPLE_RATE
+        self.lock = threading.Lock()
+
+    def should_track(self, request):
+        if 'HTTP_X_MEMORY' in request.META:
+            return is_staff_request(request)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if (
+            tracemalloc.is_tracing()
+            or not self.should_track(request)
+            or not self.lock.acquire(blocking=False)
+        ):
+            return self.get_response(request)
+        try:
+            tracemalloc.start(settings.MEMORY_TRACKING_FRAMES)
+            try:
+                response = self.get_response(request)
+                peak = tracemalloc.get_traced_memory()[1]
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                tracemalloc.stop()
+        finally:
+            self.lock.release()
+        match = request.resolver_match
+        metrics.http_request_memory_peak.observe(
+            peak, match.view_name if match else 'unmatched'
+        )
+        response['X-Memory-Peak'] = str(peak)
+        flagged = 'HTTP_X_MEMORY' in request.META
+        if flagged or peak > settings.MEMORY_TRACKING_THRESHOLD_MB * 2 ** 20:
+            self.log(request, peak, snapshot, flagged)
+        return response
+
+    @staticmethod
+    def log(request, peak, snapshot, flagged):
+        statistics = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        )).statistics('traceback')[:settings.MEMORY_TRACKING_TOP]
+        sites = '\n'.join(
+            f'  {stat.size / 1024:.0f} КБ в {stat.count} блоках: '
+            + ' <- '.join(
+                f'{frame.filename}:{frame.lineno}'
+                for frame in reversed(stat.traceback)
+            )
+            for stat in statistics
+        )
+        logger.log(
+            logging.INFO if flagged else logging.WARNING,
+            '%s %s: пик памяти %.1f МБ\n%s',
+            request.method, request.get_full_path(), peak / 2 ** 20, sites
+        )
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики запросов: количество по маршруту, методу и статусу,
+    гистограмму времени ответа, количество и время SQL-запросов.
+    Маршрут - имя URL (например, api:recipes-favorite),
+    для неизвестных адресов - unmatched.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            timer = QueryTimer.for_request(request, stack)
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        metrics.http_requests.inc(
+            route, request.method, str(response.status_code)
+        )
+        metrics.http_request_duration.observe(
+            duration, route, request.method
+        )
+        metrics.db_queries.inc(route, amount=timer.count)
+        metrics.db_query_duration.inc(route, amount=timer.duration)
+        metrics.registry.maybe_flush()
+        return response
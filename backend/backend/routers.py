@@ -0,0 +1,94 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+# Бэкенды кэша, не общие для процессов: отметку о записи, сделанную
+# одним воркером, не увидят остальные.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def get_replicas():
+    """Алиасы баз данных, настроенных как реплики только для чтения."""
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def read_from_replica(enabled=True):
+    """
+    Включает (или выключает) чтение с реплик для текущего запроса.
+    Возвращает токен для сброса состояния через reset_replica_reads.
+    """
+    return _read_from_replica.set(enabled and bool(get_replicas()))
+
+
+def reset_replica_reads(token):
+    _read_from_replica.reset(token)
+
+
+def check_sticky_cache():
+    """
+    Отметки о записи хранятся в кэше default: с репликами он должен
+    быть общим для всех процессов, иначе пользователь после записи
+    попадёт на другой воркер и прочитает устаревшие данные с реплики.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            f'DB_REPLICAS требует общий для процессов кэш (CACHE_BACKEND), '
+            f'{backend} хранит данные в памяти процесса.'
+        )
+
+
+def _sticky_key(user_id):
+    return f'db-primary-sticky:{user_id}'
+
+
+def mark_recent_write(user):
+    """
+    Запоминает, что пользователь только что изменял данные.
+    В течение DATABASE_REPLICA_STICKY_SECONDS его запросы читают с primary.
+    """
+    cache.set(
+        _sticky_key(user.pk), True,
+        settings.DATABASE_REPLICA_STICKY_SECONDS
+    )
+
+
+def wrote_recently(user):
+    if user.is_anonymous:
+        return False
+    return cache.get(_sticky_key(user.pk)) is not None
+
+
+class PrimaryReplicaRouter:
+    """
+    Роутер для схемы primary/реплики.
+    Все записи идут в default. Чтения уходят на случайную реплику,
+    только если это разрешено для текущего запроса и мы не находимся
+    внутри транзакции на primary. После первой записи в запросе
+    остальные чтения этого запроса также выполняются на primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(get_replicas())
+
+    def db_for_write(self, model, **hints):
+        _read_from_replica.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
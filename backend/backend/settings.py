@@ -20,7 +20,6 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'sorl.thumbnail',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -28,20 +27,82 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
 ]
 
+# Необязательные приложения подключаются флагами: каждое загружается
+# при старте любого процесса и команды manage.py.
+THUMBNAILS_ENABLED = os.getenv('THUMBNAILS_ENABLED', default='False') == 'True'
+if THUMBNAILS_ENABLED:
+    INSTALLED_APPS.append('sorl.thumbnail')
+
 MIDDLEWARE = [
+    'backend.middleware.MetricsMiddleware',
+    'backend.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'backend.middleware.ProfilingMiddleware',
+    'backend.middleware.MemoryTrackingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'backend.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
 
+# Заголовок Server-Timing с фазами запроса (db, serialize, render)
+# в ответах сотрудникам.
+SERVER_TIMING = os.getenv('SERVER_TIMING', default='True') == 'True'
+
+# Профилирование запросов через cProfile: по заголовку X-Profile
+# от сотрудника или для доли запросов PROFILING_SAMPLE_RATE.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', default='False') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default=0))
+PROFILING_DIR = os.getenv(
+    'PROFILING_DIR', default=os.path.join(BASE_DIR, 'profiles')
+)
+PROFILING_KEEP = int(os.getenv('PROFILING_KEEP', default=100))
+
+# Замер памяти запросов через tracemalloc: по заголовку X-Memory
+# от сотрудника или для доли запросов MEMORY_TRACKING_SAMPLE_RATE.
+# Запросы с пиком больше MEMORY_TRACKING_THRESHOLD_MB мегабайт
+# пишутся в лог с MEMORY_TRACKING_TOP местами выделения памяти
+# (глубина стека - MEMORY_TRACKING_FRAMES).
+MEMORY_TRACKING_ENABLED = (
+    os.getenv('MEMORY_TRACKING_ENABLED', default='False') == 'True'
+)
+MEMORY_TRACKING_SAMPLE_RATE = float(
+    os.getenv('MEMORY_TRACKING_SAMPLE_RATE', default=0)
+)
+MEMORY_TRACKING_THRESHOLD_MB = int(
+    os.getenv('MEMORY_TRACKING_THRESHOLD_MB', default=50)
+)
+MEMORY_TRACKING_TOP = 10
+MEMORY_TRACKING_FRAMES = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'backend': {
+            'handlers': ['console'],
+            'level': os.getenv('LOG_LEVEL', default='INFO'),
+        },
+    },
+}
+
+# Метрики запросов для Prometheus (эндпоинт api/metrics/ для персонала).
+# Для нескольких воркеров gunicorn укажите общий каталог снимков метрик.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='True') == 'True'
+METRICS_MULTIPROCESS_DIR = os.getenv('METRICS_MULTIPROCESS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates/')
 TEMPLATES = [
@@ -76,6 +137,31 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: список хостов PostgreSQL через запятую
+# (для SQLite - список файлов баз данных).
+
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', default='').split(',')), start=1
+):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        DATABASES[alias]['NAME'] = replica.strip()
+    else:
+        DATABASES[alias]['HOST'] = replica.strip()
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['backend.routers.PrimaryReplicaRouter']
+
+# Сколько секунд после записи пользователь читает только с primary.
+DATABASE_REPLICA_STICKY_SECONDS = int(
+    os.getenv('DB_REPLICA_STICKY_SECONDS', default=5)
+)
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -126,17 +212,171 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 6
+    'PAGE_SIZE': 6,
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.SlidingWindowThrottle',
+    ),
+    # Число прокси перед бэкендом: адрес клиента для ограничения
+    # частоты - последний в X-Forwarded-For, который выставляет nginx.
+    # Значения, присланные клиентом, игнорируются.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
+    # Частота по областям (см. throttle_scopes представлений):
+    # запросов в секунду, минуту, час или день.
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.getenv('THROTTLE_LOGIN', default='10/min'),
+        'recipe_create': os.getenv('THROTTLE_RECIPE_CREATE', default='30/h'),
+        'favorite': os.getenv('THROTTLE_FAVORITE', default='60/min'),
+        'shopping_cart': os.getenv('THROTTLE_SHOPPING_CART', default='60/min'),
+        'download_shopping_cart': os.getenv(
+            'THROTTLE_DOWNLOAD_SHOPPING_CART', default='10/min'
+        ),
+    },
+}
+
+# Размер локальных кэшей ограничения частоты (счётчики закончившихся
+# окон и заблокированные клиенты) в процессе.
+
+THROTTLE_LOCAL_SIZE = 10000
+
+# Общий кэш процессов: по умолчанию память процесса, в docker-compose -
+# memcached (CACHE_BACKEND=django.core.cache.backends.memcached.
+# PyMemcacheCache, CACHE_LOCATION=memcached:11211). Поверх него
+# backend.cache.TwoTierCache добавляет LRU процесса и защиту
+# от одновременного пересчёта ключей.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+        'KEY_PREFIX': 'foodgram',
+    }
 }
 
+# Кэширование токенов аутентификации: время жизни в общем кэше
+# и в LRU-кэше процесса (секунды), размер LRU-кэша.
+
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', default=60))
+TOKEN_CACHE_LOCAL_TTL = int(os.getenv('TOKEN_CACHE_LOCAL_TTL', default=2))
+TOKEN_CACHE_LOCAL_SIZE = 1024
+
+# Время жизни локальных копий справочников (теги) в процессе, секунды.
+REFERENCE_LOCAL_TTL = 300
+
+# Снапшоты справочников тегов и ингредиентов: JSON и JSON.gz в каталоге
+# REFERENCE_SNAPSHOT_ROOT, которые nginx отдаёт на /api/tags/
+# и /api/ingredients/ без параметров. Изменение справочника удаляет
+# текущий снапшот, следующий запрос к бэкенду строит новую версию.
+# Хранятся REFERENCE_SNAPSHOT_KEEP последних версий.
+
+REFERENCE_SNAPSHOTS = os.getenv(
+    'REFERENCE_SNAPSHOTS', default='False'
+) == 'True'
+REFERENCE_SNAPSHOT_ROOT = os.path.join(MEDIA_ROOT, 'reference')
+REFERENCE_SNAPSHOT_URL = MEDIA_URL + 'reference/'
+REFERENCE_SNAPSHOT_KEEP = 5
+
+# Индекс ингредиент -> рецепты для подбора рецептов по продуктам:
+# время жизни записей журнала изменений в общем кэше (секунды),
+# размер overlay изменённых рецептов, после которого индекс
+# перестраивается, количество рецептов в ответе по умолчанию и максимум.
+# INGREDIENT_INDEX_WARM_UP - строить индекс при старте веб-процесса
+# (backend.wsgi) в фоне, а не на первом запросе.
+
+INGREDIENT_INDEX_WARM_UP = os.getenv(
+    'INGREDIENT_INDEX_WARM_UP', default='True'
+) == 'True'
+INGREDIENT_INDEX_JOURNAL_TTL = 24 * 60 * 60
+INGREDIENT_INDEX_OVERLAY_LIMIT = 10000
+WHAT_TO_COOK_LIMIT = 20
+WHAT_TO_COOK_MAX_LIMIT = 100
+
+# Наибольший размер страницы ?limit= (и ?recipes_limit= в подписках):
+# большие значения молча уменьшаются до него.
+PAGINATION_MAX_LIMIT = int(os.getenv('PAGINATION_MAX_LIMIT', default=100))
+
+# Наибольшее число GET-подзапросов в пакетном запросе api/batch/.
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', default=10))
+
+# Список, рецепт и лента читаются из готовых JSON-документов рецептов
+# (RecipeDocument). Изменения до RECIPE_DOCUMENTS_SYNC_LIMIT рецептов
+# пересобирают документы сразу, большие - фоновой задачей пачками
+# по RECIPE_DOCUMENTS_BATCH_SIZE. Недостающие документы строятся
+# при чтении; все сразу - командой rebuild_recipe_documents.
+RECIPE_DOCUMENTS = os.getenv('RECIPE_DOCUMENTS', default='True') == 'True'
+RECIPE_DOCUMENTS_SYNC_LIMIT = 100
+RECIPE_DOCUMENTS_BATCH_SIZE = 500
+
+# Наибольшее число рецептов в одном запросе GET /api/recipes/?ids=1,2,3.
+RECIPE_BATCH_MAX_SIZE = 100
+
+# Похожие рецепты (MinHash + LSH по ингредиентам и тегам): размер топа,
+# число полос и строк в полосе сигнатуры, максимальный размер корзины
+# при полной перестройке, число кандидатов при пересчёте одного рецепта
+# и максимальное число рецептов, пересчитываемых при сохранении.
+# Большие пакеты (загрузки) пересчитывает команда build_similar_recipes.
+
+SIMILAR_RECIPES_COUNT = 10
+SIMILAR_LSH_BANDS = 32
+SIMILAR_LSH_ROWS = 2
+SIMILAR_BUCKET_LIMIT = 200
+SIMILAR_CANDIDATES_LIMIT = 500
+SIMILAR_INCREMENTAL_LIMIT = 100
+
+# Лента подписок: рецепты авторов, у которых подписчиков не больше
+# FEED_FANOUT_LIMIT, раскладываются по лентам подписчиков при публикации,
+# рецепты популярных авторов подмешиваются при чтении. Лента хранит
+# не больше FEED_TIMELINE_SIZE записей (команда rebuild_timelines --trim).
+# Список популярных авторов и последние FEED_AUTHOR_RECIPES рецептов
+# каждого из них кэшируются на FEED_POPULAR_TTL секунд.
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', default=1000))
+FEED_TIMELINE_SIZE = 500
+FEED_POPULAR_TTL = 300
+FEED_AUTHOR_RECIPES = 50
+FEED_PAGE_SIZE = 10
+FEED_MAX_PAGE_SIZE = 50
+
+# Популярность рецептов (?ordering=popular): период полураспада вклада
+# события в часах и веса добавления в избранное и в список покупок.
+# Команда update_popularity пересчитывает оценки по датам событий.
+
+POPULARITY_HALF_LIFE_HOURS = 72
+POPULARITY_FAVORITE_WEIGHT = 1.0
+POPULARITY_SHOPPING_CART_WEIGHT = 0.5
+
+# Списки админки без фильтров показывают оценку числа строк из статистики
+# PostgreSQL (pg_class.reltuples), если она больше этого порога:
+# точный COUNT(*) на миллионах строк читает всю таблицу.
+
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Очередь фоновых задач в базе (приложение jobs, воркер run_jobs).
+# С JOBS_EAGER задачи выполняются сразу после коммита без воркера.
+# Задача повторяется до JOBS_MAX_ATTEMPTS раз с задержкой от
+# JOBS_RETRY_DELAY секунд, удваивающейся до JOBS_RETRY_MAX_DELAY.
+# Воркер продлевает аренду своих задач на JOBS_LEASE секунд; задачи
+# упавшего воркера по её истечении возвращаются в очередь.
+
+JOBS_EAGER = os.getenv('JOBS_EAGER', default='False') == 'True'
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_RETRY_MAX_DELAY = 3600
+JOBS_LEASE = 300
+JOBS_POLL_INTERVAL = 1.0
+
 
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SEND_ACTIVATION_EMAIL': False,
     'HIDE_USERS': False,
+    # Смена пароля удаляет токен: старый токен перестаёт действовать.
+    'LOGOUT_ON_PASSWORD_CHANGE': True,
     'SERIALIZERS': {
         'user_create': 'api.serializers.CustomUserCreateSerializer',
         'user': 'api.serializers.CustomUserSerializer',
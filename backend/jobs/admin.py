@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from backend.admin import BaseAdmin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(BaseAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_at', 'created',)
+    list_filter = ('status', 'name',)
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+from backend.metrics import registry
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+
+    def ready(self):
+        from .queue import queue_metrics
+
+        # Задачи регистрируются в модулях tasks приложений.
+        autodiscover_modules('tasks')
+        registry.add_collector(queue_metrics)
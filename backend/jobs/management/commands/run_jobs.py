@@ -0,0 +1,32 @@
+import signal
+import time
+
+from django.core.management import BaseCommand
+
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    """
+    Воркер фоновых задач. По SIGTERM/SIGINT перестаёт забирать
+    задачи и дожидается начатых.
+    Команда - python manage.py run_jobs --concurrency 4.
+    С --once выполняет готовые задачи и завершается.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--poll-interval', type=float)
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        worker = Worker(options['concurrency'], options['poll_interval'])
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(f'Воркер {worker.name} запущен')
+        start = time.perf_counter()
+        worker.run(once=options['once'])
+        self.stdout.write(
+            f'Выполнено задач: {worker.done}, с ошибкой: {worker.failed}, '
+            f'за {time.perf_counter() - start:.1f} с'
+        )
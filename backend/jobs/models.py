@@ -0,0 +1,63 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    '''
+    Модель для фоновой задачи.
+    Выполненные задачи удаляются, исчерпавшие попытки остаются
+    со статусом failed и текстом последней ошибки.
+    '''
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=100)
+    args = models.JSONField('Аргументы', default=list)
+    key = models.CharField(
+        'Ключ дедупликации',
+        max_length=200,
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    run_at = models.DateTimeField('Выполнить после', default=timezone.now)
+    locked_until = models.DateTimeField(
+        'Занята воркером до',
+        null=True,
+        blank=True,
+    )
+    worker = models.CharField('Воркер', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_idx'),
+            models.Index(fields=['worker'], name='job_worker_idx'),
+        ]
+        constraints = [
+            # В очереди не больше одной задачи с одним ключом.
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=Q(status='queued'),
+                name='unique_queued_job_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} {self.args}'
@@ -0,0 +1,182 @@
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+# Имя задачи -> функция. Заполняется декоратором task
+# в модулях tasks приложений (их импортирует JobsConfig.ready).
+TASKS = {}
+
+
+def task(name):
+    """Регистрирует функцию как фоновую задачу с именем name."""
+    def register(function):
+        TASKS[name] = function
+        return function
+    return register
+
+
+def enqueue(name, *args, key=None, delay=0):
+    """
+    Ставит задачу в очередь. Аргументы должны сериализоваться в JSON.
+    Запись идёт в текущей транзакции: при откате задача не появится.
+    Если в очереди уже есть задача с тем же key, новая не ставится.
+    С JOBS_EAGER задача выполняется сразу после коммита.
+    """
+    if name not in TASKS:
+        raise KeyError(f'Неизвестная задача {name}')
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: TASKS[name](*args))
+        return
+    Job.objects.bulk_create([
+        Job(
+            name=name, args=list(args), key=key,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+    ], ignore_conflicts=True)
+
+
+def release_stale():
+    """
+    Возвращает в очередь задачи воркеров, не продливших аренду
+    (процесс упал). Если такая задача уже снова в очереди по ключу,
+    зависшая копия удаляется. Из нескольких зависших копий с одним
+    ключом (ключ поставили снова, пока первая выполнялась) в очередь
+    возвращается первая, остальные удаляются: в очереди может быть
+    только одна задача с ключом.
+    """
+    database = router.db_for_write(Job)
+    with transaction.atomic(using=database):
+        jobs = Job.objects.using(database)
+        stale = jobs.filter(
+            status=Job.RUNNING, locked_until__lt=timezone.now()
+        )
+        stale.filter(
+            key__in=jobs.filter(status=Job.QUEUED).values('key')
+        ).delete()
+        first_ids = list(
+            stale.filter(key__isnull=False).values('key').annotate(
+                first_id=Min('id')
+            ).values_list('first_id', flat=True)
+        )
+        stale.filter(key__isnull=False).exclude(pk__in=first_ids).delete()
+        stale.update(status=Job.QUEUED, worker='', locked_until=None)
+
+
+def claim(worker, limit):
+    """
+    Забирает до limit готовых задач. На PostgreSQL строки блокируются
+    SELECT ... FOR UPDATE SKIP LOCKED, и воркеры не ждут друг друга.
+    SQLite не поддерживает блокировку строк, но сериализует записи:
+    UPDATE с условием status = queued не даст двум воркерам забрать
+    одну задачу, а свою задачу воркер узнаёт по метке worker.
+    """
+    database = router.db_for_write(Job)
+    now = timezone.now()
+    with transaction.atomic(using=database):
+        candidates = Job.objects.using(database).filter(
+            status=Job.QUEUED, run_at__lte=now
+        ).order_by('run_at')
+        if connections[database].features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.using(database).filter(
+            pk__in=ids, status=Job.QUEUED
+        ).update(
+            status=Job.RUNNING, worker=worker, attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.JOBS_LEASE),
+        )
+        # Читаем в той же транзакции: ошибка после UPDATE откатит его,
+        # и задачи не останутся занятыми воркером, который о них не знает.
+        return list(Job.objects.using(database).filter(
+            pk__in=ids, status=Job.RUNNING, worker=worker
+        ))
+
+
+def extend_lease(worker):
+    Job.objects.filter(status=Job.RUNNING, worker=worker).update(
+        locked_until=timezone.now() + timedelta(seconds=settings.JOBS_LEASE)
+    )
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка со случайным разбросом до 10%."""
+    delay = min(
+        settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOBS_RETRY_MAX_DELAY
+    )
+    return delay * random.uniform(0.9, 1.0)
+
+
+def fail(job, error):
+    """
+    Ошибка задачи: повтор с задержкой или статус failed, когда
+    попытки исчерпаны. Если задача с тем же ключом уже снова
+    в очереди, повторять эту не нужно.
+    """
+    job.last_error = error
+    job.worker = ''
+    job.locked_until = None
+    if job.attempts >= settings.JOBS_MAX_ATTEMPTS:
+        job.status = Job.FAILED
+    else:
+        if job.key and Job.objects.filter(
+            status=Job.QUEUED, key=job.key
+        ).exists():
+            job.delete()
+            return
+        job.status = Job.QUEUED
+        job.run_at = timezone.now() + timedelta(
+            seconds=retry_delay(job.attempts)
+        )
+    job.save(update_fields=(
+        'status', 'run_at', 'last_error', 'worker', 'locked_until'
+    ))
+
+
+def run_job(job):
+    """Выполняет задачу; выполненная удаляется из очереди."""
+    try:
+        TASKS[job.name](*job.args)
+    except Exception:
+        fail(job, traceback.format_exc())
+        return False
+    job.delete()
+    return True
+
+
+def queue_metrics():
+    """
+    Коллектор метрик очереди: число задач по статусам и именам
+    и возраст самой старой готовой к выполнению задачи.
+    """
+    counts = Job.objects.values('status', 'name').annotate(
+        count=Count('id')
+    ).order_by()
+    oldest = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=timezone.now()
+    ).aggregate(run_at=Min('run_at'))['run_at']
+    lag = (timezone.now() - oldest).total_seconds() if oldest else 0
+    return [
+        (
+            'background_jobs', 'gauge', 'Фоновые задачи по статусам.',
+            [
+                ({'status': row['status'], 'name': row['name']},
+                 row['count'])
+                for row in counts
+            ],
+        ),
+        (
+            'background_jobs_lag_seconds', 'gauge',
+            'Сколько ждёт самая старая готовая задача.',
+            [({}, lag)],
+        ),
+    ]
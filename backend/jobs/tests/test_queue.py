@@ -0,0 +1,164 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.db import DatabaseError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import (TASKS, claim, enqueue, release_stale, retry_delay,
+                        run_job)
+from jobs.worker import Worker
+
+
+def broken():
+    raise RuntimeError('broken')
+
+
+@override_settings(JOBS_EAGER=False, JOBS_MAX_ATTEMPTS=3,
+                   JOBS_RETRY_DELAY=10, JOBS_RETRY_MAX_DELAY=25)
+@mock.patch.dict(TASKS, {'tests.ok': lambda: None, 'tests.broken': broken})
+class QueueTests(TestCase):
+
+    def test_key_dedupe(self):
+        enqueue('tests.ok', key='same')
+        enqueue('tests.ok', key='same')
+        enqueue('tests.ok')
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_claim_by_one_worker(self):
+        for _ in range(3):
+            enqueue('tests.ok')
+        first = claim('first', 2)
+        second = claim('second', 2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({job.pk for job in first} & {second[0].pk})
+        self.assertEqual(claim('third', 2), [])
+
+    def test_delayed_job_not_claimed(self):
+        enqueue('tests.ok', delay=60)
+        self.assertEqual(claim('worker', 1), [])
+
+    def test_done_job_deleted(self):
+        enqueue('tests.ok')
+        self.assertTrue(run_job(claim('worker', 1)[0]))
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_with_backoff(self):
+        enqueue('tests.broken')
+        started = timezone.now()
+        self.assertFalse(run_job(claim('worker', 1)[0]))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn('RuntimeError', job.last_error)
+        delay = (job.run_at - started).total_seconds()
+        self.assertTrue(9 <= delay <= 11, delay)
+
+    def test_retry_delay_grows_to_limit(self):
+        self.assertTrue(9 <= retry_delay(1) <= 10)
+        self.assertTrue(18 <= retry_delay(2) <= 20)
+        self.assertTrue(22.5 <= retry_delay(5) <= 25)
+
+    def test_failed_after_max_attempts(self):
+        enqueue('tests.broken')
+        for _ in range(3):
+            Job.objects.update(run_at=timezone.now())
+            run_job(claim('worker', 1)[0])
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        self.assertEqual(claim('worker', 1), [])
+
+    def test_retry_dropped_when_key_queued_again(self):
+        enqueue('tests.broken', key='same')
+        job = claim('worker', 1)[0]
+        enqueue('tests.broken', key='same')
+        run_job(job)
+        self.assertEqual(
+            list(Job.objects.values_list('status', 'attempts')),
+            [(Job.QUEUED, 0)],
+        )
+
+    def test_release_stale(self):
+        enqueue('tests.ok')
+        job = claim('dead', 1)[0]
+        Job.objects.filter(pk=job.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        release_stale()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.QUEUED, ''))
+
+    def test_release_stale_duplicate_keys(self):
+        """
+        Ключ поставили снова, пока первая копия выполнялась, вторую
+        забрал тот же воркер, и он упал.
+        """
+        enqueue('tests.ok', key='same')
+        first = claim('dead', 1)[0]
+        enqueue('tests.ok', key='same')
+        second = claim('dead', 1)[0]
+        Job.objects.update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        release_stale()
+        self.assertEqual(
+            list(Job.objects.values_list('pk', 'status')),
+            [(first.pk, Job.QUEUED)],
+        )
+        self.assertNotEqual(first.pk, second.pk)
+
+    def test_worker_survives_database_errors(self):
+        worker = Worker(concurrency=1)
+        with mock.patch('jobs.worker.release_stale',
+                        side_effect=DatabaseError('locked')):
+            with self.assertLogs('jobs.worker', 'ERROR'):
+                self.assertFalse(worker.maintain())
+        self.assertTrue(worker.maintain())
+
+    @skipUnless(connection.vendor == 'postgresql', 'SKIP LOCKED в PostgreSQL')
+    def test_claim_skips_locked_rows(self):
+        enqueue('tests.ok')
+        with CaptureQueriesContext(connection) as queries:
+            claim('worker', 1)
+        self.assertIn('SKIP LOCKED', queries[1]['sql'])
+
+
+@override_settings(JOBS_EAGER=False)
+@mock.patch.dict(TASKS, {'tests.ok': lambda: None})
+class ConcurrentClaimTests(TransactionTestCase):
+
+    def test_each_job_claimed_once(self):
+        for _ in range(40):
+            enqueue('tests.ok')
+        claimed = []
+        lock = threading.Lock()
+
+        def work(name):
+            worker = Worker(concurrency=3)
+            worker.name = name
+            deadline = time.monotonic() + 10
+            try:
+                while time.monotonic() < deadline:
+                    jobs = worker.claim(3)
+                    queued = Job.objects.filter(status=Job.QUEUED)
+                    if jobs == [] and not queued.exists():
+                        return
+                    with lock:
+                        claimed.extend(job.pk for job in jobs or ())
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=work, args=(f'worker-{i}',))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(claimed), 40)
+        self.assertEqual(len(set(claimed)), 40)
@@ -0,0 +1,107 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+
+from .queue import claim, extend_lease, release_stale, run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """
+    Воркер очереди: забирает задачи по числу свободных потоков
+    и выполняет их в пуле потоков. Каждый поток работает со своим
+    соединением с базой; как и вокруг запросов, до и после каждой
+    задачи закрываются разорванные и устаревшие по CONN_MAX_AGE
+    соединения. Аренда задач продлевается, пока они
+    выполняются; после stop() новые задачи не забираются,
+    начатые дорабатывают. Для задач, занятых процессором,
+    запускается несколько воркеров.
+    """
+
+    def __init__(self, concurrency=4, poll_interval=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval or settings.JOBS_POLL_INTERVAL
+        self.name = (
+            f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        )
+        self.stopping = threading.Event()
+        self.done = 0
+        self.failed = 0
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def count(self, future):
+        if future.result():
+            self.done += 1
+        else:
+            self.failed += 1
+
+    def execute(self, job):
+        """Выполняет задачу в потоке пула."""
+        close_old_connections()
+        try:
+            return run_job(job)
+        finally:
+            close_old_connections()
+
+    def maintain(self):
+        """
+        Продлевает аренду своих задач и возвращает в очередь зависшие.
+        Ошибка базы не останавливает воркер: попытка повторится
+        на следующем шаге цикла.
+        """
+        try:
+            extend_lease(self.name)
+            release_stale()
+        except DatabaseError:
+            logger.exception('Не удалось продлить аренду задач')
+            return False
+        return True
+
+    def claim(self, limit):
+        try:
+            return claim(self.name, limit)
+        except DatabaseError:
+            # SQLite отвечает "database is locked", если другой воркер
+            # одновременно забирает задачи, - попробуем позже.
+            return None
+
+    def run(self, once=False):
+        """
+        Основной цикл. С once=True воркер выходит,
+        когда готовых задач не осталось.
+        """
+        running = set()
+        last_lease = 0.0
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            while not self.stopping.is_set():
+                if (
+                    time.monotonic() - last_lease > settings.JOBS_LEASE / 3
+                    and self.maintain()
+                ):
+                    last_lease = time.monotonic()
+                jobs = self.claim(self.concurrency - len(running))
+                busy = jobs is None
+                for job in jobs or ():
+                    future = pool.submit(self.execute, job)
+                    future.add_done_callback(self.count)
+                    running.add(future)
+                if once and not busy and not jobs and not running:
+                    break
+                if len(running) == self.concurrency or (running and once):
+                    running = wait(
+                        running, timeout=self.poll_interval,
+                        return_when=FIRST_COMPLETED
+                    ).not_done
+                elif not jobs:
+                    self.stopping.wait(self.poll_interval)
+                running = {future for future in running if not future.done()}
@@ -1,19 +1,76 @@
 from django.contrib import admin
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
+from backend.admin import BaseAdmin
 from .models import (FavoriteRecipe, Follow, Ingredient, Recipe,
                      RecipeIngredient, ShoppingList, Tag)
+from .signals import recipes_changed
+
+
+class RecipeIngredientInline(admin.TabularInline):
+    model = RecipeIngredient
+    autocomplete_fields = ('ingredient',)
+    extra = 1
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'id', 'author',)
-    list_filter = ('author', 'tags',)
+class RecipeAdmin(BaseAdmin):
+    list_display = ('name', 'id', 'author', 'favorites_count',)
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    search_fields = ('name',)
+    raw_id_fields = ('author',)
+    inlines = (RecipeIngredientInline,)
+    # Порядок по первичному ключу идёт по индексу, как и порядок
+    # публикации, сортировка по pub_date читала бы всю таблицу.
+    ordering = ('-pk',)
+
+    def get_queryset(self, request):
+        """
+        Число добавлений в избранное - подзапросом на строку страницы,
+        а не GROUP BY по всем рецептам.
+        """
+        favorites = FavoriteRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            count=Count('pk')
+        ).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(Subquery(favorites), 0)
+        )
+
+    @admin.display(description='В избранном')
+    def favorites_count(self, obj):
+        return obj.favorites_count
+
+    def save_formset(self, request, form, formset, change):
+        """Ингредиенты рецепта сохраняются тремя запросами."""
+        if formset.model is not RecipeIngredient:
+            return super().save_formset(request, form, formset, change)
+        instances = formset.save(commit=False)
+        RecipeIngredient.objects.filter(
+            pk__in=[obj.pk for obj in formset.deleted_objects]
+        ).delete()
+        RecipeIngredient.objects.bulk_create(
+            [obj for obj in instances if obj.pk is None]
+        )
+        RecipeIngredient.objects.bulk_update(
+            [obj for obj in instances if obj.pk is not None],
+            ('ingredient', 'amount')
+        )
+        return None
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipes_changed.send(sender=Recipe, recipe_ids=[form.instance.pk])
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(BaseAdmin):
     list_display = ('name', 'measurement_unit',)
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
+    search_fields = ('name',)
 
 
 @admin.register(Tag)
@@ -23,20 +80,29 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(BaseAdmin):
     list_display = ('recipe', 'ingredient', 'amount',)
+    list_select_related = ('recipe', 'ingredient',)
+    raw_id_fields = ('recipe',)
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(BaseAdmin):
     list_display = ('user', 'author',)
+    list_select_related = ('user', 'author',)
+    raw_id_fields = ('user', 'author',)
 
 
 @admin.register(FavoriteRecipe)
-class FavoriteRecipeAdmin(admin.ModelAdmin):
+class FavoriteRecipeAdmin(BaseAdmin):
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
+    raw_id_fields = ('user', 'recipe',)
 
 
 @admin.register(ShoppingList)
-class ShoppingListAdmin(admin.ModelAdmin):
+class ShoppingListAdmin(BaseAdmin):
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
+    raw_id_fields = ('user', 'recipe',)
@@ -0,0 +1,117 @@
+import json
+
+from django.conf import settings
+from django.db import router, transaction
+
+from .models import Recipe, RecipeDocument
+
+# Поля пользователя, которые выводятся в рецепте.
+AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+def recipe_data(recipe):
+    """
+    Рецепт в формате ShowRecipeSerializer. Флаги пользователя - False,
+    изображение - относительный URL: их подставляет API при чтении.
+    """
+    author = {name: getattr(recipe.author, name) for name in AUTHOR_FIELDS}
+    author['is_subscribed'] = False
+    return {
+        'id': recipe.pk,
+        'tags': [
+            {'id': tag.pk, 'name': tag.name, 'color': tag.color,
+             'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'author': author,
+        'ingredients': [
+            {'id': item.ingredient.pk, 'name': item.ingredient.name,
+             'amount': item.amount,
+             'measurement_unit': item.ingredient.measurement_unit}
+            for item in recipe.ingredient_amount.all()
+        ],
+        'is_favorited': False,
+        'is_in_shopping_cart': False,
+        'name': recipe.name,
+        'image': recipe.image.url if recipe.image else None,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+def build_documents(recipe_ids):
+    """
+    Пересобирает документы рецептов одним запросом к рецептам
+    с тегами и ингредиентами. Удалённые рецепты пропускаются.
+    Рецепты читаются из базы для записи: документ, собранный
+    по отстающей реплике, остался бы устаревшим до следующей правки.
+    Возвращает {id рецепта: RecipeDocument}.
+    """
+    recipes = Recipe.objects.using(
+        router.db_for_write(Recipe)
+    ).filter(pk__in=recipe_ids).select_related('author').prefetch_related(
+        'tags', 'ingredient_amount__ingredient'
+    )
+    documents = {
+        recipe.pk: RecipeDocument(
+            recipe=recipe,
+            body=json.dumps(
+                recipe_data(recipe), ensure_ascii=False,
+                separators=(',', ':')
+            ),
+        )
+        for recipe in recipes
+    }
+    with transaction.atomic():
+        RecipeDocument.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeDocument.objects.bulk_create(
+            documents.values(), ignore_conflicts=True
+        )
+    return documents
+
+
+def attach_documents(recipes):
+    """
+    Привязывает к рецептам документы одним запросом по id (отдельно
+    от выборки страницы, чтобы сортировка рецептов не тащила тексты
+    документов). Недостающие документы строятся сразу. Возвращает
+    рецепты с документами: рецепт, удалённый после выборки страницы,
+    пропускается.
+    """
+    pending = [
+        recipe for recipe in recipes
+        if not Recipe.document.related.is_cached(recipe)
+    ]
+    if pending:
+        documents = RecipeDocument.objects.only('body').in_bulk(
+            [recipe.pk for recipe in pending]
+        )
+        missing = [
+            recipe.pk for recipe in pending if recipe.pk not in documents
+        ]
+        if missing:
+            documents.update(build_documents(missing))
+        for recipe in pending:
+            if recipe.pk in documents:
+                recipe.document = documents[recipe.pk]
+    return [
+        recipe for recipe in recipes
+        if Recipe.document.related.get_cached_value(recipe, None)
+    ]
+
+
+def rebuild_documents(recipe_ids):
+    """Пересобирает документы пачками по RECIPE_DOCUMENTS_BATCH_SIZE."""
+    recipe_ids = list(recipe_ids)
+    size = settings.RECIPE_DOCUMENTS_BATCH_SIZE
+    for start in range(0, len(recipe_ids), size):
+        build_documents(recipe_ids[start:start + size])
+
+
+def rebuild_related_documents(field, value):
+    """Документы рецептов с тегом, ингредиентом или автором value."""
+    if field not in ('tags', 'ingredients', 'author'):
+        raise ValueError(f'Неизвестное поле {field}')
+    rebuild_documents(
+        Recipe.objects.filter(**{field: value}).values_list('id', flat=True)
+    )
@@ -0,0 +1,172 @@
+import gzip
+import json
+import zlib
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Min
+
+from users.models import User
+from .models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+                     RecipeIngredient, ShoppingList, Tag)
+
+EXPORT_CHUNK_SIZE = 2000
+# Строки ответа склеиваются в блоки такого размера перед отправкой.
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def in_range(queryset, start=None, end=None):
+    """Строки с pk из полуинтервала [start, end) для шардов экспорта."""
+    lookups = {}
+    if start is not None:
+        lookups['pk__gte'] = start
+    if end is not None:
+        lookups['pk__lt'] = end
+    return queryset.filter(**lookups)
+
+
+def table_rows(model, fields):
+    """
+    Строки таблицы в порядке pk. iterator() читает их пачками,
+    на PostgreSQL - через серверный курсор.
+    """
+    def rows(start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE,
+             using=None):
+        return in_range(
+            model.objects.using(using).order_by('pk'), start, end
+        ).values(*fields).iterator(chunk_size=chunk_size)
+    return rows
+
+
+def recipe_rows(start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE,
+                using=None):
+    """
+    Рецепты с ингредиентами (название, единица, количество)
+    и слагами тегов. Читаются пачками по pk, ингредиенты и теги
+    пачки - двумя запросами по диапазону id рецептов.
+    """
+    recipes = in_range(
+        Recipe.objects.using(using).order_by('pk'), start, end
+    )
+    last_id = None
+    while True:
+        chunk = recipes if last_id is None else recipes.filter(
+            pk__gt=last_id
+        )
+        chunk = list(chunk.values(
+            'id', 'author_id', 'author__email', 'name', 'image', 'text',
+            'cooking_time', 'pub_date'
+        )[:chunk_size])
+        if not chunk:
+            return
+        first_id, last_id = chunk[0]['id'], chunk[-1]['id']
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in RecipeIngredient.objects.using(
+            using
+        ).filter(
+            recipe_id__gte=first_id, recipe_id__lte=last_id
+        ).order_by('pk').values_list(
+            'recipe_id', 'ingredient__name', 'ingredient__measurement_unit',
+            'amount'
+        ):
+            ingredients[recipe_id].append(
+                {'name': name, 'measurement_unit': unit, 'amount': amount}
+            )
+        tags = defaultdict(list)
+        for recipe_id, slug in Recipe.tags.through.objects.using(
+            using
+        ).filter(
+            recipe_id__gte=first_id, recipe_id__lte=last_id
+        ).order_by('pk').values_list('recipe_id', 'tag__slug'):
+            tags[recipe_id].append(slug)
+        for recipe in chunk:
+            recipe['author_email'] = recipe.pop('author__email')
+            recipe['ingredients'] = ingredients[recipe['id']]
+            recipe['tags'] = tags[recipe['id']]
+            yield recipe
+
+
+EXPORT_TABLES = {
+    'tags': (Tag, table_rows(Tag, ('id', 'name', 'color', 'slug'))),
+    'ingredients': (Ingredient, table_rows(
+        Ingredient, ('id', 'name', 'measurement_unit')
+    )),
+    'users': (User, table_rows(
+        User, ('id', 'email', 'username', 'first_name', 'last_name',
+               'date_joined')
+    )),
+    'recipes': (Recipe, recipe_rows),
+    'favorites': (FavoriteRecipe, table_rows(
+        FavoriteRecipe, ('user_id', 'recipe_id', 'created')
+    )),
+    'shopping_cart': (ShoppingList, table_rows(
+        ShoppingList, ('user_id', 'recipe_id', 'created')
+    )),
+    'follows': (Follow, table_rows(Follow, ('user_id', 'author_id'))),
+}
+
+
+def export_rows(table, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE,
+                using=None):
+    """
+    Строки таблицы; using - алиас базы, по умолчанию выбирает роутер.
+    """
+    _, rows = EXPORT_TABLES[table]
+    return rows(start, end, chunk_size, using)
+
+
+def shard_ranges(table, shards):
+    """
+    Делит диапазон pk таблицы на shards полуинтервалов [start, end)
+    примерно равной ширины.
+    """
+    model, _ = EXPORT_TABLES[table]
+    bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return [(None, None)]
+    low, high = bounds['low'], bounds['high'] + 1
+    step = -(-(high - low) // shards)
+    return [
+        (start, min(start + step, high)) for start in range(low, high, step)
+    ]
+
+
+def ndjson_line(row):
+    return json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def write_ndjson(rows, path, compress=False):
+    """Пишет строки в файл построчно, возвращает их количество."""
+    opener = gzip.open if compress else open
+    count = 0
+    with opener(path, 'wt', encoding='utf-8') as output:
+        for row in rows:
+            output.write(ndjson_line(row))
+            count += 1
+    return count
+
+
+def ndjson_chunks(rows, compress=False):
+    """
+    Блоки байт NDJSON (или gzip) для потокового ответа:
+    в памяти держится только текущий блок.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    buffer = []
+    size = 0
+    for row in rows:
+        line = ndjson_line(row).encode()
+        buffer.append(line)
+        size += len(line)
+        if size >= STREAM_BUFFER_SIZE:
+            data = b''.join(buffer)
+            buffer, size = [], 0
+            if compress:
+                data = compressor.compress(data)
+            if data:
+                yield data
+    data = b''.join(buffer)
+    if compress:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
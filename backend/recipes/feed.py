@@ -0,0 +1,245 @@
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from backend.cache import TwoTierCache
+from jobs.queue import enqueue
+from .models import Follow, Recipe, TimelineEntry
+from .utils import insert_rows
+
+AUTHOR_RECIPES_KEY = 'feed:author-recipes:{}'
+# Последний вычисленный список популярных авторов: по нему видно,
+# кто опустился ниже порога.
+POPULAR_AUTHORS_KEY = 'feed:popular-authors:last'
+
+popular_authors_cache = TwoTierCache(
+    'feed:popular-authors', ttl=settings.FEED_POPULAR_TTL, local_size=1,
+)
+
+
+def popular_author_ids():
+    """
+    Авторы, у которых подписчиков больше FEED_FANOUT_LIMIT.
+    Их рецепты не раскладываются по лентам, а читаются при запросе.
+    Подсчёт подписчиков дорогой, поэтому его выполняет один процесс.
+    """
+    return popular_authors_cache.get_or_set('ids', load_popular_author_ids)
+
+
+def load_popular_author_ids():
+    """
+    Считает популярных авторов. Рецепты автора, опустившегося ниже
+    порога, в ленты не раскладывались - для него ставится задача
+    backfill_followers (после того как процессы увидят новый список).
+    Записи в лентах ставшего популярным автора не мешают: feed_page
+    схлопывает их с рецептами, читаемыми при запросе.
+    """
+    popular = frozenset(
+        Follow.objects.values('author').annotate(
+            followers=Count('id')
+        ).filter(
+            followers__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('author', flat=True)
+    )
+    previous = cache.get(POPULAR_AUTHORS_KEY)
+    cache.set(POPULAR_AUTHORS_KEY, popular, None)
+    for author_id in (previous or frozenset()) - popular:
+        enqueue(
+            'recipes.backfill_followers', author_id,
+            key=f'feed:backfill-followers:{author_id}',
+            delay=popular_authors_cache.local.ttl,
+        )
+    return popular
+
+
+def author_recipes(author_ids):
+    """
+    Последние FEED_AUTHOR_RECIPES рецептов популярных авторов,
+    [(pub_date, id)] от новых к старым. Списки лежат в общем кэше
+    и сбрасываются при публикации и удалении рецептов автора,
+    поэтому чтение первых страниц ленты обходится без запросов
+    к их рецептам; более старые читаются по индексу автора.
+    """
+    keys = {AUTHOR_RECIPES_KEY.format(author_id): author_id
+            for author_id in author_ids}
+    cached = cache.get_many(keys)
+    recipes = {keys[key]: value for key, value in cached.items()}
+    for key in keys.keys() - cached.keys():
+        author_id = keys[key]
+        recipes[author_id] = list(
+            Recipe.objects.filter(author_id=author_id).order_by(
+                '-pub_date', '-id'
+            ).values_list('pub_date', 'id')[:settings.FEED_AUTHOR_RECIPES]
+        )
+        cache.set(key, recipes[author_id], settings.FEED_POPULAR_TTL)
+    return recipes
+
+
+def forget_author_recipes(author_id):
+    cache.delete(AUTHOR_RECIPES_KEY.format(author_id))
+
+
+def fan_out(recipes):
+    """
+    Раскладывает новые рецепты по лентам подписчиков их авторов:
+    подписчики читаются одним запросом, записи вставляются одной
+    пачкой. У популярных авторов только сбрасывается список рецептов.
+    """
+    popular_ids = popular_author_ids()
+    by_author = defaultdict(list)
+    for recipe in recipes:
+        if recipe.author_id in popular_ids:
+            forget_author_recipes(recipe.author_id)
+        else:
+            by_author[recipe.author_id].append(recipe)
+    if not by_author:
+        return
+    insert_rows(
+        TimelineEntry, ('user', 'recipe', 'pub_date'),
+        (
+            (user_id, recipe.pk, recipe.pub_date)
+            for user_id, author_id in Follow.objects.filter(
+                author_id__in=list(by_author)
+            ).values_list('user_id', 'author_id').iterator()
+            for recipe in by_author[author_id]
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_ids):
+    """Добавляет в ленту последние рецепты обычных авторов."""
+    author_ids = set(author_ids) - popular_author_ids()
+    if not author_ids:
+        return
+    recipes = Recipe.objects.filter(author_id__in=author_ids).exclude(
+        pk__in=TimelineEntry.objects.filter(
+            user_id=user_id
+        ).values('recipe_id')
+    ).order_by('-pub_date').values_list(
+        'pk', 'pub_date'
+    )[:settings.FEED_TIMELINE_SIZE]
+    insert_rows(
+        TimelineEntry, ('user', 'recipe', 'pub_date'),
+        [(user_id, pk, pub_date) for pk, pub_date in recipes],
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author_id):
+    """Добавляет последние рецепты автора в ленты всех подписчиков."""
+    recipes = list(
+        Recipe.objects.filter(author_id=author_id).order_by(
+            '-pub_date'
+        ).values_list('pk', 'pub_date')[:settings.FEED_TIMELINE_SIZE]
+    )
+    if not recipes:
+        return
+    insert_rows(
+        TimelineEntry, ('user', 'recipe', 'pub_date'),
+        (
+            (user_id, pk, pub_date)
+            for user_id in Follow.objects.filter(
+                author_id=author_id
+            ).values_list('user_id', flat=True).iterator()
+            for pk, pub_date in recipes
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+@transaction.atomic
+def rebuild_timeline(user_id):
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    backfill(
+        user_id,
+        Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        )
+    )
+
+
+def before(cursor, date_field, id_field):
+    pub_date, recipe_id = cursor
+    return Q(**{f'{date_field}__lt': pub_date}) | Q(
+        **{date_field: pub_date, f'{id_field}__lt': recipe_id}
+    )
+
+
+def trim_timelines():
+    """
+    Удаляет из лент записи старше FEED_TIMELINE_SIZE последних.
+    Возвращает количество обрезанных лент.
+    """
+    size = settings.FEED_TIMELINE_SIZE
+    user_ids = TimelineEntry.objects.values('user').annotate(
+        entries=Count('id')
+    ).filter(entries__gt=size).values_list('user', flat=True)
+    trimmed = 0
+    for user_id in list(user_ids):
+        timeline = TimelineEntry.objects.filter(user_id=user_id)
+        last = timeline.order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[size - 1]
+        timeline.filter(before(last, 'pub_date', 'recipe_id')).delete()
+        trimmed += 1
+    return trimmed
+
+
+def feed_page(user, cursor=None, limit=10):
+    """
+    Страница ленты подписок: записи ленты пользователя слиянием
+    с рецептами популярных авторов, на которых он подписан.
+    cursor - (pub_date, id) последнего рецепта предыдущей страницы.
+    Возвращает id рецептов страницы и курсор следующей страницы.
+    """
+    timeline = TimelineEntry.objects.filter(user=user)
+    if cursor is not None:
+        timeline = timeline.filter(before(cursor, 'pub_date', 'recipe_id'))
+    sources = [
+        timeline.order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[:limit + 1]
+    ]
+    popular_ids = popular_author_ids()
+    if popular_ids:
+        followed = Follow.objects.filter(
+            user=user, author__in=popular_ids
+        ).values_list('author_id', flat=True)
+        for author_id, recipes in author_recipes(followed).items():
+            full = len(recipes) == settings.FEED_AUTHOR_RECIPES
+            if cursor is not None:
+                recipes = [entry for entry in recipes if entry < cursor]
+            if full and len(recipes) <= limit:
+                older = Recipe.objects.filter(author_id=author_id)
+                if recipes or cursor is not None:
+                    older = older.filter(
+                        before(recipes[-1] if recipes else cursor,
+                               'pub_date', 'id')
+                    )
+                recipes = recipes + list(
+                    older.order_by('-pub_date', '-id').values_list(
+                        'pub_date', 'id'
+                    )[:limit + 1]
+                )
+            sources.append(recipes[:limit + 1])
+    entries = heapq.merge(*sources, reverse=True)
+    page = []
+    for entry in entries:
+        if page and page[-1] == entry:
+            continue
+        page.append(entry)
+        if len(page) > limit:
+            break
+    next_cursor = page[limit - 1] if len(page) > limit else None
+    return [recipe_id for _, recipe_id in page[:limit]], next_cursor
@@ -0,0 +1,137 @@
+import gzip
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from users.models import User
+from .feed import fan_out
+from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .signals import recipes_changed
+from .utils import bulk_create_with_ids, insert_rows
+from .validators import recipe_errors
+
+
+def open_ndjson(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+class RecipeImporter:
+    """
+    Импорт рецептов из строк NDJSON в формате выгрузки export_data:
+    author_email, name, text, cooking_time, image (путь в хранилище),
+    ingredients - [{name, measurement_unit, amount}], tags - слаги.
+    Ингредиенты и теги ищутся по словарям, построенным один раз
+    на весь импорт, авторы - одним запросом на пачку.
+    """
+
+    def __init__(self, default_author=None):
+        self.ingredients = {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'
+            )
+        }
+        self.tags = dict(Tag.objects.values_list('slug', 'pk'))
+        self.amount_field = RecipeIngredient._meta.get_field('amount')
+        self.default_author = default_author
+
+    def ingredient(self, item):
+        if not isinstance(item, dict):
+            raise ValidationError('Ингредиент должен быть объектом.')
+        key = (item.get('name'), item.get('measurement_unit'))
+        if key not in self.ingredients:
+            raise ValidationError(
+                'Ингредиент {} ({}) не найден.'.format(*key)
+            )
+        return (
+            self.ingredients[key],
+            self.amount_field.clean(item.get('amount'), None)
+        )
+
+    def tag(self, slug):
+        if slug not in self.tags:
+            raise ValidationError(f'Тэг {slug} не найден.')
+        return self.tags[slug]
+
+    def parse(self, line):
+        """
+        Разбирает строку и проверяет рецепт по правилам
+        RecipeSerializer. Возвращает (email автора, рецепт,
+        [(id ингредиента, количество)], [id тегов]);
+        ошибки - ValidationError.
+        """
+        try:
+            data = json.loads(line)
+        except ValueError as error:
+            raise ValidationError(f'Некорректный JSON: {error}')
+        if not isinstance(data, dict):
+            raise ValidationError('Рецепт должен быть объектом JSON.')
+        email = data.get('author_email')
+        if not email and self.default_author is None:
+            raise ValidationError('Не указан автор рецепта.')
+        recipe = Recipe(
+            name=data.get('name', ''),
+            text=data.get('text', ''),
+            cooking_time=data.get('cooking_time'),
+            image=data.get('image') or '',
+        )
+        recipe.clean_fields(exclude=('author', 'image'))
+        ingredients = [
+            self.ingredient(item) for item in data.get('ingredients') or []
+        ]
+        tags = [self.tag(slug) for slug in data.get('tags') or []]
+        errors = recipe_errors(ingredients, tags)
+        if errors:
+            raise ValidationError(errors)
+        return email, recipe, ingredients, tags
+
+    def save(self, items):
+        """
+        Создаёт рецепты пачки в одной транзакции: рецепты, ингредиенты
+        и теги - тремя массовыми вставками.
+        items - [(номер строки, результат parse)].
+        Возвращает id созданных рецептов и ошибки [(номер, сообщение)].
+        """
+        emails = {email for _, (email, *_) in items if email}
+        authors = dict(
+            User.objects.filter(email__in=emails).values_list('email', 'pk')
+        ) if emails else {}
+        errors = []
+        ready = []
+        for number, (email, recipe, ingredients, tags) in items:
+            recipe.author_id = authors.get(email) if email else (
+                self.default_author
+            )
+            if recipe.author_id is None:
+                errors.append((number, f'Автор {email} не найден.'))
+                continue
+            ready.append((recipe, ingredients, tags))
+        if not ready:
+            return [], errors
+        with transaction.atomic():
+            recipes = bulk_create_with_ids(
+                Recipe, [recipe for recipe, _, _ in ready]
+            )
+            insert_rows(
+                RecipeIngredient, ('recipe', 'ingredient', 'amount'),
+                (
+                    (recipe.pk, ingredient, amount)
+                    for recipe, ingredients, _ in ready
+                    for ingredient, amount in ingredients
+                )
+            )
+            insert_rows(
+                Recipe.tags.through, ('recipe', 'tag'),
+                (
+                    (recipe.pk, tag)
+                    for recipe, _, tags in ready
+                    for tag in tags
+                )
+            )
+            recipe_ids = [recipe.pk for recipe in recipes]
+            recipes_changed.send(sender=Recipe, recipe_ids=recipe_ids)
+            transaction.on_commit(lambda: fan_out(recipes))
+        return recipe_ids, errors
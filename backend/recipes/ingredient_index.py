@@ -0,0 +1,219 @@
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .models import RecipeIngredient
+from .utils import values_array
+
+SEQUENCE_KEY = 'ingredient-index:sequence'
+CHANGE_KEY = 'ingredient-index:change:{}'
+# Вес количества недостающих ингредиентов в составном ключе сортировки:
+# соседние значения покрытия рецептов до 50 ингредиентов отличаются
+# больше чем на 1 / 2500, а 50 недостающих дают лишь 5e-6.
+MISSING_WEIGHT = 1e-7
+
+logger = logging.getLogger(__name__)
+
+
+def record_change(recipe_ids):
+    """
+    Записывает изменение рецептов в журнал общего кэша,
+    по которому индексы всех процессов догоняют базу.
+    """
+    cache.add(SEQUENCE_KEY, 0, None)
+    sequence = cache.incr(SEQUENCE_KEY)
+    cache.set(
+        CHANGE_KEY.format(sequence), list(recipe_ids),
+        settings.INGREDIENT_INDEX_JOURNAL_TTL
+    )
+
+
+class IndexSnapshot(NamedTuple):
+    """Неизменяемое состояние индекса; overlay после публикации не меняется."""
+    indptr: Any
+    recipe_ids: Any
+    sizes: Any
+    overlay: dict
+    sequence: int
+
+
+class IngredientIndex:
+    """
+    Инвертированный индекс ингредиент -> рецепты в памяти процесса.
+    Хранится в формате CSR: рецепты ингредиента i - отсортированный
+    срез recipe_ids[indptr[i]:indptr[i + 1]] (int32), а sizes[r] -
+    количество ингредиентов рецепта r.
+    Изменённые после построения рецепты лежат в overlay
+    (id рецепта -> множество ингредиентов) и перекрывают базовый индекс.
+    Процессы узнают об изменениях из журнала record_change в общем кэше;
+    если журнал потерян или overlay разросся, индекс строится заново.
+    Новое состояние собирается отдельно и публикуется под блокировкой
+    одним IndexSnapshot: поиск берёт снимок один раз и не видит
+    наполовину обновлённый индекс.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Строит снимок индекса по RecipeIngredient."""
+        import numpy as np
+
+        cache.add(SEQUENCE_KEY, 0, None)
+        sequence = cache.get(SEQUENCE_KEY, 0)
+        pairs = values_array(
+            RecipeIngredient.objects.order_by().values_list(
+                'ingredient_id', 'recipe_id'
+            )
+        )
+        ingredients, recipes = pairs[:, 0], pairs[:, 1]
+        order = np.lexsort((recipes, ingredients))
+        ingredients, recipes = ingredients[order], recipes[order]
+        ingredient_count = int(ingredients.max()) + 1 if len(pairs) else 0
+        recipe_count = int(recipes.max()) + 1 if len(pairs) else 0
+        indptr = np.zeros(ingredient_count + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(ingredients, minlength=ingredient_count),
+            out=indptr[1:]
+        )
+        return IndexSnapshot(
+            indptr=indptr,
+            recipe_ids=recipes.astype(np.int32),
+            sizes=np.bincount(
+                recipes, minlength=recipe_count
+            ).astype(np.int32),
+            overlay={},
+            sequence=sequence,
+        )
+
+    def build(self):
+        """Перестраивает индекс и возвращает новый снимок."""
+        snapshot = self.load()
+        with self._lock:
+            self.snapshot = snapshot
+        return snapshot
+
+    def apply_changes(self, snapshot, recipe_ids, sequence):
+        """Снимок с изменёнными рецептами в новой копии overlay."""
+        ingredients = defaultdict(set)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].add(ingredient_id)
+        overlay = dict(snapshot.overlay)
+        for recipe_id in recipe_ids:
+            overlay[recipe_id] = frozenset(ingredients[recipe_id])
+        return snapshot._replace(overlay=overlay, sequence=sequence)
+
+    def updated(self, snapshot):
+        """Снимок, догнавший журнал изменений, или None для перестройки."""
+        current = cache.get(SEQUENCE_KEY)
+        if current == snapshot.sequence:
+            return snapshot
+        if current is None or current < snapshot.sequence:
+            return None
+        keys = [
+            CHANGE_KEY.format(sequence)
+            for sequence in range(snapshot.sequence + 1, current + 1)
+        ]
+        changes = cache.get_many(keys)
+        if (
+            len(changes) < len(keys)
+            or len(snapshot.overlay) > settings.INGREDIENT_INDEX_OVERLAY_LIMIT
+        ):
+            return None
+        return self.apply_changes(
+            snapshot,
+            {recipe_id for ids in changes.values() for recipe_id in ids},
+            current,
+        )
+
+    def sync(self):
+        """
+        Догоняет журнал изменений или перестраивает индекс.
+        Возвращает актуальный снимок.
+        """
+        with self._lock:
+            snapshot = self.snapshot
+            if snapshot is not None:
+                snapshot = self.updated(snapshot)
+            self.snapshot = snapshot or self.load()
+            return self.snapshot
+
+    def search(self, ingredient_ids, limit=20):
+        """
+        Рецепты, которые можно приготовить из данных ингредиентов.
+        Возвращает список (id рецепта, найдено ингредиентов, всего
+        ингредиентов), отсортированный по доле имеющихся ингредиентов,
+        затем по числу недостающих.
+        """
+        import numpy as np
+
+        snapshot = self.sync()
+        indptr = snapshot.indptr
+        query = {
+            ingredient_id for ingredient_id in ingredient_ids
+            if 0 <= ingredient_id < len(indptr) - 1
+        }
+        postings = [
+            snapshot.recipe_ids[indptr[ingredient_id]:
+                                indptr[ingredient_id + 1]]
+            for ingredient_id in query
+        ]
+        hits = np.bincount(
+            np.concatenate(postings) if postings
+            else np.empty(0, dtype=np.int32),
+            minlength=len(snapshot.sizes)
+        )
+        overlay_ids = np.fromiter(snapshot.overlay, dtype=np.int64)
+        hits[overlay_ids[overlay_ids < len(hits)]] = 0
+        candidates = np.flatnonzero(hits)
+        found = hits[candidates]
+        totals = snapshot.sizes[candidates]
+        query = set(ingredient_ids)
+        extra = [
+            (recipe_id, len(ingredients & query), len(ingredients))
+            for recipe_id, ingredients in snapshot.overlay.items()
+            if ingredients & query
+        ]
+        if extra:
+            extra_ids, extra_found, extra_totals = zip(*extra)
+            candidates = np.concatenate((candidates, extra_ids))
+            found = np.concatenate((found, extra_found))
+            totals = np.concatenate((totals, extra_totals))
+        if not len(candidates):
+            return []
+        score = found / totals - (totals - found) * MISSING_WEIGHT
+        limit = min(limit, len(candidates))
+        top = np.argpartition(-score, limit - 1)[:limit]
+        top = top[np.argsort(-score[top], kind='stable')]
+        return [
+            (int(candidates[i]), int(found[i]), int(totals[i])) for i in top
+        ]
+
+
+ingredient_index = IngredientIndex()
+
+
+def warm_up():
+    """
+    Строит индекс в фоновом потоке при старте процесса, чтобы первый
+    запрос подбора рецептов не ждал построения.
+    """
+    def build():
+        try:
+            ingredient_index.sync()
+        except Exception:
+            logger.exception('Не удалось построить индекс ингредиентов')
+        finally:
+            connections.close_all()
+
+    threading.Thread(
+        target=build, name='ingredient-index-warm-up', daemon=True
+    ).start()
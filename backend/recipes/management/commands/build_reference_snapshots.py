@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.snapshots import SNAPSHOTS, build_snapshot
+
+
+class Command(BaseCommand):
+    """
+    Построение снапшотов справочников тегов и ингредиентов,
+    которые nginx отдаёт без обращения к бэкенду.
+    Запускается при деплое, дальше снапшоты обновляются сами.
+    Команда - python manage.py build_reference_snapshots.
+    """
+
+    def handle(self, *args, **options):
+        for name in SNAPSHOTS:
+            self.stdout.write(
+                settings.REFERENCE_SNAPSHOT_URL + build_snapshot(name)
+            )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management import BaseCommand
+
+from recipes.similarity import build_similar_recipes
+
+
+class Command(BaseCommand):
+    """
+    Полный пересчёт похожих рецептов (MinHash + LSH).
+    Нужен после массовых загрузок: при сохранении рецепта
+    пересчитываются только изменённые рецепты.
+    Команда - python manage.py build_similar_recipes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        recipes, pairs = build_similar_recipes(options['batch_size'])
+        self.stdout.write(
+            f'Рецептов: {recipes}, пар похожих: {pairs}, '
+            f'за {time.perf_counter() - start:.1f} с'
+        )
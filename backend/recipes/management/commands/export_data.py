@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management import BaseCommand
+from django.db import connections
+
+from recipes.export import (EXPORT_TABLES, export_rows, shard_ranges,
+                            write_ndjson)
+
+
+def export_shard(table, start, end, path, compress, chunk_size):
+    return path, write_ndjson(
+        export_rows(table, start, end, chunk_size), path, compress
+    )
+
+
+class Command(BaseCommand):
+    """
+    Выгрузка тегов, ингредиентов, пользователей, рецептов
+    с ингредиентами и тегами, избранного, списков покупок и подписок
+    в NDJSON (или NDJSON.gz).
+    Таблицы читаются пачками, память не растёт с объёмом данных.
+    С --workers N каждая таблица делится по диапазонам pk на N файлов,
+    которые пишут параллельные процессы.
+    Команда - python manage.py export_data --output backup --gzip.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='export')
+        parser.add_argument(
+            '--tables', nargs='+', choices=list(EXPORT_TABLES),
+            default=list(EXPORT_TABLES)
+        )
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        os.makedirs(options['output'], exist_ok=True)
+        extension = '.ndjson.gz' if options['gzip'] else '.ndjson'
+        tasks = []
+        for table in options['tables']:
+            if options['workers'] > 1:
+                ranges = shard_ranges(table, options['workers'])
+            else:
+                ranges = [(None, None)]
+            for shard, (start, end) in enumerate(ranges):
+                name = table if len(ranges) == 1 else f'{table}-{shard:03}'
+                tasks.append((
+                    table, start, end,
+                    os.path.join(options['output'], name + extension),
+                    options['gzip'], options['chunk_size']
+                ))
+        started = time.perf_counter()
+        if options['workers'] > 1:
+            # Дочерние процессы открывают свои соединения с базой.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('fork')
+            ) as executor:
+                results = list(executor.map(export_shard, *zip(*tasks)))
+        else:
+            results = [export_shard(*task) for task in tasks]
+        for path, count in results:
+            self.stdout.write(f'{path}: {count}')
+        self.stdout.write(
+            f'Выгружено строк: {sum(count for _, count in results)}, '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
@@ -0,0 +1,196 @@
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import (FavoriteRecipe, Follow, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, Tag)
+from recipes.signals import recipes_changed
+from recipes.utils import bulk_create_with_ids
+from users.models import User
+
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'рагу', 'запеканка', 'соус', 'паста',
+    'жаркое', 'котлеты', 'оладьи', 'блины', 'омлет', 'плов', 'борщ',
+    'домашний', 'быстрый', 'летний', 'острый', 'сливочный', 'овощной',
+    'куриный', 'грибной', 'сырный', 'томатный', 'ароматный', 'нежный',
+)
+
+
+class SkewedSampler:
+    """
+    Выборка без повторов, где первые элементы популярнее остальных:
+    как ингредиенты вроде соли или авторы с сотнями рецептов.
+    """
+
+    def __init__(self, rng, population):
+        self.rng = rng
+        self.population = population
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) ** 0.8 for rank in range(len(population))
+        ))
+
+    def sample(self, count):
+        result = []
+        for item in self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=count * 3
+        ):
+            if item not in result:
+                result.append(item)
+                if len(result) == count:
+                    break
+        return result
+
+
+class Command(BaseCommand):
+    """
+    Наполнение базы синтетическими данными для нагрузочных тестов
+    и бенчмарков: пользователи, теги, рецепты с ингредиентами,
+    избранное, списки покупок и подписки.
+    Команда - python manage.py fill_bench_data --recipes 100000.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=30)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument('--follows-per-user', type=int, default=10)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = f'bench{int(time.time())}'
+        start = time.perf_counter()
+
+        tags = self.create_tags(options['tags'])
+        ingredients = self.create_ingredients(options['ingredients'])
+        users = self.create_users(options['users'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], users, tags, ingredients,
+            options['ingredients_per_recipe'], options['tags_per_recipe'],
+        )
+        self.create_relations(
+            FavoriteRecipe, users, recipe_ids, options['favorites_per_user']
+        )
+        self.create_relations(
+            ShoppingList, users, recipe_ids, options['carts_per_user']
+        )
+        self.create_follows(users, options['follows_per_user'])
+        self.stdout.write(
+            f'Данные созданы за {time.perf_counter() - start:.1f} с'
+        )
+
+    def create_tags(self, count):
+        existing = list(Tag.objects.values_list('id', flat=True))
+        missing = max(count - len(existing), 0)
+        new_tags = bulk_create_with_ids(Tag, [
+            Tag(
+                name=f'{self.prefix}-tag-{number}',
+                slug=f'{self.prefix}-tag-{number}',
+                color='#{:06x}'.format(self.rng.randrange(0x1000000)),
+            )
+            for number in range(missing)
+        ])
+        return existing + [tag.pk for tag in new_tags]
+
+    def create_ingredients(self, count):
+        existing = list(
+            Ingredient.objects.values_list('id', flat=True)[:count]
+        )
+        missing = max(count - len(existing), 0)
+        new_ingredients = bulk_create_with_ids(Ingredient, [
+            Ingredient(
+                name=f'{self.rng.choice(WORDS)} {self.prefix}-{number}',
+                measurement_unit=self.rng.choice(('г', 'мл', 'шт.')),
+            )
+            for number in range(missing)
+        ], batch_size=self.batch_size)
+        return existing + [ingredient.pk for ingredient in new_ingredients]
+
+    def create_users(self, count):
+        password = make_password(None)
+        users = bulk_create_with_ids(User, [
+            User(
+                username=f'{self.prefix}-user-{number}',
+                email=f'{self.prefix}-user-{number}@example.com',
+                first_name='Bench',
+                last_name=str(number),
+                password=password,
+            )
+            for number in range(count)
+        ], batch_size=self.batch_size)
+        return [user.pk for user in users]
+
+    def create_recipes(self, count, users, tags, ingredients,
+                       ingredients_per_recipe, tags_per_recipe):
+        recipe_ids = []
+        through = Recipe.tags.through
+        authors = SkewedSampler(self.rng, users)
+        ingredient_sampler = SkewedSampler(self.rng, ingredients)
+        for offset in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - offset)
+            with transaction.atomic():
+                recipes = bulk_create_with_ids(Recipe, [
+                    Recipe(
+                        author_id=authors.sample(1)[0],
+                        name=' '.join(self.rng.sample(WORDS, 3)),
+                        text=' '.join(self.rng.choices(WORDS, k=40)),
+                        cooking_time=self.rng.randint(5, 180),
+                    )
+                    for _ in range(size)
+                ])
+                RecipeIngredient.objects.bulk_create([
+                    RecipeIngredient(
+                        recipe_id=recipe.pk,
+                        ingredient_id=ingredient_id,
+                        amount=self.rng.randint(1, 500),
+                    )
+                    for recipe in recipes
+                    for ingredient_id in ingredient_sampler.sample(
+                        ingredients_per_recipe
+                    )
+                ])
+                through.objects.bulk_create([
+                    through(recipe_id=recipe.pk, tag_id=tag_id)
+                    for recipe in recipes
+                    for tag_id in self.rng.sample(
+                        tags, min(tags_per_recipe, len(tags))
+                    )
+                ])
+                recipes_changed.send(
+                    sender=Recipe, recipe_ids=[recipe.pk for recipe in recipes]
+                )
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+            self.stdout.write(f'Рецептов создано: {len(recipe_ids)}')
+        return recipe_ids
+
+    def create_relations(self, model, users, recipe_ids, per_user):
+        if not recipe_ids:
+            return
+        rows = [
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in users
+            for recipe_id in set(self.rng.sample(
+                recipe_ids, min(per_user, len(recipe_ids))
+            ))
+        ]
+        model.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def create_follows(self, users, per_user):
+        rows = []
+        authors = SkewedSampler(self.rng, users)
+        for user_id in users:
+            for author_id in authors.sample(per_user):
+                if author_id != user_id:
+                    rows.append(Follow(user_id=user_id, author_id=author_id))
+        Follow.objects.bulk_create(rows, batch_size=self.batch_size)
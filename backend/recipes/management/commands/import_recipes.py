@@ -0,0 +1,101 @@
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+
+from recipes.importer import RecipeImporter, open_ndjson
+from recipes.models import ImportCheckpoint
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Импорт каталога рецептов из NDJSON (или NDJSON.gz) в формате
+    export_data. Файл читается потоково, рецепты создаются пачками
+    по --batch-size строк, каждая пачка - в своей транзакции.
+    Строки с ошибками пропускаются и выводятся с номерами.
+    Номер последней обработанной строки пачки сохраняется
+    в ImportCheckpoint в той же транзакции, что и рецепты пачки
+    (источник - --checkpoint, по умолчанию абсолютный путь к файлу),
+    с --resume импорт продолжается после неё.
+    Команда - python manage.py import_recipes catalog.ndjson
+    --author partner@example.com.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--author', help='email автора для рецептов без author_email'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--checkpoint')
+        parser.add_argument('--resume', action='store_true')
+
+    def handle(self, *args, **options):
+        self.checkpoint = options['checkpoint'] or os.path.abspath(
+            options['path']
+        )
+        done = 0
+        if options['resume']:
+            done = ImportCheckpoint.objects.filter(
+                source=self.checkpoint
+            ).values_list('line', flat=True).first() or 0
+        self.importer = RecipeImporter(self.default_author(options['author']))
+        self.created = self.failed = 0
+        self.started = time.perf_counter()
+        batch = []
+        number = done
+        with open_ndjson(options['path']) as lines:
+            for number, line in enumerate(lines, 1):
+                if number <= done or not line.strip():
+                    continue
+                try:
+                    batch.append((number, self.importer.parse(line)))
+                except ValidationError as error:
+                    self.report(number, '; '.join(error.messages))
+                if number % options['batch_size'] == 0:
+                    self.flush(batch, number)
+                    batch = []
+        self.flush(batch, max(number, done))
+        self.stdout.write(
+            f'Создано рецептов: {self.created}, строк с ошибками: '
+            f'{self.failed}, за {time.perf_counter() - self.started:.1f} с'
+        )
+
+    @staticmethod
+    def default_author(email):
+        if email is None:
+            return None
+        author = User.objects.filter(email=email).values_list(
+            'pk', flat=True
+        ).first()
+        if author is None:
+            raise CommandError(f'Пользователь {email} не найден.')
+        return author
+
+    def report(self, number, message):
+        self.failed += 1
+        self.stderr.write(f'Строка {number}: {message}')
+
+    def flush(self, batch, number):
+        try:
+            with transaction.atomic():
+                recipe_ids, errors = self.importer.save(batch)
+                ImportCheckpoint.objects.update_or_create(
+                    source=self.checkpoint, defaults={'line': number}
+                )
+        except DatabaseError as error:
+            raise CommandError(
+                f'Пачка до строки {number} не сохранена: {error}. '
+                f'Импорт продолжится с неё при запуске с --resume.'
+            )
+        for line_number, message in errors:
+            self.report(line_number, message)
+        self.created += len(recipe_ids)
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            f'Строк обработано: {number}, рецептов создано: {self.created}, '
+            f'{self.created / max(elapsed, 1e-9):.0f} рецептов/с'
+        )
@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+
+from recipes.documents import build_documents
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Пересборка документов всех рецептов пачками (после миграции
+    или изменения формата ответа).
+    Команда - python manage.py rebuild_recipe_documents.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        last_id = 0
+        total = 0
+        while True:
+            recipe_ids = list(
+                Recipe.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not recipe_ids:
+                break
+            build_documents(recipe_ids)
+            last_id = recipe_ids[-1]
+            total += len(recipe_ids)
+            self.stdout.write(f'Собрано документов: {total}')
@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+
+from recipes.models import Recipe
+from recipes.search import clear_search_index, update_search_index
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт поискового индекса всех рецептов пачками.
+    Команда - python manage.py rebuild_search_index.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        clear_search_index()
+        last_id = 0
+        total = 0
+        while True:
+            recipe_ids = list(
+                Recipe.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not recipe_ids:
+                break
+            update_search_index(recipe_ids)
+            last_id = recipe_ids[-1]
+            total += len(recipe_ids)
+            self.stdout.write(f'Проиндексировано рецептов: {total}')
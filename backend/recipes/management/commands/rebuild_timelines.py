@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand
+
+from recipes.feed import rebuild_timeline, trim_timelines
+from recipes.models import Follow
+
+
+class Command(BaseCommand):
+    """
+    Перестройка лент подписок всех пользователей (после массовых
+    загрузок рецептов или смены порога FEED_FANOUT_LIMIT).
+    С --trim только обрезает ленты до FEED_TIMELINE_SIZE записей,
+    её стоит запускать по расписанию.
+    Команда - python manage.py rebuild_timelines [--trim].
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trim', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['trim']:
+            self.stdout.write(f'Обрезано лент: {trim_timelines()}')
+            return
+        user_ids = list(
+            Follow.objects.order_by('user_id').values_list(
+                'user_id', flat=True
+            ).distinct()
+        )
+        for number, user_id in enumerate(user_ids, 1):
+            rebuild_timeline(user_id)
+            if number % 1000 == 0:
+                self.stdout.write(f'Перестроено лент: {number}')
+        self.stdout.write(f'Перестроено лент: {len(user_ids)}')
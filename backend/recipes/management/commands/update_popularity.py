@@ -0,0 +1,21 @@
+import time
+
+from django.core.management import BaseCommand
+
+from recipes.popularity import recompute_popularity
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт популярности рецептов по датам добавлений в избранное
+    и список покупок. Запускается по расписанию, например раз в сутки.
+    Команда - python manage.py update_popularity.
+    """
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        recipes = recompute_popularity()
+        self.stdout.write(
+            f'Рецептов с событиями: {recipes}, '
+            f'за {time.perf_counter() - start:.1f} с'
+        )
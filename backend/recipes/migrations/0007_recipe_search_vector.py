@@ -0,0 +1,99 @@
+# Generated by Django 3.2 on 2026-10-19 10:37
+
+from collections import defaultdict
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+POSTGRES_FORWARD = (
+    'CREATE INDEX recipes_recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)',
+    """
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('russian', recipe.name), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_recipeingredient AS amount
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = amount.ingredient_id
+            WHERE amount.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian', recipe.text), 'C')
+    """,
+)
+POSTGRES_BACKWARD = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin',
+)
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE recipes_recipe_fts '
+    'USING fts5(name, text, ingredients, '
+    "tokenize = 'unicode61 remove_diacritics 2')",
+)
+SQLITE_BACKWARD = (
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def fill_sqlite_index(apps, schema_editor):
+    """Заносит в FTS5 рецепты, созданные до миграции."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    from recipes.search import FTS_TABLE, stem_text
+
+    database = connection.alias
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    names = defaultdict(list)
+    for recipe_id, name in RecipeIngredient.objects.using(
+        database
+    ).values_list('recipe_id', 'ingredient__name').iterator():
+        names[recipe_id].append(name)
+    rows = [
+        (pk, stem_text(name), stem_text(text),
+         stem_text(' '.join(names[pk])))
+        for pk, name, text in Recipe.objects.using(database).values_list(
+            'pk', 'name', 'text'
+        ).iterator()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+            'VALUES (%s, %s, %s, %s)',
+            rows
+        )
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {
+            'postgresql': postgres,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, ())
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    GIN-индекс и заполнение search_vector для PostgreSQL,
+    таблица FTS5 с уже созданными рецептами для SQLite.
+    """
+
+    dependencies = [
+        ('recipes', '0006_rename_measure_unit_ingredient_measurement_unit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD),
+        ),
+        migrations.RunPython(fill_sqlite_index, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core import validators
 from django.db import models
 
@@ -108,11 +109,31 @@ class Recipe(models.Model):
         'Дата публикации рецепта',
         auto_now_add=True,
     )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    popularity = models.FloatField(
+        'Популярность',
+        default=0.0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-popularity', '-pub_date'],
+                name='recipe_popularity_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -188,6 +209,46 @@ class Follow(models.Model):
         return f'{self.user} подписаля на автора {self.author}'
 
 
+class TimelineEntry(models.Model):
+    '''
+    Модель для ленты подписок: рецепт автора, на которого подписан
+    пользователь. Дата публикации копируется из рецепта, чтобы
+    читать ленту по индексу без join.
+    '''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт',
+    )
+    pub_date = models.DateTimeField('Дата публикации рецепта')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+        ordering = ('-pub_date', '-recipe')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
 class FavoriteRecipe(models.Model):
     '''
     Модель для добавления рецептов в избранное.
@@ -204,6 +265,11 @@ class FavoriteRecipe(models.Model):
         related_name='favorites',
         verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         constraints = [
@@ -234,6 +300,11 @@ class ShoppingList(models.Model):
         related_name='shop_list',
         verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'Покупка'
@@ -246,3 +317,104 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в список для скачивания'
+
+
+class RecipeLSHBucket(models.Model):
+    '''
+    Корзины LSH рецепта: по одной на полосу MinHash-сигнатуры.
+    Рецепты с общей корзиной - кандидаты в похожие.
+    '''
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='lsh_buckets',
+        verbose_name='Рецепт',
+    )
+    bucket = models.BigIntegerField(
+        verbose_name='Корзина',
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+
+    def __str__(self):
+        return f'{self.recipe} в корзине {self.bucket}'
+
+
+class SimilarRecipe(models.Model):
+    '''
+    Модель для похожих рецептов: топ рецептов с общими
+    ингредиентами и тегами, score - оценка коэффициента Жаккара.
+    '''
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'], name='unique_similar_recipe'
+            ),
+        ]
+        ordering = ('-score',)
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
+
+
+class RecipeDocument(models.Model):
+    '''
+    Готовый JSON рецепта для чтения: поля ShowRecipeSerializer,
+    не зависящие от пользователя. Хранится текстом, чтобы порядок
+    полей совпадал с ответом API (jsonb переупорядочил бы ключи).
+    Пересобирается при изменении рецепта, его тегов, ингредиентов
+    и профиля автора, см. recipes.documents.
+    '''
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document',
+        verbose_name='Рецепт',
+    )
+    body = models.TextField(verbose_name='JSON рецепта')
+    updated = models.DateTimeField('Обновлён', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Документ рецепта'
+        verbose_name_plural = 'Документы рецептов'
+
+    def __str__(self):
+        return f'Документ {self.recipe_id}'
+
+
+class ImportCheckpoint(models.Model):
+    '''
+    Контрольная точка импорта каталога (import_recipes): номер
+    последней сохранённой строки источника. Пишется в одной транзакции
+    с пачкой рецептов, поэтому после сбоя пачка не создаётся дважды.
+    '''
+    source = models.CharField('Источник', max_length=1024, unique=True)
+    line = models.PositiveBigIntegerField('Последняя строка', default=0)
+    updated = models.DateTimeField('Обновлена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Контрольная точка импорта'
+        verbose_name_plural = 'Контрольные точки импорта'
+
+    def __str__(self):
+        return f'{self.source}: {self.line}'
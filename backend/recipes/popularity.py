@@ -0,0 +1,117 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Exp, Greatest, Least, Ln
+from django.utils import timezone as django_timezone
+
+from .models import FavoriteRecipe, Recipe, ShoppingList
+from .utils import update_rows
+
+# Популярность рецепта - логарифм суммы весов событий (избранное,
+# список покупок), каждый из которых умножен на exp((t - EPOCH) / tau).
+# Отношение таких сумм у двух рецептов совпадает с отношением их
+# затухающих к текущему моменту оценок, поэтому порядок по столбцу
+# не устаревает со временем и читается по индексу, а новое событие
+# прибавляется к логарифму через logaddexp без пересчёта остальных.
+# 0 означает отсутствие событий (фиктивное событие веса 1 в EPOCH).
+EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+# Доля суммы, остающаяся после вычитания события, ниже которой
+# событий больше нет: защита от логарифма нуля при округлении.
+MIN_REMAINDER = 1e-12
+# События старше стольких периодов полураспада вклада не дают.
+HORIZON_HALF_LIVES = 40
+
+
+def decay_seconds():
+    return settings.POPULARITY_HALF_LIFE_HOURS * 3600 / math.log(2)
+
+
+def event_weights():
+    return {
+        FavoriteRecipe: settings.POPULARITY_FAVORITE_WEIGHT,
+        ShoppingList: settings.POPULARITY_SHOPPING_CART_WEIGHT,
+    }
+
+
+def event_exponent(created, weight):
+    return (
+        math.log(weight)
+        + (created - EPOCH).total_seconds() / decay_seconds()
+    )
+
+
+def add_event(recipe_id, created, weight):
+    exponent = Value(event_exponent(created, weight), FloatField())
+    high = Greatest(F('popularity'), exponent)
+    low = Least(F('popularity'), exponent)
+    Recipe.objects.filter(pk=recipe_id).update(
+        popularity=high + Ln(1.0 + Exp(low - high))
+    )
+
+
+def remove_event(recipe_id, created, weight):
+    """
+    Вычитание события из суммы. Если событие составляло почти всю
+    сумму, других событий не осталось и популярность сбрасывается в 0.
+    """
+    value = event_exponent(created, weight)
+    exponent = Value(value, FloatField())
+    remainder = Greatest(
+        1.0 - Exp(Least(exponent - F('popularity'), Value(0.0))),
+        Value(MIN_REMAINDER, FloatField())
+    )
+    Recipe.objects.filter(pk=recipe_id).update(popularity=Case(
+        When(popularity__lte=value - math.log1p(-MIN_REMAINDER),
+             then=Value(0.0)),
+        default=Greatest(F('popularity') + Ln(remainder), Value(0.0)),
+    ))
+
+
+def recompute_popularity():
+    """
+    Полный пересчёт популярности по датам событий: устраняет
+    накопленные ошибки округления и вклад давно затухших событий.
+    Возвращает количество рецептов с событиями.
+    """
+    import numpy as np
+
+    since = django_timezone.now() - timedelta(
+        hours=settings.POPULARITY_HALF_LIFE_HOURS * HORIZON_HALF_LIVES
+    )
+    decay = decay_seconds()
+    recipes = []
+    exponents = []
+    for model, weight in event_weights().items():
+        offset = math.log(weight) - EPOCH.timestamp() / decay
+        for recipe_id, created in model.objects.filter(
+            created__gte=since
+        ).order_by().values_list('recipe_id', 'created').iterator():
+            recipes.append(recipe_id)
+            exponents.append(created.timestamp() / decay + offset)
+    if not recipes:
+        Recipe.objects.exclude(popularity=0).update(popularity=0)
+        return 0
+    recipes = np.array(recipes, dtype=np.int64)
+    exponents = np.array(exponents, dtype=np.float64)
+    recipe_ids = np.unique(recipes)
+    # Фиктивное событие в EPOCH у каждого рецепта.
+    recipes = np.concatenate((recipes, recipe_ids))
+    exponents = np.concatenate((exponents, np.zeros(len(recipe_ids))))
+    order = np.argsort(recipes, kind='stable')
+    recipes, exponents = recipes[order], exponents[order]
+    starts = np.flatnonzero(np.r_[True, recipes[1:] != recipes[:-1]])
+    highest = np.maximum.reduceat(exponents, starts)
+    counts = np.diff(np.r_[starts, len(recipes)])
+    scores = highest + np.log(np.add.reduceat(
+        np.exp(exponents - np.repeat(highest, counts)), starts
+    ))
+    with transaction.atomic():
+        Recipe.objects.exclude(popularity=0).update(popularity=0)
+        update_rows(
+            Recipe, 'popularity',
+            zip(scores.tolist(), recipes[starts].tolist())
+        )
+    return len(starts)
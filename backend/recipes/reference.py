@@ -0,0 +1,39 @@
+from django.conf import settings
+
+from backend.cache import TwoTierCache
+from .models import Tag
+
+# Версия тегов читается из общего кэша при каждом обращении,
+# чтобы изменения тегов сразу видели все процессы.
+tag_cache = TwoTierCache(
+    'reference:tags', ttl=settings.REFERENCE_LOCAL_TTL,
+    local_ttl=settings.REFERENCE_LOCAL_TTL, local_size=4, version_ttl=0,
+)
+
+
+def bump_tags_version():
+    tag_cache.invalidate()
+
+
+def tag_ids_by_slug():
+    """Словарь слаг -> id тега из двухуровневого кэша."""
+    return tag_cache.get_or_set(
+        'by-slug', lambda: dict(Tag.objects.values_list('slug', 'id'))
+    )
+
+
+def get_tag_ids(slugs):
+    """Id тегов по слагам, неизвестные слаги пропускаются."""
+    tag_map = tag_ids_by_slug()
+    return {tag_map[slug] for slug in slugs if slug in tag_map}
+
+
+def tag_dicts():
+    """
+    Теги в формате TagSerializer по id. Словари общие для всех
+    рецептов ответа, их нельзя изменять.
+    """
+    return tag_cache.get_or_set('dicts', lambda: {
+        tag['id']: tag
+        for tag in Tag.objects.values('id', 'name', 'color', 'slug')
+    })
@@ -0,0 +1,149 @@
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections, router, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, RecipeIngredient
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+# Веса столбцов FTS5 для bm25: name, text, ingredients.
+FTS_WEIGHTS = (10.0, 1.0, 5.0)
+# Рецептов в одном пересчёте индекса фоновой задачей.
+SEARCH_INDEX_BATCH_SIZE = 2000
+
+
+@lru_cache(maxsize=None)
+def get_stemmer():
+    """Стеммер создаётся при первом поиске или индексации."""
+    import snowballstemmer
+
+    return snowballstemmer.stemmer(SEARCH_CONFIG)
+
+
+@lru_cache(maxsize=100000)
+def stem_word(word):
+    """Словарь рецептов невелик, поэтому основы слов кэшируются."""
+    return get_stemmer().stemWord(word)
+
+
+def stem_words(text):
+    return [stem_word(word) for word in re.findall(r'\w+', text.lower())]
+
+
+def stem_text(text):
+    """Текст из основ слов для FTS5, у которого нет русского стеммера."""
+    return ' '.join(stem_words(text))
+
+
+def fts_query(query):
+    """Все основы слов запроса как префиксы: "пирог"* "яблочн"*."""
+    return ' '.join(f'"{word}"*' for word in stem_words(query))
+
+
+def ingredient_names(recipe_ids):
+    names = defaultdict(list)
+    for recipe_id, name in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient__name'):
+        names[recipe_id].append(name)
+    return names
+
+
+def update_search_index(recipe_ids):
+    """
+    Пересчитывает поисковый индекс для рецептов: название,
+    описание и названия ингредиентов.
+    PostgreSQL - столбец search_vector с GIN-индексом,
+    SQLite - таблица FTS5 с основами слов.
+    Удалённые рецепты удаляются из индекса FTS5.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    database = router.db_for_write(Recipe)
+    vendor = connections[database].vendor
+    if vendor == 'postgresql':
+        names = RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+        Recipe.objects.using(database).filter(pk__in=recipe_ids).update(
+            search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector(
+                    Coalesce(Subquery(names), Value('')),
+                    weight='B', config=SEARCH_CONFIG
+                )
+                + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+            )
+        )
+    elif vendor == 'sqlite':
+        names = ingredient_names(recipe_ids)
+        rows = [
+            (pk, stem_text(name), stem_text(text),
+             stem_text(' '.join(names[pk])))
+            for pk, name, text in Recipe.objects.using(database).filter(
+                pk__in=recipe_ids
+            ).values_list('pk', 'name', 'text')
+        ]
+        with transaction.atomic(using=database):
+            with connections[database].cursor() as cursor:
+                cursor.executemany(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                    [(pk,) for pk in recipe_ids]
+                )
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} '
+                    '(rowid, name, text, ingredients) '
+                    'VALUES (%s, %s, %s, %s)',
+                    rows
+                )
+
+
+def clear_search_index():
+    """
+    Очистка FTS5 перед полной перестройкой:
+    удаление строк по одной в FTS5 обходится дорого.
+    """
+    database = router.db_for_write(Recipe)
+    if connections[database].vendor == 'sqlite':
+        with connections[database].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+
+def search_recipes(queryset, query):
+    """
+    Рецепты, найденные по запросу, отсортированные по релевантности.
+    На других СУБД - поиск по вхождению в название и описание.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-pub_date')
+    if vendor == 'sqlite':
+        match = fts_query(query)
+        if not match:
+            return queryset.none()
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = {Recipe._meta.db_table}.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[match],
+            select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+        ).order_by('-search_rank', '-pub_date')
+    return queryset.filter(Q(name__icontains=query) | Q(text__icontains=query))
@@ -0,0 +1,160 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from jobs.queue import enqueue
+from users.models import User
+from .documents import AUTHOR_FIELDS, rebuild_documents
+from .feed import forget_author_recipes, remove_author
+from .ingredient_index import record_change
+from .models import (FavoriteRecipe, Follow, Ingredient, Recipe, ShoppingList,
+                     Tag)
+from .popularity import add_event, event_weights, remove_event
+from .reference import bump_tags_version
+from .search import update_search_index
+from .snapshots import invalidate_snapshot
+
+# Рецепты созданы или изменены вместе с ингредиентами и тегами.
+# Аргумент recipe_ids - список id рецептов. Отправляется после
+# RecipeSerializer.create/update и массовых вставок (bulk_create),
+# для которых стандартные сигналы моделей не срабатывают.
+recipes_changed = Signal()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(sender, **kwargs):
+    """Любое изменение тегов делает устаревшими их локальные копии."""
+    bump_tags_version()
+    transaction.on_commit(lambda: invalidate_snapshot('tags'))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    transaction.on_commit(lambda: invalidate_snapshot('ingredients'))
+
+
+@receiver(recipes_changed)
+def reindex_recipes(sender, recipe_ids, **kwargs):
+    transaction.on_commit(lambda: update_search_index(recipe_ids))
+    transaction.on_commit(lambda: record_change(recipe_ids))
+    if len(recipe_ids) <= settings.SIMILAR_INCREMENTAL_LIMIT:
+        enqueue(
+            'recipes.update_similar_recipes', list(recipe_ids),
+            key=f'similar:{recipe_ids[0]}' if len(recipe_ids) == 1 else None
+        )
+
+
+@receiver(recipes_changed)
+def rebuild_recipe_documents(sender, recipe_ids, **kwargs):
+    """
+    Документы немногих рецептов пересобираются сразу после коммита,
+    массовые изменения - фоновой задачей.
+    """
+    recipe_ids = list(recipe_ids)
+    if len(recipe_ids) <= settings.RECIPE_DOCUMENTS_SYNC_LIMIT:
+        transaction.on_commit(lambda: rebuild_documents(recipe_ids))
+    else:
+        enqueue('recipes.rebuild_documents', recipe_ids)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def rebuild_reference_documents(sender, instance, created, **kwargs):
+    """Переименование тега или ингредиента меняет документы рецептов."""
+    if created:
+        return
+    field = 'tags' if sender is Tag else 'ingredients'
+    enqueue(
+        'recipes.rebuild_related_documents', field, instance.pk,
+        key=f'documents:{field}:{instance.pk}'
+    )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def forget_reference_documents(sender, instance, **kwargs):
+    """После удаления связи с рецептами уже не найти - ищем до него."""
+    field = 'tags' if sender is Tag else 'ingredients'
+    recipe_ids = list(Recipe.objects.filter(
+        **{field: instance}
+    ).values_list('id', flat=True))
+    if recipe_ids:
+        enqueue('recipes.rebuild_documents', recipe_ids)
+
+
+@receiver(post_save, sender=User)
+def rebuild_author_documents(sender, instance, created, update_fields,
+                             **kwargs):
+    """Профиль автора входит в документы его рецептов."""
+    if created or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    enqueue(
+        'recipes.rebuild_related_documents', 'author', instance.pk,
+        key=f'documents:author:{instance.pk}'
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: update_search_index([recipe_id]))
+    transaction.on_commit(lambda: record_change([recipe_id]))
+    transaction.on_commit(
+        lambda: forget_author_recipes(instance.author_id)
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    """
+    Переименование ингредиента меняет поиск по его рецептам.
+    У популярного ингредиента их много - пересчёт идёт фоновой задачей.
+    """
+    if created:
+        return
+    enqueue(
+        'recipes.reindex_ingredient_recipes', instance.pk,
+        key=f'search:ingredients:{instance.pk}'
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def publish_recipe(sender, instance, created, **kwargs):
+    if created:
+        enqueue('recipes.fan_out', [instance.pk])
+
+
+@receiver(post_save, sender=Follow)
+def follow_author(sender, instance, created, **kwargs):
+    if created:
+        enqueue('recipes.backfill', instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_author(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: remove_author(instance.user_id, instance.author_id)
+    )
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingList)
+def recipe_event_added(sender, instance, created, **kwargs):
+    if created:
+        add_event(
+            instance.recipe_id, instance.created, event_weights()[sender]
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingList)
+def recipe_event_removed(sender, instance, **kwargs):
+    remove_event(
+        instance.recipe_id, instance.created, event_weights()[sender]
+    )
@@ -0,0 +1,313 @@
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Recipe, RecipeIngredient, RecipeLSHBucket, SimilarRecipe
+from .utils import insert_rows, values_array
+
+# Хэши признаков: (a * x + b) mod PRIME, по одной паре (a, b)
+# на строку сигнатуры. Зерно фиксировано: сигнатуры, посчитанные
+# командой и при сохранении рецепта, должны совпадать.
+PRIME = (1 << 31) - 1
+SEED = 20230610
+# Множитель для смешивания строк полосы в 64-битный номер корзины.
+BUCKET_MULTIPLIER = np.uint64(0x100000001B3)
+# SQLite ограничивает число параметров запроса.
+QUERY_CHUNK_SIZE = 500
+SCORE_CHUNK_SIZE = 200000
+
+
+def signature_size():
+    return settings.SIMILAR_LSH_BANDS * settings.SIMILAR_LSH_ROWS
+
+
+def hash_parameters():
+    state = np.random.RandomState(SEED)
+    size = signature_size()
+    return (
+        state.randint(1, PRIME, size=size).astype(np.int64),
+        state.randint(0, PRIME, size=size).astype(np.int64),
+    )
+
+
+def recipe_features(recipe_ids=None):
+    """
+    Признаки рецептов - ингредиенты (2 * id) и теги (2 * id + 1).
+    Возвращает массивы (рецепт, признак), отсортированные по рецепту.
+    """
+    ingredients = RecipeIngredient.objects.order_by()
+    tags = Recipe.tags.through.objects.order_by()
+    if recipe_ids is not None:
+        ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+        tags = tags.filter(recipe_id__in=recipe_ids)
+    ingredients = values_array(
+        ingredients.values_list('recipe_id', 'ingredient_id')
+    )
+    tags = values_array(tags.values_list('recipe_id', 'tag_id'))
+    recipes = np.concatenate((ingredients[:, 0], tags[:, 0]))
+    features = np.concatenate((ingredients[:, 1] * 2, tags[:, 1] * 2 + 1))
+    order = np.argsort(recipes, kind='stable')
+    return recipes[order], features[order]
+
+
+def minhash(recipes, features):
+    """
+    MinHash-сигнатуры рецептов: для каждой хэш-функции минимум
+    её значений по признакам рецепта.
+    Возвращает id рецептов и матрицу сигнатур (рецепт x хэш).
+    """
+    if not len(recipes):
+        return recipes, np.empty((0, signature_size()), dtype=np.int32)
+    starts = np.flatnonzero(np.r_[True, recipes[1:] != recipes[:-1]])
+    multipliers, offsets = hash_parameters()
+    signatures = np.empty((len(starts), len(multipliers)), dtype=np.int32)
+    for column, (multiplier, offset) in enumerate(zip(multipliers, offsets)):
+        signatures[:, column] = np.minimum.reduceat(
+            (features * multiplier + offset) % PRIME, starts
+        )
+    return recipes[starts], signatures
+
+
+def lsh_buckets(signatures):
+    """
+    Номера корзин LSH: сигнатура делится на полосы по
+    SIMILAR_LSH_ROWS строк, каждая полоса хэшируется вместе
+    со своим номером, поэтому корзины разных полос не пересекаются.
+    """
+    rows = settings.SIMILAR_LSH_ROWS
+    values = signatures.astype(np.uint64)
+    buckets = np.empty(
+        (len(signatures), settings.SIMILAR_LSH_BANDS), dtype=np.uint64
+    )
+    for band in range(settings.SIMILAR_LSH_BANDS):
+        bucket = np.full(len(signatures), band + 1, dtype=np.uint64)
+        for column in range(band * rows, (band + 1) * rows):
+            bucket = (bucket ^ values[:, column]) * BUCKET_MULTIPLIER
+        buckets[:, band] = bucket
+    return buckets.view(np.int64)
+
+
+def estimate_similarity(left, right):
+    """Доля совпавших строк сигнатур - оценка коэффициента Жаккара."""
+    return (left == right).mean(axis=1)
+
+
+def unique_values(values):
+    if not len(values):
+        return values
+    values = np.sort(values)
+    return values[np.r_[True, values[1:] != values[:-1]]]
+
+
+def candidate_pairs(buckets):
+    """
+    Пары строк сигнатур с общей корзиной хотя бы в одной полосе.
+    Корзины больше SIMILAR_BUCKET_LIMIT (популярные сочетания
+    ингредиентов) пропускаются: они дают квадратичное число пар.
+    Пары копятся и схлопываются, когда новых становится больше,
+    чем уже собранных, - так каждая пара сортируется O(log) раз.
+    """
+    count = len(buckets)
+    pairs = np.empty(0, dtype=np.int64)
+    pending = []
+    pending_size = 0
+    for band in range(buckets.shape[1]):
+        order = np.argsort(buckets[:, band], kind='stable')
+        values = buckets[order, band]
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+        sizes = np.diff(np.r_[starts, count])
+        for size in np.unique(sizes):
+            if size < 2 or size > settings.SIMILAR_BUCKET_LIMIT:
+                continue
+            members = order[
+                starts[sizes == size][:, None] + np.arange(size)
+            ]
+            left, right = np.triu_indices(size, 1)
+            first = np.minimum(members[:, left], members[:, right])
+            second = np.maximum(members[:, left], members[:, right])
+            pending.append((first * count + second).ravel())
+            pending_size += pending[-1].size
+        if pending_size > len(pairs):
+            pairs = unique_values(np.concatenate([pairs] + pending))
+            pending = []
+            pending_size = 0
+    pairs = unique_values(np.concatenate([pairs] + pending))
+    return pairs // max(count, 1), pairs % max(count, 1)
+
+
+def top_neighbors(left, right, scores, limit):
+    """
+    По SIMILAR_RECIPES_COUNT лучших соседей для каждой строки:
+    пары учитываются в обе стороны.
+    """
+    sources = np.concatenate((left, right))
+    targets = np.concatenate((right, left))
+    scores = np.concatenate((scores, scores))
+    order = np.lexsort((-scores, sources))
+    sources, targets, scores = sources[order], targets[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]])
+    ranks = np.arange(len(sources)) - np.repeat(
+        starts, np.diff(np.r_[starts, len(sources)])
+    )
+    keep = ranks < limit
+    return sources[keep], targets[keep], scores[keep]
+
+
+def build_similar_recipes(batch_size=5000):
+    """
+    Полный пересчёт похожих рецептов: сигнатуры, корзины LSH,
+    оценка сходства кандидатов и запись топа соседей.
+    Возвращает количество рецептов и записанных пар.
+    """
+    recipe_ids, signatures = minhash(*recipe_features())
+    buckets = lsh_buckets(signatures)
+    left, right = candidate_pairs(buckets)
+    scores = np.empty(len(left))
+    for start in range(0, len(left), SCORE_CHUNK_SIZE):
+        end = start + SCORE_CHUNK_SIZE
+        scores[start:end] = estimate_similarity(
+            signatures[left[start:end]], signatures[right[start:end]]
+        )
+    sources, targets, scores = top_neighbors(
+        left, right, scores, settings.SIMILAR_RECIPES_COUNT
+    )
+    with transaction.atomic():
+        RecipeLSHBucket.objects.all().delete()
+        SimilarRecipe.objects.all().delete()
+        insert_rows(
+            RecipeLSHBucket, ('recipe', 'bucket'),
+            (
+                (recipe_id, bucket)
+                for recipe_id, row in zip(recipe_ids.tolist(),
+                                          buckets.tolist())
+                for bucket in row
+            ),
+            batch_size
+        )
+        insert_rows(
+            SimilarRecipe, ('recipe', 'similar', 'score'),
+            zip(recipe_ids[sources].tolist(), recipe_ids[targets].tolist(),
+                scores.tolist()),
+            batch_size
+        )
+    return len(recipe_ids), len(sources)
+
+
+def chunks(items, size=QUERY_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def shared_bucket_candidates(recipe_ids, buckets):
+    """
+    Кандидаты в похожие для каждого рецепта: не больше
+    SIMILAR_CANDIDATES_LIMIT рецептов с наибольшим числом общих корзин.
+    Корзины больше SIMILAR_BUCKET_LIMIT пропускаются, как при полной
+    перестройке: их участники не читаются из базы.
+    """
+    owners = defaultdict(set)
+    for recipe_id, row in zip(recipe_ids, buckets):
+        for bucket in row:
+            owners[bucket].add(recipe_id)
+    shared = defaultdict(Counter)
+    for bucket_chunk in chunks(owners):
+        small = RecipeLSHBucket.objects.filter(
+            bucket__in=bucket_chunk
+        ).values('bucket').annotate(size=Count('id')).filter(
+            size__gte=2, size__lte=settings.SIMILAR_BUCKET_LIMIT
+        ).values('bucket')
+        for candidate, bucket in RecipeLSHBucket.objects.filter(
+            bucket__in=small
+        ).values_list('recipe_id', 'bucket'):
+            for recipe_id in owners[bucket] - {candidate}:
+                shared[recipe_id][candidate] += 1
+    return {
+        recipe_id: [
+            candidate for candidate, _ in counter.most_common(
+                settings.SIMILAR_CANDIDATES_LIMIT
+            )
+        ]
+        for recipe_id, counter in shared.items()
+    }
+
+
+def current_neighbors(recipe_ids):
+    """Сохранённые топы рецептов: id -> [(score, similar_id, pk)]."""
+    neighbors = defaultdict(list)
+    for chunk in chunks(recipe_ids):
+        for pk, recipe_id, similar_id, score in SimilarRecipe.objects.filter(
+            recipe_id__in=chunk
+        ).values_list('pk', 'recipe_id', 'similar_id', 'score'):
+            neighbors[recipe_id].append((score, similar_id, pk))
+    return neighbors
+
+
+@transaction.atomic
+def update_similar_recipes(recipe_ids):
+    """
+    Пересчёт похожих для изменённых рецептов без полной перестройки.
+    Корзины рецептов заменяются, кандидаты берутся из общих корзин,
+    изменённые рецепты добавляются в топ кандидатов, если проходят
+    в него. Из чужих топов изменённые рецепты сначала удаляются,
+    поэтому до следующей полной перестройки там может остаться
+    меньше SIMILAR_RECIPES_COUNT соседей.
+    """
+    recipe_ids = set(recipe_ids)
+    SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+    SimilarRecipe.objects.filter(similar_id__in=recipe_ids).delete()
+    RecipeLSHBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+    changed, signatures = minhash(*recipe_features(recipe_ids))
+    changed = changed.tolist()
+    buckets = lsh_buckets(signatures).tolist()
+    RecipeLSHBucket.objects.bulk_create(
+        RecipeLSHBucket(recipe_id=recipe_id, bucket=bucket)
+        for recipe_id, row in zip(changed, buckets)
+        for bucket in row
+    )
+    candidates = shared_bucket_candidates(changed, buckets)
+    candidate_ids = {
+        candidate for items in candidates.values() for candidate in items
+    }
+    known, known_signatures = minhash(*recipe_features(candidate_ids))
+    row_of = {recipe_id: row for row, recipe_id in enumerate(known.tolist())}
+    limit = settings.SIMILAR_RECIPES_COUNT
+    neighbors = current_neighbors(candidate_ids)
+    new_rows = []
+    for row, recipe_id in enumerate(changed):
+        items = [
+            candidate for candidate in candidates.get(recipe_id, [])
+            if candidate in row_of
+        ]
+        scores = estimate_similarity(
+            signatures[[row] * len(items)],
+            known_signatures[[row_of[candidate] for candidate in items]]
+        ).tolist()
+        ranked = [
+            (score, candidate)
+            for score, candidate in sorted(zip(scores, items), reverse=True)
+            if score > 0
+        ]
+        new_rows.extend(
+            SimilarRecipe(recipe_id=recipe_id, similar_id=candidate,
+                          score=score)
+            for score, candidate in ranked[:limit]
+        )
+        for score, candidate in ranked:
+            if candidate not in recipe_ids:
+                neighbors[candidate].append((score, recipe_id, None))
+    stale = []
+    for recipe_id, items in neighbors.items():
+        items.sort(key=lambda item: item[0], reverse=True)
+        stale.extend(pk for _, _, pk in items[limit:] if pk is not None)
+        new_rows.extend(
+            SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                          score=score)
+            for score, similar_id, pk in items[:limit] if pk is None
+        )
+    for chunk in chunks(stale):
+        SimilarRecipe.objects.filter(pk__in=chunk).delete()
+    SimilarRecipe.objects.bulk_create(new_rows, ignore_conflicts=True)
@@ -0,0 +1,159 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from backend.cache import LocalLRUCache
+from .models import Ingredient, Tag
+
+# Поля совпадают с TagSerializer и IngredientSerializer.
+SNAPSHOTS = {
+    'tags': (Tag, ('id', 'name', 'color', 'slug')),
+    'ingredients': (Ingredient, ('id', 'name', 'measurement_unit')),
+}
+MANIFEST = 'manifest.json'
+LOCK = '.lock'
+
+local_manifests = LocalLRUCache(maxsize=4, ttl=settings.REFERENCE_LOCAL_TTL)
+
+
+def snapshot_path(filename):
+    return os.path.join(settings.REFERENCE_SNAPSHOT_ROOT, filename)
+
+
+@contextmanager
+def snapshot_lock():
+    """
+    Блокировка между воркерами (flock): сборка снапшотов, запись
+    манифеста и удаление текущих версий выполняются по одной.
+    """
+    os.makedirs(settings.REFERENCE_SNAPSHOT_ROOT, exist_ok=True)
+    with open(snapshot_path(LOCK), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_file(path, data):
+    """
+    Запись через собственный временный файл в том же каталоге:
+    nginx не увидит недописанный снапшот, а одновременные записи
+    воркеров не мешают друг другу.
+    """
+    directory, filename = os.path.split(path)
+    descriptor, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f'.{filename}.', suffix='.tmp'
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            output.write(data)
+        # mkstemp создаёт файл 0600, а читать его должен nginx.
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def read_manifest():
+    """
+    Манифест {справочник: файл текущей версии}. Файл перечитывается
+    только после изменения, его mtime - ключ локальной копии.
+    """
+    try:
+        mtime = os.stat(snapshot_path(MANIFEST)).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    manifest = local_manifests.get(mtime)
+    if manifest is None:
+        with open(snapshot_path(MANIFEST)) as manifest_file:
+            manifest = json.load(manifest_file)
+        local_manifests.set(mtime, manifest)
+    return manifest
+
+
+def remove_old_versions(name):
+    versions = sorted(
+        (
+            entry for entry in os.scandir(settings.REFERENCE_SNAPSHOT_ROOT)
+            if entry.name.startswith(f'{name}.')
+            and entry.name.endswith('.json')
+            and entry.name != f'{name}.json'
+        ),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True
+    )
+    for entry in versions[settings.REFERENCE_SNAPSHOT_KEEP:]:
+        for path in (entry.path, entry.path + '.gz'):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def current_version(name):
+    """Файл текущей версии снапшота или None, если его нужно строить."""
+    version = read_manifest().get(name)
+    if version is None or not os.path.exists(snapshot_path(f'{name}.json')):
+        return None
+    return version
+
+
+def build_snapshot(name):
+    """
+    Снапшот справочника в формате ответа API (компактный JSON):
+    версия <name>.<хэш>.json для вечного кэширования и текущая
+    <name>.json, оба рядом с предсжатыми .gz для gzip_static.
+    Возвращает имя файла версии.
+    """
+    with snapshot_lock():
+        return write_snapshot(name)
+
+
+def write_snapshot(name):
+    model, fields = SNAPSHOTS[name]
+    data = json.dumps(
+        list(model.objects.values(*fields)),
+        ensure_ascii=False, separators=(',', ':')
+    ).encode()
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    version = f'{name}.{hashlib.sha256(data).hexdigest()[:12]}.json'
+    for filename in (version, f'{name}.json'):
+        write_file(snapshot_path(filename), data)
+        write_file(snapshot_path(filename + '.gz'), compressed)
+    manifest = dict(read_manifest(), **{name: version})
+    write_file(snapshot_path(MANIFEST), json.dumps(manifest).encode())
+    remove_old_versions(name)
+    return version
+
+
+def invalidate_snapshot(name):
+    """
+    Удаляет текущий снапшот: nginx передаст запрос бэкенду,
+    и тот построит новую версию. Сборка, начатая до изменения,
+    успевает закончиться и не восстановит устаревший снапшот.
+    """
+    with snapshot_lock():
+        for filename in (f'{name}.json', f'{name}.json.gz'):
+            try:
+                os.remove(snapshot_path(filename))
+            except FileNotFoundError:
+                pass
+
+
+def snapshot_url(name):
+    """
+    URL текущей версии снапшота, при необходимости строит её.
+    Воркеры, одновременно заставшие снапшот удалённым, строят его
+    один раз: остальные после блокировки находят готовую версию.
+    """
+    version = current_version(name)
+    if version is None:
+        with snapshot_lock():
+            version = current_version(name) or write_snapshot(name)
+    return settings.REFERENCE_SNAPSHOT_URL + version
@@ -0,0 +1,37 @@
+from jobs.queue import task
+from .documents import rebuild_documents, rebuild_related_documents
+from .feed import backfill, backfill_followers, fan_out
+from .models import Recipe
+from .search import SEARCH_INDEX_BATCH_SIZE, update_search_index
+
+task('recipes.backfill')(backfill)
+task('recipes.backfill_followers')(backfill_followers)
+task('recipes.rebuild_documents')(rebuild_documents)
+task('recipes.rebuild_related_documents')(rebuild_related_documents)
+
+
+@task('recipes.fan_out')
+def fan_out_recipes(recipe_ids):
+    fan_out(Recipe.objects.filter(pk__in=recipe_ids).only(
+        'id', 'author_id', 'pub_date'
+    ))
+
+
+@task('recipes.update_similar_recipes')
+def update_similar(recipe_ids):
+    # Модуль с numpy загружается воркером задач при первом пересчёте.
+    from .similarity import update_similar_recipes
+
+    update_similar_recipes(recipe_ids)
+
+
+@task('recipes.reindex_ingredient_recipes')
+def reindex_ingredient_recipes(ingredient_id):
+    """Поисковый индекс рецептов с ингредиентом пачками."""
+    recipe_ids = list(Recipe.objects.filter(
+        ingredients=ingredient_id
+    ).values_list('id', flat=True))
+    for start in range(0, len(recipe_ids), SEARCH_INDEX_BATCH_SIZE):
+        update_search_index(
+            recipe_ids[start:start + SEARCH_INDEX_BATCH_SIZE]
+        )
@@ -0,0 +1,36 @@
+import json
+
+from django.test import TestCase
+
+from recipes.documents import attach_documents
+from recipes.models import Recipe, RecipeDocument
+from users.models import User
+
+
+class AttachDocumentsTests(TestCase):
+
+    def setUp(self):
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        for i in range(2):
+            Recipe.objects.create(
+                author=author, name=f'recipe {i}', text='text',
+                cooking_time=5, image='recipes/image.png',
+            )
+
+    def test_missing_documents_built(self):
+        RecipeDocument.objects.all().delete()
+        recipes = attach_documents(list(Recipe.objects.order_by('pk')))
+        self.assertEqual(len(recipes), 2)
+        self.assertEqual(
+            [json.loads(recipe.document.body)['id'] for recipe in recipes],
+            [recipe.pk for recipe in recipes],
+        )
+
+    def test_recipe_deleted_after_page_skipped(self):
+        """Рецепт удалён между выборкой страницы и загрузкой документов."""
+        page = list(Recipe.objects.order_by('pk'))
+        Recipe.objects.filter(pk=page[0].pk).delete()
+        recipes = attach_documents(page)
+        self.assertEqual(recipes, [page[1]])
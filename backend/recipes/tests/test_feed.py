@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from jobs.models import Job
+from recipes.feed import (backfill_followers, fan_out, popular_author_ids,
+                          popular_authors_cache)
+from recipes.models import Follow, Recipe, TimelineEntry
+from users.models import User
+
+
+@override_settings(FEED_FANOUT_LIMIT=1, JOBS_EAGER=False)
+class FeedTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        popular_authors_cache.local.clear()
+        popular_authors_cache.versions.clear()
+        self.author, *self.readers = [
+            User.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com',
+                password='Secret-123'
+            )
+            for i in range(3)
+        ]
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='recipe', text='text', cooking_time=5,
+            image='recipes/image.png',
+        )
+
+    def test_fan_out_repeated(self):
+        """Повтор задачи после сбоя не падает на уникальности."""
+        Follow.objects.create(user=self.readers[0], author=self.author)
+        fan_out([self.recipe])
+        fan_out([self.recipe])
+        self.assertEqual(TimelineEntry.objects.count(), 1)
+
+    def test_author_below_threshold_backfilled(self):
+        for reader in self.readers:
+            Follow.objects.create(user=reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        self.assertEqual(popular_author_ids(), {self.author.pk})
+        Follow.objects.filter(user=self.readers[1]).delete()
+        popular_authors_cache.invalidate()
+        self.assertEqual(popular_author_ids(), frozenset())
+        job = Job.objects.get(name='recipes.backfill_followers')
+        self.assertEqual(job.args, [self.author.pk])
+        backfill_followers(*job.args)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user_id', 'recipe_id')),
+            [(self.readers[0].pk, self.recipe.pk)],
+        )
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import TestCase
+
+from recipes.models import ImportCheckpoint, Ingredient, Recipe, Tag
+from users.models import User
+
+
+class ImportRecipesTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, 'catalog.ndjson')
+        with open(self.path, 'w') as catalog:
+            for i in range(3):
+                catalog.write(json.dumps({
+                    'author_email': 'cook@example.com', 'name': f'recipe {i}',
+                    'text': 'text', 'cooking_time': 5,
+                    'image': 'recipes/image.png', 'tags': ['breakfast'],
+                    'ingredients': [
+                        {'name': 'соль', 'measurement_unit': 'г',
+                         'amount': 1},
+                    ],
+                }) + '\n')
+
+    def import_recipes(self, *args):
+        call_command(
+            'import_recipes', self.path, '--batch-size', '2', *args,
+            stdout=StringIO(), stderr=StringIO()
+        )
+
+    def test_checkpoint_saved(self):
+        self.import_recipes()
+        self.assertEqual(Recipe.objects.count(), 3)
+        self.assertEqual(
+            ImportCheckpoint.objects.get(source=self.path).line, 3
+        )
+        self.import_recipes('--resume')
+        self.assertEqual(Recipe.objects.count(), 3)
+
+    def test_checkpoint_in_batch_transaction(self):
+        """Без контрольной точки пачка откатывается и не повторится."""
+        with mock.patch.object(
+            ImportCheckpoint.objects, 'update_or_create',
+            side_effect=DatabaseError('checkpoint')
+        ):
+            with self.assertRaises(CommandError):
+                self.import_recipes()
+        self.assertFalse(Recipe.objects.exists())
+        self.import_recipes('--resume')
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('name', flat=True)),
+            ['recipe 0', 'recipe 1', 'recipe 2'],
+        )
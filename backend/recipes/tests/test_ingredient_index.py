@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.ingredient_index import IngredientIndex, record_change
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import User
+
+
+class IngredientIndexTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        self.ingredients = [
+            Ingredient.objects.create(name=f'ingredient {i}',
+                                      measurement_unit='g')
+            for i in range(3)
+        ]
+        self.recipe = Recipe.objects.create(
+            author=author, name='recipe', text='text', cooking_time=5,
+            image='recipes/image.png',
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.ingredients[0], amount=1
+        )
+        self.index = IngredientIndex()
+
+    def test_search(self):
+        self.assertEqual(
+            self.index.search([self.ingredients[0].pk]),
+            [(self.recipe.pk, 1, 1)],
+        )
+        self.assertEqual(self.index.search([self.ingredients[1].pk]), [])
+
+    def test_change_publishes_new_snapshot(self):
+        snapshot = self.index.sync()
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.ingredients[1], amount=1
+        )
+        record_change([self.recipe.pk])
+        self.assertEqual(
+            self.index.search([self.ingredients[1].pk]),
+            [(self.recipe.pk, 1, 2)],
+        )
+        self.assertIsNot(self.index.snapshot, snapshot)
+        self.assertEqual(snapshot.overlay, {})
+        self.assertIs(self.index.snapshot.indptr, snapshot.indptr)
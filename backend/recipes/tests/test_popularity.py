@@ -0,0 +1,84 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList
+from recipes.popularity import recompute_popularity
+from users.models import User
+
+
+class PopularityTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com',
+                password='Secret-123'
+            )
+            for i in range(3)
+        ]
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.users[0], name=f'recipe{i}', text='text',
+                cooking_time=5, image='recipes/image.png',
+            )
+            for i in range(4)
+        ]
+
+    def add(self, model, user, recipe, hours_ago=0):
+        """Событие, созданное hours_ago часов назад."""
+        created = timezone.now() - timedelta(hours=hours_ago)
+        with mock.patch('django.utils.timezone.now', return_value=created):
+            return model.objects.create(user=user, recipe=recipe)
+
+    def scores(self):
+        return dict(Recipe.objects.values_list('pk', 'popularity'))
+
+    def assert_scores_equal(self, first, second):
+        self.assertEqual(first.keys(), second.keys())
+        for pk, score in first.items():
+            self.assertAlmostEqual(score, second[pk], places=6, msg=pk)
+
+    def test_incremental_matches_recompute(self):
+        first, second, third, _ = self.recipes
+        self.add(FavoriteRecipe, self.users[0], first)
+        self.add(FavoriteRecipe, self.users[1], first, hours_ago=100)
+        self.add(ShoppingList, self.users[2], first, hours_ago=10)
+        self.add(ShoppingList, self.users[0], second, hours_ago=300)
+        removed = self.add(FavoriteRecipe, self.users[2], second)
+        self.add(FavoriteRecipe, self.users[0], third, hours_ago=50)
+        removed.delete()
+        incremental = self.scores()
+        self.assertEqual(recompute_popularity(), 3)
+        self.assert_scores_equal(incremental, self.scores())
+
+    def test_last_event_removed(self):
+        recipe = self.recipes[0]
+        favorite = self.add(FavoriteRecipe, self.users[1], recipe, 20)
+        cart = self.add(ShoppingList, self.users[1], recipe)
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.popularity, 0)
+        favorite.delete()
+        cart.delete()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.popularity, 0)
+
+    def test_ordering_popular(self):
+        fresh_favorites, old_favorite, fresh_cart, none = self.recipes
+        for user in self.users[:2]:
+            self.add(FavoriteRecipe, user, fresh_favorites)
+        # Два периода полураспада: вклад 1/4 против 1/2 у списка покупок.
+        self.add(FavoriteRecipe, self.users[0], old_favorite, 144)
+        self.add(ShoppingList, self.users[0], fresh_cart)
+        response = self.client.get('/api/recipes/?ordering=popular')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.json()['results']],
+            [recipe.pk for recipe in (
+                fresh_favorites, fresh_cart, old_favorite, none
+            )]
+        )
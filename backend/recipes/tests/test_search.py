@@ -0,0 +1,44 @@
+from django.test import TestCase, override_settings
+
+from jobs.models import Job
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from recipes.search import search_recipes, update_search_index
+from recipes.tasks import reindex_ingredient_recipes
+from users.models import User
+
+
+@override_settings(JOBS_EAGER=False)
+class IngredientRenameTests(TestCase):
+
+    def setUp(self):
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='Secret-123'
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name='Пирог', text='text', cooking_time=5,
+            image='recipes/image.png',
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='яблоки', measurement_unit='г'
+        )
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=1
+        )
+        update_search_index([self.recipe.pk])
+
+    def found(self, query):
+        return list(
+            search_recipes(Recipe.objects.all(), query).values_list(
+                'pk', flat=True
+            )
+        )
+
+    def test_rename_reindexed_by_job(self):
+        self.assertEqual(self.found('яблоки'), [self.recipe.pk])
+        self.ingredient.name = 'груши'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.save()
+        job = Job.objects.get(name='recipes.reindex_ingredient_recipes')
+        self.assertEqual(self.found('груши'), [])
+        reindex_ingredient_recipes(*job.args)
+        self.assertEqual(self.found('груши'), [self.recipe.pk])
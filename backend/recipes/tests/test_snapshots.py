@@ -0,0 +1,50 @@
+import os
+import stat
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import TestCase, override_settings
+
+from recipes.models import Tag
+from recipes.snapshots import (invalidate_snapshot, read_manifest,
+                               snapshot_path, snapshot_url, write_file)
+
+
+class SnapshotTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        settings_override = override_settings(
+            REFERENCE_SNAPSHOT_ROOT=self.root
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_concurrent_writes(self):
+        """Воркеры пишут один файл одновременно без ошибок и мусора."""
+        path = os.path.join(self.root, 'tags.json')
+
+        def write(number):
+            for _ in range(50):
+                write_file(path, str(number).encode() * 1000)
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(write, range(8)))
+        with open(path, 'rb') as snapshot:
+            data = snapshot.read()
+        self.assertEqual(len(set(data)), 1)
+        self.assertEqual(os.listdir(self.root), ['tags.json'])
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+    def test_rebuild_after_invalidation(self):
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        first = snapshot_url('tags')
+        self.assertEqual(snapshot_url('tags'), first)
+        Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        invalidate_snapshot('tags')
+        second = snapshot_url('tags')
+        self.assertNotEqual(second, first)
+        self.assertTrue(second.endswith(read_manifest()['tags']))
+        self.assertTrue(os.path.exists(snapshot_path('tags.json.gz')))
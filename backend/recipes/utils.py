@@ -0,0 +1,126 @@
+from itertools import islice
+
+from django.db import connections, router, transaction
+
+NUMERIC_FIELDS = {
+    'AutoField', 'BigAutoField', 'BigIntegerField', 'FloatField',
+    'ForeignKey', 'IntegerField', 'PositiveIntegerField',
+    'PositiveSmallIntegerField', 'SmallIntegerField',
+}
+
+
+def bulk_create_with_ids(model, objects, batch_size=None):
+    """
+    bulk_create, после которого у всех объектов заполнен pk.
+    PostgreSQL возвращает id из INSERT ... RETURNING. Для остальных баз
+    вставка и чтение последних id идут в одной транзакции: SQLite
+    держит блокировку записи до её конца, поэтому id принадлежат нам.
+    """
+    database = router.db_for_write(model)
+    if connections[database].features.can_return_rows_from_bulk_insert:
+        return model.objects.using(database).bulk_create(
+            objects, batch_size=batch_size
+        )
+    with transaction.atomic(using=database):
+        model.objects.using(database).bulk_create(
+            objects, batch_size=batch_size
+        )
+        ids = list(
+            model.objects.using(database).order_by('-pk').values_list(
+                'pk', flat=True
+            )[:len(objects)]
+        )
+    for instance, pk in zip(objects, reversed(ids)):
+        instance.pk = pk
+        instance._state.adding = False
+        instance._state.db = database
+    return objects
+
+
+def values_array(queryset, width=2, chunk_size=100000):
+    """
+    Строки values_list из целых чисел в виде массива numpy int64
+    формы (n, width). Читается пачками, чтобы не держать в памяти
+    миллионы кортежей.
+    """
+    # numpy нужен только пакетным расчётам, не при старте процесса.
+    import numpy as np
+
+    chunks = []
+    chunk = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            chunks.append(np.array(chunk, dtype=np.int64))
+            chunk = []
+    if chunk:
+        chunks.append(np.array(chunk, dtype=np.int64))
+    if not chunks:
+        return np.empty((0, width), dtype=np.int64)
+    return np.concatenate(chunks)
+
+
+def insert_rows(model, fields, rows, batch_size=5000,
+                ignore_conflicts=False):
+    """
+    Вставка кортежей значений полей без создания объектов модели:
+    на миллионах строк bulk_create тратит основное время
+    на конструкторы моделей и подготовку значений.
+    Значения готовятся для базы только у нечисловых полей (даты).
+    С ignore_conflicts строки, нарушающие уникальность, пропускаются
+    (ON CONFLICT DO NOTHING, INSERT OR IGNORE), как в bulk_create.
+    """
+    database = router.db_for_write(model)
+    connection = connections[database]
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(field) for field in fields]
+    columns = ', '.join(quote(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = (
+        f'{connection.ops.insert_statement(ignore_conflicts)} '
+        f'{quote(model._meta.db_table)} ({columns}) '
+        f'VALUES ({placeholders}) '
+        f'{connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts)}'
+    )
+    prepared = [
+        field for field in fields
+        if field.get_internal_type() not in NUMERIC_FIELDS
+    ]
+    if prepared:
+        rows = (
+            tuple(
+                field.get_db_prep_save(value, connection)
+                if field in prepared else value
+                for field, value in zip(fields, row)
+            )
+            for row in rows
+        )
+    rows = iter(rows)
+    with transaction.atomic(using=database), connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            cursor.executemany(sql, batch)
+
+
+def update_rows(model, field, rows, batch_size=5000):
+    """
+    Обновление одного поля по парам (значение, pk) без создания
+    объектов модели: bulk_update строит CASE на каждую пачку.
+    """
+    database = router.db_for_write(model)
+    connection = connections[database]
+    quote = connection.ops.quote_name
+    sql = (
+        f'UPDATE {quote(model._meta.db_table)} '
+        f'SET {quote(model._meta.get_field(field).column)} = %s '
+        f'WHERE {quote(model._meta.pk.column)} = %s'
+    )
+    rows = iter(rows)
+    with transaction.atomic(using=database), connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            cursor.executemany(sql, batch)
@@ -0,0 +1,24 @@
+def recipe_errors(ingredients, tags):
+    """
+    Проверки состава рецепта, общие для API и импорта каталогов.
+    ingredients - пары (ингредиент, количество), tags - теги.
+    Возвращает словарь {поле: сообщение} с первой найденной ошибкой
+    или пустой словарь.
+    """
+    ingredients_list = []
+    for ingredient, amount in ingredients:
+        if ingredient in ingredients_list:
+            return {'ingredients': 'Данный ингредиент уже есть в рецепте.'}
+        ingredients_list.append(ingredient)
+        if int(amount) < 1:
+            return {'amount': 'В рецепте должен быть хотя бы 1 ингредиент.'}
+
+    if not tags:
+        return {'tags': 'Для Вашего рецепта нужно указать тэг.'}
+
+    tag_list = []
+    for tag in tags:
+        if tag in tag_list:
+            return {'tags': 'Данный тэг неуникален. Укажите другой.'}
+        tag_list.append(tag)
+    return {}
@@ -1,6 +1,10 @@
 from django.contrib import admin
 
+from backend.admin import BaseAdmin
 from .models import User
 
 
-admin.site.register(User)
+@admin.register(User)
+class UserAdmin(BaseAdmin):
+    list_display = ('username', 'email', 'first_name', 'last_name',)
+    search_fields = ('username', 'email',)
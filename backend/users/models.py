@@ -1,6 +1,26 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as BaseUserManager
 from django.db import models
 
+from .signals import users_updated
+
+
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        Массовое изменение не вызывает post_save: получатели
+        users_updated (кэш аутентификации) узнают о нём из сигнала.
+        """
+        user_ids = list(self.values_list('pk', flat=True))
+        try:
+            return super().update(**kwargs)
+        finally:
+            users_updated.send(sender=self.model, user_ids=user_ids)
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
+
 
 class User(AbstractUser):
     """
@@ -32,6 +52,8 @@ class User(AbstractUser):
         null=True
     )
 
+    objects = UserManager()
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Пользователи изменены через QuerySet.update, в обход post_save.
+# Аргумент user_ids - список id изменённых пользователей.
+users_updated = Signal()